@@ -1,11 +1,107 @@
 # auth.py
 from fastapi import Request, HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from collections import OrderedDict
+from typing import Optional
+from starlette.concurrency import run_in_threadpool
+from gotrue.errors import AuthApiError
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
 import jwt
-from database import SUPABASE_JWT_SECRET
+from database import SUPABASE_JWT_SECRET, supabase
+
+logger = logging.getLogger(__name__)
 
 security = HTTPBearer()
 
+# Verified-token cache settings. Revocation checks are off unless an
+# interval (in seconds) is configured.
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "1024"))
+AUTH_REVOCATION_CHECK_INTERVAL = int(os.getenv("AUTH_REVOCATION_CHECK_INTERVAL", "0"))
+
+
+class VerifiedTokenCache:
+    """Bounded LRU of decoded JWT claims keyed by the token's SHA-256 digest.
+
+    Entries are dropped once the token's exp has passed, so a cache hit never
+    outlives the signature it was verified from.
+
+    get_current_user is a sync dependency, so it runs on threadpool threads;
+    every method holds a lock since OrderedDict reordering isn't thread-safe.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._tokens = {}
+        self._revoked = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def digest(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            claims = self._entries.get(key)
+            if claims is None:
+                return None
+            if claims.get("exp", 0) <= time.time():
+                self._discard(key)
+                return None
+            self._entries.move_to_end(key)
+            return claims
+
+    def put(self, key: str, token: str, claims: dict):
+        with self._lock:
+            self._entries[key] = claims
+            self._entries.move_to_end(key)
+            # Raw tokens are only kept for the background revocation check
+            if AUTH_REVOCATION_CHECK_INTERVAL > 0:
+                self._tokens[key] = token
+            while len(self._entries) > self.maxsize:
+                oldest, _ = self._entries.popitem(last=False)
+                self._tokens.pop(oldest, None)
+
+    def discard(self, key: str):
+        with self._lock:
+            self._discard(key)
+
+    def _discard(self, key: str):
+        self._entries.pop(key, None)
+        self._tokens.pop(key, None)
+
+    def revoke(self, key: str, exp: float):
+        with self._lock:
+            self._discard(key)
+            self._revoked[key] = exp
+
+    def is_revoked(self, key: str) -> bool:
+        with self._lock:
+            exp = self._revoked.get(key)
+            if exp is None:
+                return False
+            if exp <= time.time():
+                # Expired tokens are rejected by the signature check anyway
+                self._revoked.pop(key, None)
+                return False
+            return True
+
+    def tokens(self):
+        with self._lock:
+            return [
+                (key, token, self._entries[key].get("exp", 0))
+                for key, token in self._tokens.items()
+                if key in self._entries
+            ]
+
+
+token_cache = VerifiedTokenCache(AUTH_TOKEN_CACHE_SIZE)
+
 
 async def auth_middleware(request: Request, call_next):
     token = request.cookies.get("access_token")
@@ -18,12 +114,23 @@ async def auth_middleware(request: Request, call_next):
     return response
 
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+def verify_token(token: str) -> dict:
+    """Verify a Supabase access token locally and return its claims"""
+    # Remove 'Bearer ' prefix if present
+    if token.startswith("Bearer "):
+        token = token.split(" ")[1]
+
+    key = token_cache.digest(token)
+    if token_cache.is_revoked(key):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has been revoked"
+        )
+
+    claims = token_cache.get(key)
+    if claims is not None:
+        return claims
+
     try:
-        token = credentials.credentials
-        # Remove 'Bearer ' prefix if present
-        if token.startswith("Bearer "):
-            token = token.split(" ")[1]
         # Add 'options' parameter to ignore audience claim
         payload = jwt.decode(
             token,
@@ -31,19 +138,50 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
             algorithms=["HS256"],
             options={"verify_aud": False},
         )
-        user_id = payload.get("sub")
-        if user_id is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid authentication credentials",
-            )
-        return payload
     except jwt.ExpiredSignatureError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has expired"
         )
-    except jwt.PyJWTError as e:
+    except jwt.PyJWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
         )
+
+    user_id = payload.get("sub")
+    if user_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials",
+        )
+
+    token_cache.put(key, token, payload)
+    return payload
+
+
+def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return verify_token(credentials.credentials)
+
+
+async def check_revoked_tokens():
+    """Ask Supabase whether any cached token's session has been revoked"""
+    for key, token, exp in token_cache.tokens():
+        try:
+            await run_in_threadpool(supabase.auth.get_user, token)
+        except AuthApiError as e:
+            if e.status in (401, 403):
+                logger.info("Dropping revoked token from the auth cache")
+                token_cache.revoke(key, exp)
+        except Exception as e:
+            # Network trouble should not lock users out; try again next round
+            logger.warning(f"Token revocation check failed: {str(e)}")
+            return
+
+
+async def run_revocation_checks():
+    while True:
+        await asyncio.sleep(AUTH_REVOCATION_CHECK_INTERVAL)
+        try:
+            await check_revoked_tokens()
+        except Exception as e:
+            logger.error(f"Error in token revocation check: {str(e)}")
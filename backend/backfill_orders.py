@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Backfill derived order columns that the API maintains on status writes.
+Run this once after applying migrations 014 and 019 (and again whenever the
+status-to-stage mapping or a workflow's statuses change).
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import supabase
+from pagination import apply_keyset, split_page
+from resources.workflow_constants import calculate_progress_percentage, map_workflow_status_to_stage
+from routes.order_routes import ORDER_PAGE_KEYS
+
+BATCH_SIZE = 500
+
+
+def backfill_orders():
+    cursor = None
+    scanned = 0
+    updated = 0
+
+    while True:
+        query = supabase.table("orders").select(
+            "order_id, created_at, workflow_type, type, workflow_status, workflow_stage, "
+            "completed_statuses, progress_percentage"
+        )
+        response = apply_keyset(query, ORDER_PAGE_KEYS, cursor, BATCH_SIZE).execute()
+        orders, cursor = split_page(response.data or [], ORDER_PAGE_KEYS, BATCH_SIZE)
+
+        for order in orders:
+            scanned += 1
+            workflow_type = order.get("workflow_type") or order.get("type") or "MATERIALS_ONLY"
+            derived = {
+                "workflow_stage": map_workflow_status_to_stage(order.get("workflow_status"), workflow_type),
+                "progress_percentage": calculate_progress_percentage(order.get("completed_statuses"), workflow_type),
+            }
+            changes = {column: value for column, value in derived.items() if order.get(column) != value}
+            if changes:
+                supabase.table("orders").update(changes).eq("order_id", order["order_id"]).execute()
+                updated += 1
+
+        print(f"📊 Scanned {scanned} orders, updated {updated}")
+
+        if not cursor:
+            break
+
+    print("✅ Backfill complete")
+
+
+if __name__ == "__main__":
+    backfill_orders()
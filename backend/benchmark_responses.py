@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Compare the cost of sending list responses before and after the orjson and
+compression changes: CPU per response and bytes on the wire for /orders and
+/tasks sized payloads. Rows are synthetic, so no database is needed.
+
+The last check sends an /orders-sized response through main.app's whole
+middleware stack and fails unless it comes back gzipped; importing main
+needs the usual Supabase environment variables (or .env).
+
+    python benchmark_responses.py [rows] [iterations]
+"""
+
+import sys
+import os
+import json
+import random
+import time
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+from compression import brotli, compress
+
+STATUSES = [
+    "NEW_LEAD", "CONTACTED", "QUOTE_SENT", "QUOTE_ACCEPTED", "MATERIALS_ORDERED",
+    "MATERIALS_RECEIVED", "DELIVERED", "INVOICED", "PAID",
+]
+PRIORITIES = ["Low", "Medium", "High", "Urgent"]
+TASK_STATUSES = ["Not Started", "In Progress", "Completed", "On Hold"]
+
+
+def make_orders(count: int):
+    random.seed(1)
+    start = datetime(2025, 1, 1)
+    orders = []
+    for index in range(count):
+        created = start + timedelta(hours=index * 7)
+        orders.append({
+            "order_id": f"3f1c{index:04d}-8d2e-4b7a-9c11-5e0a2b7d{index:04d}",
+            "order_name": f"Kitchen renovation {index}",
+            "customer_id": f"c{random.randint(1, 80):03d}",
+            "customer_name": f"Customer {random.randint(1, 80)}",
+            "workflow_type": random.choice(["MATERIALS_ONLY", "MATERIALS_AND_INSTALLATION"]),
+            "workflow_status": random.choice(STATUSES),
+            "workflow_stage": random.choice(["LEAD_ACQUISITION", "QUOTATION", "PROCUREMENT", "FULFILLMENT"]),
+            "current_stage": random.choice(["LEAD_ACQUISITION", "QUOTATION", "PROCUREMENT", "FULFILLMENT"]),
+            "priority": random.choice(PRIORITIES),
+            "progress_percentage": random.randint(0, 100),
+            "completed_statuses": STATUSES[:random.randint(0, len(STATUSES))],
+            "total_amount": round(random.uniform(500, 50000), 2),
+            "site_address": f"{random.randint(1, 999)} Main Street",
+            "created_at": created.isoformat() + "+00:00",
+            "updated_at": (created + timedelta(days=2)).isoformat() + "+00:00",
+        })
+    return {"orders": orders, "next_cursor": "eyJjcmVhdGVkX2F0IjoiMjAyNS0wMS0wMSJ9"}
+
+
+def make_tasks(count: int):
+    random.seed(2)
+    start = datetime(2025, 1, 1)
+    tasks = []
+    for index in range(count):
+        created = start + timedelta(hours=index * 5)
+        tasks.append({
+            "task_id": index + 1,
+            "title": f"Follow up on order {index}",
+            "description": "Call the customer to confirm the delivery window",
+            "status": random.choice(TASK_STATUSES),
+            "priority": random.choice(PRIORITIES),
+            "order_id": f"3f1c{index:04d}-8d2e-4b7a-9c11-5e0a2b7d{index:04d}",
+            "assigned_to": f"u{random.randint(1, 12):02d}",
+            "due_date": (created + timedelta(days=3)).date().isoformat(),
+            "created_at": created.isoformat() + "+00:00",
+            "updated_at": (created + timedelta(days=1)).isoformat() + "+00:00",
+        })
+    return {"tasks": tasks}
+
+
+def render_before(payload) -> bytes:
+    # FastAPI's default path: jsonable_encoder, then JSONResponse.render
+    return json.dumps(
+        jsonable_encoder(payload), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def render_after(payload) -> bytes:
+    # The list routes return ORJSONResponse directly, skipping jsonable_encoder
+    return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)
+
+
+def time_per_call(function, iterations: int) -> float:
+    """Mean CPU microseconds per call"""
+    function()
+    started = time.process_time()
+    for _ in range(iterations):
+        function()
+    return (time.process_time() - started) / iterations * 1e6
+
+
+def benchmark(name: str, payload, iterations: int):
+    before = render_before(payload)
+    after = render_after(payload)
+    assert json.loads(before) == json.loads(after)
+
+    print(f"{name}")
+    print(f"  serialize  json+jsonable_encoder {time_per_call(lambda: render_before(payload), iterations):>9.0f} us")
+    print(f"  serialize  orjson                {time_per_call(lambda: render_after(payload), iterations):>9.0f} us")
+    print(f"  bytes      uncompressed          {len(after):>9}")
+    encodings = ["gzip", "br"] if brotli is not None else ["gzip"]
+    for encoding in encodings:
+        compressed = compress(after, encoding)
+        cost = time_per_call(lambda: compress(after, encoding), iterations)
+        print(f"  bytes      {encoding:<4}                  {len(compressed):>9}"
+              f"  ({len(compressed) / len(after):.0%}, +{cost:.0f} us)")
+
+
+def check_app_compression(payload):
+    """Send payload through main.app and check it is compressed on the wire"""
+    from fastapi.responses import ORJSONResponse
+    from fastapi.testclient import TestClient
+    from main import app
+
+    # Served without a database, but behind the same middleware as /orders
+    app.add_api_route("/benchmark/orders", lambda: ORJSONResponse(payload), methods=["GET"])
+    client = TestClient(app)
+
+    response = client.get("/benchmark/orders", headers={"Accept-Encoding": "gzip"})
+    encoding = response.headers.get("content-encoding")
+    wire_bytes = int(response.headers["content-length"])
+    assert response.status_code == 200, response.status_code
+    assert encoding == "gzip", f"expected a gzip response, got Content-Encoding: {encoding}"
+    assert response.json() == payload
+
+    identity = client.get("/benchmark/orders", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in identity.headers
+
+    print("main.app /orders-sized response")
+    print(f"  bytes      identity              {len(identity.content):>9}")
+    print(f"  bytes      gzip                  {wire_bytes:>9}")
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    if brotli is None:
+        print("brotli is not installed; only gzip is measured")
+    benchmark(f"/orders ({rows} rows)", make_orders(rows), iterations)
+    benchmark(f"/tasks ({rows} rows)", make_tasks(rows), iterations)
+    check_app_compression(make_orders(rows))
@@ -8,6 +8,8 @@ import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from database import supabase
+from services.user_directory import resolve_user_emails
+import asyncio
 from datetime import datetime
 
 def check_timestamps():
@@ -33,9 +35,12 @@ def check_timestamps():
     
     events = events_result.data
     print(f"📊 Found {len(events)} events")
-    print("=" * 100)
-    print(f"{'#':3} {'Timestamp':20} {'Type':20} {'Description':55}")
-    print("-" * 100)
+    print("=" * 126)
+    print(f"{'#':3} {'Timestamp':20} {'Type':20} {'User':25} {'Description':55}")
+    print("-" * 126)
+    
+    # Resolve authors the same way the API does
+    emails = asyncio.run(resolve_user_emails(e.get('created_by') for e in events))
     
     # Check for issues
     issues = []
@@ -46,7 +51,9 @@ def check_timestamps():
         event_type = event['event_type']
         description = event['description'][:55] if event['description'] else 'No description'
         
-        print(f"{i:3} {timestamp:20} {event_type:20} {description:55}")
+        author = emails.get(str(event.get('created_by'))) or 'System User'
+        
+        print(f"{i:3} {timestamp:20} {event_type:20} {author[:25]:25} {description:55}")
         
         # Check for year 2025
         if '2025' in timestamp:
@@ -0,0 +1,170 @@
+# quickbooks_client.py
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from intuitlib.client import AuthClient
+from starlette.concurrency import run_in_threadpool
+
+from services.settings_store import settings_store
+
+logger = logging.getLogger(__name__)
+
+# Environment variables for QuickBooks OAuth
+QB_CLIENT_ID = os.getenv("QB_CLIENT_ID")
+QB_CLIENT_SECRET = os.getenv("QB_CLIENT_SECRET")
+QB_REDIRECT_URI = os.getenv(
+    "QB_REDIRECT_URI", "http://localhost:3000/quickbooks/callback"
+)
+QB_ENVIRONMENT = os.getenv("QB_ENVIRONMENT", "sandbox")  # "sandbox" or "production"
+
+# Refresh the access token this long before it expires
+QB_TOKEN_REFRESH_MARGIN = int(os.getenv("QB_TOKEN_REFRESH_MARGIN", "300"))
+
+
+def new_auth_client(**tokens) -> AuthClient:
+    """Create an AuthClient (blocking: fetches Intuit's discovery document)"""
+    return AuthClient(
+        client_id=QB_CLIENT_ID,
+        client_secret=QB_CLIENT_SECRET,
+        redirect_uri=QB_REDIRECT_URI,
+        environment=QB_ENVIRONMENT,
+        **tokens,
+    )
+
+
+class QuickBooksTokenManager:
+    """Holds the OAuth tokens for one QuickBooks company (realm) in memory.
+
+    get_auth_client() hands out an AuthClient whose access token is valid for at
+    least QB_TOKEN_REFRESH_MARGIN seconds. Concurrent callers share a single
+    in-flight refresh, and each refresh is persisted once. The AuthClient is
+    owned by the manager and only mutated while its lock is held.
+    """
+
+    def __init__(self, realm_id: str, settings: Dict[str, str]):
+        self.realm_id = realm_id
+        self.refresh_token = settings.get("qb_refresh_token")
+        self.access_token = settings.get("qb_access_token")
+        self.expires_at = _parse_expiry(settings.get("qb_token_expiry"))
+        self._auth_client: Optional[AuthClient] = None
+        # Created on first use: on Python 3.9 asyncio primitives bind to the
+        # loop that is current when they are constructed
+        self._lock: Optional[asyncio.Lock] = None
+
+    def token_is_fresh(self) -> bool:
+        return bool(
+            self.access_token
+            and self.expires_at
+            and datetime.now() + timedelta(seconds=QB_TOKEN_REFRESH_MARGIN) < self.expires_at
+        )
+
+    def adopt(self, settings: Dict[str, str]):
+        """Take over tokens that another worker refreshed and persisted"""
+        self.refresh_token = settings.get("qb_refresh_token")
+        self.access_token = settings.get("qb_access_token")
+        self.expires_at = _parse_expiry(settings.get("qb_token_expiry"))
+        if self._auth_client is not None:
+            self._auth_client.refresh_token = self.refresh_token
+            self._auth_client.access_token = self.access_token
+
+    async def _client(self) -> AuthClient:
+        if self._auth_client is None:
+            self._auth_client = await run_in_threadpool(
+                new_auth_client,
+                access_token=self.access_token,
+                refresh_token=self.refresh_token,
+                realm_id=self.realm_id,
+            )
+        return self._auth_client
+
+    async def get_auth_client(self, force_refresh: bool = False) -> AuthClient:
+        if self.token_is_fresh() and not force_refresh:
+            return await self._client()
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            # Whoever held the lock before us may already have refreshed
+            if not self.token_is_fresh() or force_refresh:
+                await self._refresh()
+            return await self._client()
+
+    async def _refresh(self):
+        auth_client = await self._client()
+        await run_in_threadpool(auth_client.refresh, refresh_token=self.refresh_token)
+        await self._store(auth_client)
+        logger.info(f"Refreshed QuickBooks access token for realm {self.realm_id}")
+
+    async def exchange_code(self, code: str):
+        """Trade an authorization code for this realm's first tokens"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            auth_client = await self._client()
+            await run_in_threadpool(
+                auth_client.get_bearer_token, code, realm_id=self.realm_id
+            )
+            await self._store(auth_client)
+
+    async def revoke(self):
+        auth_client = await self._client()
+        await run_in_threadpool(auth_client.revoke, token=self.refresh_token)
+
+    async def _store(self, auth_client: AuthClient):
+        self.access_token = auth_client.access_token
+        self.refresh_token = auth_client.refresh_token
+        self.expires_at = datetime.now() + timedelta(seconds=auth_client.expires_in)
+        await settings_store.save(
+            {
+                "qb_access_token": self.access_token,
+                "qb_refresh_token": self.refresh_token,
+                "qb_realm_id": self.realm_id,
+                "qb_token_expiry": self.expires_at.isoformat(),
+            }
+        )
+
+
+def _parse_expiry(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+# One manager per connected company
+_token_managers: Dict[str, QuickBooksTokenManager] = {}
+
+
+async def get_token_manager(settings: Optional[Dict[str, str]] = None) -> Optional[QuickBooksTokenManager]:
+    """Return the token manager for the connected realm, or None if not connected.
+
+    Tokens are loaded from integration_settings the first time a realm is seen
+    and then kept in memory. Settings reads come from the cached settings store.
+    """
+    if settings is None:
+        settings = await settings_store.get_all()
+    realm_id = settings.get("qb_realm_id")
+    if not realm_id or not settings.get("qb_refresh_token"):
+        return None
+
+    manager = _token_managers.get(realm_id)
+    if manager is None:
+        manager = _token_managers[realm_id] = QuickBooksTokenManager(realm_id, settings)
+    elif manager.refresh_token != settings["qb_refresh_token"] and not manager.token_is_fresh():
+        # Another worker rotated the refresh token; ours is no longer valid
+        manager.adopt(settings)
+    return manager
+
+
+def register_token_manager(manager: QuickBooksTokenManager):
+    """Make a newly authorized realm's manager the one handed out"""
+    _token_managers[manager.realm_id] = manager
+
+
+def forget_token_manager(realm_id: Optional[str]):
+    _token_managers.pop(realm_id, None)
@@ -0,0 +1,190 @@
+# compression.py
+import gzip
+import os
+from typing import List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; without it only gzip is offered
+    brotli = None
+
+# Bodies smaller than this are sent as they are: below roughly one packet the
+# compression CPU buys nothing on the wire
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+# Bodies sent in several chunks are buffered up to this size so they can be
+# compressed whole; larger ones are passed through as they are
+COMPRESSION_BUFFER_LIMIT = int(os.getenv("COMPRESSION_BUFFER_LIMIT", str(8 * 1024 * 1024)))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+# Already-compressed formats gain nothing from another pass; event streams
+# must reach the client as each event is written
+INCOMPRESSIBLE_TYPES = (
+    b"image/",
+    b"video/",
+    b"audio/",
+    b"application/zip",
+    b"application/pdf",
+    b"text/event-stream",
+)
+
+
+def parse_accept_encoding(header: str) -> dict:
+    """Map each coding in an Accept-Encoding header to its q-value"""
+    codings = {}
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        codings[coding] = quality
+    return codings
+
+
+def choose_encoding(header: Optional[str]) -> Optional[str]:
+    """Pick br or gzip from Accept-Encoding, preferring br when it is available"""
+    if not header:
+        return None
+    codings = parse_accept_encoding(header)
+    wildcard = codings.get("*", 0.0)
+    offered = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best = None
+    best_quality = 0.0
+    for coding in offered:
+        quality = codings.get(coding, wildcard)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    """ASGI middleware that compresses response bodies with br or gzip.
+
+    The coding is negotiated from Accept-Encoding. Bodies sent in several
+    chunks (BaseHTTPMiddleware, such as auth_middleware, always sends at
+    least two) are buffered and compressed whole, up to buffer_limit bytes.
+    Event streams (/changes/stream) pass through untouched, since
+    compressing them would hold events back until a compressor block fills.
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = COMPRESSION_MINIMUM_SIZE,
+        buffer_limit: int = COMPRESSION_BUFFER_LIMIT,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.buffer_limit = buffer_limit
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(_header(scope.get("headers", []), b"accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        chunks: List[bytes] = []
+        buffered = 0
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, buffered, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                if not self._compressible(start):
+                    passthrough = True
+                    if start["status"] == 304:
+                        # The body isn't sent, so its size is unknown here; the
+                        # client's copy may be compressed, and a weak tag matches both
+                        start = {**start, "headers": _weaken_etag(start.get("headers", []))}
+                    await send(start)
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            chunks.append(message.get("body", b""))
+            buffered += len(chunks[-1])
+            if message.get("more_body", False):
+                if buffered > self.buffer_limit:
+                    # Too large to hold in memory; send what we have and
+                    # stream the rest uncompressed
+                    passthrough = True
+                    await send(start)
+                    await send({"type": "http.response.body", "body": b"".join(chunks), "more_body": True})
+                    chunks.clear()
+                return
+
+            body = b"".join(chunks)
+            chunks.clear()
+            if len(body) < self.minimum_size:
+                await send(start)
+                await send({"type": "http.response.body", "body": body})
+                return
+
+            compressed = compress(body, encoding)
+            headers = _weaken_etag(
+                [(name, value) for name, value in start.get("headers", []) if name.lower() != b"content-length"]
+            )
+            headers += [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(compressed)).encode()),
+            ]
+            _add_vary(headers)
+            await send({**start, "headers": headers})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
+
+    @staticmethod
+    def _compressible(start) -> bool:
+        if start["status"] < 200 or start["status"] in (204, 304):
+            return False
+        headers = start.get("headers", [])
+        if _header(headers, b"content-encoding"):
+            return False
+        content_type = (_header(headers, b"content-type") or "").encode()
+        return not content_type.startswith(INCOMPRESSIBLE_TYPES)
+
+
+def _header(headers: List[Tuple[bytes, bytes]], name: bytes) -> Optional[str]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value.decode("latin-1")
+    return None
+
+
+def _add_vary(headers: List[Tuple[bytes, bytes]]):
+    for index, (key, value) in enumerate(headers):
+        if key.lower() == b"vary":
+            if b"accept-encoding" not in value.lower():
+                headers[index] = (key, value + b", Accept-Encoding")
+            return
+    headers.append((b"vary", b"Accept-Encoding"))
+
+
+def _weaken_etag(headers: List[Tuple[bytes, bytes]]) -> List[Tuple[bytes, bytes]]:
+    # A strong ETag names exact bytes, so a compressed representation only
+    # keeps a weak one (If-None-Match compares them weakly)
+    return [
+        (key, value if key.lower() != b"etag" or value.startswith(b"W/") else b"W/" + value)
+        for key, value in headers
+    ]
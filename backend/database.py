@@ -1,6 +1,9 @@
 # database.py
 import os
+import httpx
 from supabase import create_client, Client
+from postgrest import AsyncPostgrestClient
+from postgrest.constants import DEFAULT_POSTGREST_CLIENT_HEADERS
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -14,5 +17,44 @@ SUPABASE_BUCKET = os.getenv('SUPABASE_BUCKET')
 if not all([SUPABASE_URL, SUPABASE_KEY, SUPABASE_JWT_SECRET, SUPABASE_BUCKET]):
     raise EnvironmentError("One or more Supabase environment variables are missing.")
 
-# Initialize Supabase client
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
\ No newline at end of file
+# Connection pool and timeout settings for the async data access layer
+DB_MAX_CONNECTIONS = int(os.getenv('DB_MAX_CONNECTIONS', '20'))
+DB_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('DB_MAX_KEEPALIVE_CONNECTIONS', '10'))
+DB_TIMEOUT = float(os.getenv('DB_TIMEOUT', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '5'))
+
+# Initialize Supabase client (auth, storage and standalone scripts)
+supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+
+class PooledPostgrestClient(AsyncPostgrestClient):
+    """Async PostgREST client backed by a bounded keep-alive connection pool.
+
+    At most DB_MAX_CONNECTIONS queries are in flight per worker; further callers
+    wait up to DB_POOL_TIMEOUT for a connection. Every call is bounded by
+    DB_TIMEOUT so one slow query cannot hold a request forever.
+    """
+
+    def create_session(self, base_url, headers, timeout):
+        return httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=DB_MAX_CONNECTIONS,
+                max_keepalive_connections=DB_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+        )
+
+
+# Async client for table queries from the route handlers:
+#     response = await db.table("orders").select("*").execute()
+db = PooledPostgrestClient(
+    f"{SUPABASE_URL}/rest/v1",
+    headers={
+        **DEFAULT_POSTGREST_CLIENT_HEADERS,
+        "apiKey": SUPABASE_KEY,
+        "Authorization": f"Bearer {SUPABASE_KEY}",
+    },
+    timeout=httpx.Timeout(DB_TIMEOUT, pool=DB_POOL_TIMEOUT),
+)
@@ -9,6 +9,8 @@ import os
 sys.path.append('/Users/jata/Documents/MSD_App/msd_admin_app/backend')
 
 from database import supabase
+from services.user_directory import resolve_user_emails
+import asyncio
 
 def debug_events():
     # Get the order ID for DEMO-2024-002
@@ -28,8 +30,12 @@ def debug_events():
     print(f"📊 Found {len(events_result.data)} events")
     print("=" * 80)
     
+    # Resolve authors the same way the API does
+    emails = asyncio.run(resolve_user_emails(e.get('created_by') for e in events_result.data))
+    
     for i, event in enumerate(events_result.data, 1):
-        print(f"{i:2d}. {event['created_at']} | {event['event_type']:20} | {event['description']}")
+        author = emails.get(str(event.get('created_by'))) or 'System User'
+        print(f"{i:2d}. {event['created_at']} | {event['event_type']:20} | {author:25} | {event['description']}")
     
     print()
     print("🔍 Checking chronological order...")
@@ -0,0 +1,129 @@
+# http_cache.py
+import hashlib
+import os
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode
+
+from fastapi import Request, Response
+
+from services.cache import TTLCache
+
+
+def make_etag(*parts) -> str:
+    """Build a strong ETag from the values a representation is derived from"""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match already names this ETag"""
+    if_none_match: Optional[str] = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in candidates)
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers=cache_headers(etag))
+
+
+def cache_headers(etag: str) -> dict:
+    # Let the browser keep the body but revalidate it on every use
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+
+# Reference data served by immutable routes only changes with a deploy, so
+# browsers may reuse it for this long without asking again
+IMMUTABLE_MAX_AGE = int(os.getenv("IMMUTABLE_MAX_AGE", "86400"))
+
+
+def immutable(endpoint):
+    """Mark a route's response as fixed for the life of the process.
+
+    ImmutableResponseCache keeps the first 200 response of a marked route in
+    memory and answers repeat requests without running the route.
+    """
+    endpoint.__immutable__ = True
+    return endpoint
+
+
+class ImmutableResponseCache:
+    """ASGI middleware that serves responses of @immutable routes from memory.
+
+    Cached entries are keyed by path and normalized query string and carry a
+    strong ETag over the body. A hit skips the rest of the middleware stack,
+    dependencies (including auth) and serialization; a matching
+    If-None-Match gets a 304. Other responses stream through untouched.
+    """
+
+    def __init__(self, app, maxsize: int = 256):
+        self.app = app
+        self._entries = TTLCache(ttl=float("inf"), maxsize=maxsize)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        query = urlencode(sorted(parse_qsl(scope.get("query_string", b"").decode("latin-1"))))
+        key = (scope["path"], query)
+        entry = self._entries.get(key)
+        if entry is not TTLCache.MISSING:
+            await self._send_cached(scope, send, entry)
+            return
+
+        start = None
+        chunks = []
+
+        async def send_wrapper(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                # Routing has run by now, so the scope names the endpoint
+                if message["status"] == 200 and getattr(scope.get("endpoint"), "__immutable__", False):
+                    start = message
+                    return
+            elif message["type"] == "http.response.body" and start is not None:
+                chunks.append(message.get("body", b""))
+                if message.get("more_body", False):
+                    return
+                entry = self._store(key, start, b"".join(chunks))
+                await self._send_cached(scope, send, entry)
+                return
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    def _store(self, key, start, body: bytes):
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        headers = [
+            (name, value)
+            for name, value in start.get("headers", [])
+            if name.lower() not in (b"etag", b"cache-control", b"content-length")
+        ]
+        headers += [
+            (b"etag", etag.encode()),
+            (b"cache-control", f"public, max-age={IMMUTABLE_MAX_AGE}".encode()),
+        ]
+        entry = (etag, headers, body)
+        self._entries.set(key, entry)
+        return entry
+
+    async def _send_cached(self, scope, send, entry):
+        etag, headers, body = entry
+        if etag_matches(Request(scope), etag):
+            validators = [(name, value) for name, value in headers if name in (b"etag", b"cache-control")]
+            await send({"type": "http.response.start", "status": 304, "headers": validators})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": headers + [(b"content-length", str(len(body)).encode())],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
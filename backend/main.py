@@ -1,8 +1,14 @@
 # main.py
 
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from auth import auth_middleware
+import asyncio
+from auth import auth_middleware, run_revocation_checks, AUTH_REVOCATION_CHECK_INTERVAL
+from database import db
+from compression import CompressionMiddleware
+from http_cache import ImmutableResponseCache
+from services.event_sink import audit_events
 
 # Import route modules
 from routes.auth_routes import router as auth_router
@@ -10,6 +16,9 @@ from routes.order_routes import router as order_router
 from routes.order_events import router as order_events_router
 from routes.task_routes import router as task_router
 from routes.customer_routes import router as customer_router
+from routes.product_routes import router as product_router
+from routes.dashboard_routes import router as dashboard_router
+from routes.change_routes import router as change_router
 
 # from routes.quickbooks_routes import router as quickbooks_mock_router
 from routes.quickbooks_api_routes import router as quickbooks_api_router
@@ -18,11 +27,16 @@ from routes.employee_routes import router as employee_router
 from routes.work_item_routes import router as work_item_router
 # Debug routes removed during cleanup
 
-app = FastAPI()
+# orjson serializes responses several times faster than the json module
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Add middleware
 app.middleware("http")(auth_middleware)
 
+# Outside auth so cached reference data skips it, inside CORS so every
+# response still gets CORS headers
+app.add_middleware(ImmutableResponseCache)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000"],  # Be specific with the origin
@@ -32,12 +46,18 @@ app.add_middleware(
     expose_headers=["Content-Type", "X-CSRFToken"],  # Add any custom headers here
 )
 
+# Outermost, so cached and CORS-decorated responses are compressed too
+app.add_middleware(CompressionMiddleware)
+
 # Include routers
 app.include_router(auth_router)
 app.include_router(order_router)
 app.include_router(order_events_router)
 app.include_router(task_router)
 app.include_router(customer_router)
+app.include_router(product_router)
+app.include_router(dashboard_router)
+app.include_router(change_router)
 # app.include_router(
 #     quickbooks_mock_router
 # )  # Keep the mock routes for backward compatibility
@@ -48,6 +68,24 @@ app.include_router(work_item_router)
 # Debug router removed during cleanup
 
 
+@app.on_event("startup")
+async def start_background_tasks():
+    await audit_events.start()
+    if AUTH_REVOCATION_CHECK_INTERVAL > 0:
+        app.state.revocation_task = asyncio.create_task(run_revocation_checks())
+
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    revocation_task = getattr(app.state, "revocation_task", None)
+    if revocation_task:
+        revocation_task.cancel()
+    # Write out buffered audit events before the pool goes away
+    await audit_events.stop()
+    # Release pooled keep-alive connections to PostgREST
+    await db.aclose()
+
+
 @app.get("/")
 async def root():
     return {
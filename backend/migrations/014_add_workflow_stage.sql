@@ -0,0 +1,18 @@
+-- Migration 014: Persist the derived workflow stage on orders
+-- Description: GET /orders used to map workflow_status to a stage in Python for every row
+-- and filter afterwards. The stage is now written alongside workflow_status so the
+-- filter and keyset pagination on (created_at, order_id) run in the database.
+-- After applying, run `python backfill_orders.py` to populate existing rows.
+
+ALTER TABLE orders
+ADD COLUMN IF NOT EXISTS workflow_stage VARCHAR(50);
+
+-- Keyset pagination for the unfiltered list
+CREATE INDEX IF NOT EXISTS idx_orders_created_at_order_id
+ON orders(created_at DESC, order_id DESC);
+
+-- Stage-filtered pages
+CREATE INDEX IF NOT EXISTS idx_orders_workflow_stage_created_at
+ON orders(workflow_stage, created_at DESC, order_id DESC);
+
+COMMENT ON COLUMN orders.workflow_stage IS 'Stage derived from workflow_status (LEAD_ACQUISITION, QUOTATION, ...), maintained by the API on status writes';
@@ -0,0 +1,45 @@
+-- Migration 015: Support bulk upserts for the QuickBooks product sync
+-- Description: The product sync now prefetches all products keyed by quickbooks_id,
+-- diffs them in memory and writes only changed rows with chunked
+-- upserts ON CONFLICT (quickbooks_id). That needs a unique constraint on
+-- quickbooks_id, plus the columns the sync writes.
+
+ALTER TABLE products
+ADD COLUMN IF NOT EXISTS sku VARCHAR(100),
+ADD COLUMN IF NOT EXISTS type VARCHAR(50),
+ADD COLUMN IF NOT EXISTS is_active BOOLEAN DEFAULT TRUE,
+ADD COLUMN IF NOT EXISTS default_price DECIMAL(10,2),
+ADD COLUMN IF NOT EXISTS cost_price DECIMAL(10,2),
+ADD COLUMN IF NOT EXISTS last_synced_at TIMESTAMP WITH TIME ZONE;
+
+-- Collapse duplicates left by the old delete-then-insert sync onto the newest row
+CREATE TEMP TABLE product_duplicates AS
+SELECT product_id, keeper_id
+FROM (
+    SELECT product_id,
+           FIRST_VALUE(product_id) OVER (
+               PARTITION BY quickbooks_id ORDER BY created_at DESC, product_id DESC
+           ) AS keeper_id
+    FROM products
+    WHERE quickbooks_id IS NOT NULL
+) ranked
+WHERE product_id <> keeper_id;
+
+UPDATE purchase_order_items poi
+SET product_id = d.keeper_id
+FROM product_duplicates d
+WHERE poi.product_id = d.product_id;
+
+DELETE FROM products p
+USING product_duplicates d
+WHERE p.product_id = d.product_id;
+
+DROP TABLE product_duplicates;
+
+-- Unique key for ON CONFLICT (quickbooks_id); NULLs (local-only products) are allowed.
+-- Databases created from create_database_supabase_auth.sql already have it under
+-- this name, so drop it first
+ALTER TABLE products DROP CONSTRAINT IF EXISTS products_quickbooks_id_key;
+
+ALTER TABLE products
+ADD CONSTRAINT products_quickbooks_id_key UNIQUE (quickbooks_id);
@@ -0,0 +1,17 @@
+-- Migration 016: One row per integration setting key
+-- Description: Settings used to be written with a delete-then-insert per key. The
+-- settings store now writes several keys with one upsert ON CONFLICT (key),
+-- which needs a unique constraint on key.
+
+-- Drop duplicate keys left by interrupted delete-then-insert writes, keeping the newest
+DELETE FROM integration_settings older
+USING integration_settings newer
+WHERE older.key = newer.key
+  AND (older.updated_at, older.ctid) < (newer.updated_at, newer.ctid);
+
+-- Databases created from create_database_supabase_auth.sql already declare key
+-- UNIQUE, which Postgres names the same way, so drop it first
+ALTER TABLE integration_settings DROP CONSTRAINT IF EXISTS integration_settings_key_key;
+
+ALTER TABLE integration_settings
+ADD CONSTRAINT integration_settings_key_key UNIQUE (key);
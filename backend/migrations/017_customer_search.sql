@@ -0,0 +1,92 @@
+-- Migration 017: Indexed, ranked customer search
+-- Description: The customer picker searched with name/contact ILIKE '%q%' filters, which
+-- scan the whole customers table on every keystroke. Searches now go through the
+-- search_customers() function, backed by a trigram index over one normalized
+-- search string per customer that also covers email, phone and address.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Everything a customer can be found by, lower-cased. The phone number is also
+-- included as bare digits so "5551234" matches "(555) 123-4".
+CREATE OR REPLACE FUNCTION customer_search_text(
+    p_name TEXT,
+    p_contact_first_name TEXT,
+    p_contact_last_name TEXT,
+    p_email TEXT,
+    p_phone TEXT,
+    p_address TEXT,
+    p_city TEXT,
+    p_state TEXT,
+    p_zip_code TEXT
+)
+RETURNS TEXT AS $$
+    SELECT lower(concat_ws(' ',
+        p_name,
+        p_contact_first_name,
+        p_contact_last_name,
+        p_email,
+        p_phone,
+        regexp_replace(p_phone, '\D', '', 'g'),
+        p_address,
+        p_city,
+        p_state,
+        p_zip_code
+    ));
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE INDEX IF NOT EXISTS idx_customers_search_trgm ON customers USING gin (
+    customer_search_text(
+        name, contact_first_name, contact_last_name, email, phone,
+        address, city, state, zip_code
+    ) gin_trgm_ops
+);
+
+-- Ranked search: names starting with the query first, then contacts and emails
+-- starting with it, then the closest trigram matches anywhere in the record
+CREATE OR REPLACE FUNCTION search_customers(
+    p_query TEXT,
+    p_customer_type TEXT DEFAULT NULL,
+    p_limit INTEGER DEFAULT 20,
+    p_offset INTEGER DEFAULT 0
+)
+RETURNS SETOF customers AS $$
+    WITH q AS (
+        SELECT
+            lower(trim(p_query)) AS term,
+            -- Escape LIKE wildcards typed by the user
+            replace(replace(replace(lower(trim(p_query)), '\', '\\'), '%', '\%'), '_', '\_') AS pattern
+    )
+    SELECT c.*
+    FROM customers c, q
+    WHERE (
+            customer_search_text(
+                c.name, c.contact_first_name, c.contact_last_name, c.email, c.phone,
+                c.address, c.city, c.state, c.zip_code
+            ) LIKE '%' || q.pattern || '%'
+            OR q.term <% customer_search_text(
+                c.name, c.contact_first_name, c.contact_last_name, c.email, c.phone,
+                c.address, c.city, c.state, c.zip_code
+            )
+        )
+        AND (p_customer_type IS NULL OR c.customer_type::TEXT = upper(p_customer_type))
+    ORDER BY
+        CASE
+            WHEN lower(c.name) LIKE q.pattern || '%' THEN 0
+            WHEN lower(c.contact_first_name) LIKE q.pattern || '%'
+                OR lower(c.contact_last_name) LIKE q.pattern || '%'
+                OR lower(concat_ws(' ', c.contact_first_name, c.contact_last_name)) LIKE q.pattern || '%'
+                OR lower(c.email) LIKE q.pattern || '%' THEN 1
+            ELSE 2
+        END,
+        word_similarity(
+            q.term,
+            customer_search_text(
+                c.name, c.contact_first_name, c.contact_last_name, c.email, c.phone,
+                c.address, c.city, c.state, c.zip_code
+            )
+        ) DESC,
+        c.name,
+        c.customer_id
+    LIMIT p_limit
+    OFFSET p_offset;
+$$ LANGUAGE sql STABLE;
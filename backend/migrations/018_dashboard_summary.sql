@@ -0,0 +1,124 @@
+-- Migration 018: Dashboard summary computed in the database
+-- Description: The dashboard downloaded every task and order and counted them in the
+-- browser, so its payload grew with history. dashboard_summary() returns the grouped
+-- counts, per-assignee task load and the short lists the dashboard shows as one JSON
+-- document, served by GET /dashboard/summary.
+
+-- Due-date scans for the overdue / today / upcoming task lists
+CREATE INDEX IF NOT EXISTS idx_tasks_due_date ON tasks(due_date);
+
+-- Recent activity feed
+CREATE INDEX IF NOT EXISTS idx_order_events_created_at ON order_events(created_at DESC);
+
+-- Task statuses arrive both as enum values (COMPLETED) and as display names
+-- (Completed), so they are compared normalized
+CREATE OR REPLACE FUNCTION task_is_open(p_status TEXT)
+RETURNS BOOLEAN AS $$
+    SELECT coalesce(upper(replace(p_status, ' ', '_')), '') NOT IN ('COMPLETED', 'CLOSED', 'CANCELLED');
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION dashboard_summary(
+    p_today DATE DEFAULT CURRENT_DATE,
+    p_upcoming_days INTEGER DEFAULT 7,
+    p_list_limit INTEGER DEFAULT 5
+)
+RETURNS JSON AS $$
+    WITH open_tasks AS (
+        SELECT task_id, title, status, priority, due_date, assigned_to, order_id
+        FROM tasks
+        WHERE task_is_open(status::TEXT)
+    )
+    SELECT json_build_object(
+        -- One row per (workflow_type, workflow_status, workflow_stage, priority);
+        -- the API folds these into per-stage, per-type and per-priority totals
+        'orders', (
+            SELECT coalesce(json_agg(g), '[]'::JSON)
+            FROM (
+                SELECT
+                    workflow_type::TEXT AS workflow_type,
+                    workflow_status::TEXT AS workflow_status,
+                    workflow_stage,
+                    upper(priority::TEXT) AS priority,
+                    count(*) AS count
+                FROM orders
+                GROUP BY 1, 2, 3, 4
+            ) g
+        ),
+        'orders_completed_this_month', (
+            SELECT count(*)
+            FROM orders
+            WHERE workflow_status::TEXT IN ('COMPLETED', 'ORDER_COMPLETED')
+                AND updated_at >= date_trunc('month', p_today)
+        ),
+        'tasks_by_status', (
+            SELECT coalesce(json_object_agg(status, count), '{}'::JSON)
+            FROM (
+                SELECT coalesce(status::TEXT, 'UNKNOWN') AS status, count(*) AS count
+                FROM tasks
+                GROUP BY 1
+            ) g
+        ),
+        'tasks_by_assignee', (
+            SELECT coalesce(json_agg(g ORDER BY g.overdue DESC, g.open DESC), '[]'::JSON)
+            FROM (
+                SELECT
+                    assigned_to,
+                    count(*) AS open,
+                    count(*) FILTER (WHERE due_date < p_today) AS overdue,
+                    count(*) FILTER (WHERE due_date = p_today) AS due_today,
+                    count(*) FILTER (
+                        WHERE due_date > p_today AND due_date <= p_today + p_upcoming_days
+                    ) AS upcoming
+                FROM open_tasks
+                GROUP BY assigned_to
+            ) g
+        ),
+        'overdue_tasks', (
+            SELECT coalesce(json_agg(t ORDER BY t.due_date, t.task_id), '[]'::JSON)
+            FROM (
+                SELECT * FROM open_tasks
+                WHERE due_date < p_today
+                ORDER BY due_date, task_id
+                LIMIT p_list_limit
+            ) t
+        ),
+        'due_today_tasks', (
+            SELECT coalesce(json_agg(t ORDER BY t.task_id), '[]'::JSON)
+            FROM (
+                SELECT * FROM open_tasks
+                WHERE due_date = p_today
+                ORDER BY task_id
+                LIMIT p_list_limit
+            ) t
+        ),
+        'upcoming_tasks', (
+            SELECT coalesce(json_agg(t ORDER BY t.due_date, t.task_id), '[]'::JSON)
+            FROM (
+                SELECT * FROM open_tasks
+                WHERE due_date > p_today AND due_date <= p_today + p_upcoming_days
+                ORDER BY due_date, task_id
+                LIMIT p_list_limit
+            ) t
+        ),
+        'recent_orders', (
+            SELECT coalesce(json_agg(o ORDER BY o.updated_at DESC NULLS LAST), '[]'::JSON)
+            FROM (
+                SELECT
+                    order_id, order_number, order_name, workflow_type, workflow_status,
+                    workflow_stage, customer_id, created_at, updated_at
+                FROM orders
+                ORDER BY updated_at DESC NULLS LAST
+                LIMIT p_list_limit
+            ) o
+        ),
+        'recent_activity', (
+            SELECT coalesce(json_agg(e ORDER BY e.created_at DESC), '[]'::JSON)
+            FROM (
+                SELECT event_id, order_id, event_type, description, created_by, created_at
+                FROM order_events
+                ORDER BY created_at DESC
+                LIMIT p_list_limit * 2
+            ) e
+        )
+    );
+$$ LANGUAGE sql STABLE;
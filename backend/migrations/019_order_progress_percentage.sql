@@ -0,0 +1,10 @@
+-- Migration 019: Persist order progress
+-- Description: GET /orders recomputed progress_percentage from completed_statuses for
+-- every row, while update-stage wrote a different, stage-based value to the same
+-- column. Progress is now written by the API on every status write.
+-- After applying, run `python backfill_orders.py` to populate existing rows.
+
+ALTER TABLE orders
+ADD COLUMN IF NOT EXISTS progress_percentage INTEGER NOT NULL DEFAULT 0;
+
+COMMENT ON COLUMN orders.progress_percentage IS 'Completed statuses over the workflow''s total statuses (0-100), maintained by the API on status writes';
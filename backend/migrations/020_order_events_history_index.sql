@@ -0,0 +1,6 @@
+-- Migration 020: Keyset index for order history
+-- Description: GET /orders/{order_id}/history pages an order's events newest first on
+-- (created_at, event_id) and counts them on the first page; both are served by this index.
+
+CREATE INDEX IF NOT EXISTS idx_order_events_order_created_at
+ON order_events(order_id, created_at DESC, event_id DESC);
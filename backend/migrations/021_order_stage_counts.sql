@@ -0,0 +1,22 @@
+-- Migration 021: Order counts per stage in one query
+-- Description: The order list's stage cards counted the loaded page in the browser,
+-- then one count query per stage. order_stage_counts() groups the orders once, with
+-- the list's customer filter, and is served by GET /orders/stage-counts.
+
+-- Rows are grouped by stored stage; orders written before migration 014 have no
+-- stage yet, so those are also grouped by status and workflow type and the API
+-- maps them to their stage the same way the list does
+CREATE OR REPLACE FUNCTION order_stage_counts(p_customer_id TEXT DEFAULT NULL)
+RETURNS JSON AS $$
+    SELECT coalesce(json_agg(g), '[]'::JSON)
+    FROM (
+        SELECT
+            workflow_stage,
+            CASE WHEN workflow_stage IS NULL THEN workflow_status::TEXT END AS workflow_status,
+            CASE WHEN workflow_stage IS NULL THEN workflow_type::TEXT END AS workflow_type,
+            count(*) AS count
+        FROM orders
+        WHERE p_customer_id IS NULL OR customer_id::TEXT = p_customer_id
+        GROUP BY 1, 2, 3
+    ) g;
+$$ LANGUAGE sql STABLE;
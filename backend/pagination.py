@@ -0,0 +1,75 @@
+# pagination.py
+import base64
+import json
+from typing import Any, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Encode the sort key of the last row on a page into an opaque cursor"""
+    raw = json.dumps(list(values), separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """Decode a cursor produced by encode_cursor, rejecting anything malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+    return values
+
+
+def _quote(value: Any) -> str:
+    # Values such as timestamps and names contain characters that PostgREST
+    # treats as syntax inside or=(...), so always send them double-quoted
+    escaped = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{escaped}"'
+
+
+def _keyset_filter(columns: Sequence[str], values: Sequence[Any], op: str) -> str:
+    # (a, b) < (x, y)  is  a < x OR (a = x AND b < y), applied recursively
+    column, value = columns[0], _quote(values[0])
+    if len(columns) == 1:
+        return f"{column}.{op}.{value}"
+    rest = _keyset_filter(columns[1:], values[1:], op)
+    if len(columns) > 2:
+        rest = f"or({rest})"
+    return f"{column}.{op}.{value},and({column}.eq.{value},{rest})"
+
+
+def apply_keyset(query, columns: Sequence[str], cursor: Optional[str], limit: int, desc: bool = True):
+    """Order a PostgREST query by the key columns and continue after the cursor.
+
+    One extra row is requested so split_page can tell whether another page exists.
+    """
+    if cursor:
+        values = decode_cursor(cursor, len(columns))
+        # postgrest-py has no or_() helper in the pinned version, so add the
+        # logic tree as a raw query parameter
+        keyset = _keyset_filter(columns, values, "lt" if desc else "gt")
+        query.params = query.params.add("or", f"({keyset})")
+
+    # One order parameter listing every key column: the pinned postgrest-py
+    # adds a separate parameter per order() call, and PostgREST applies only one
+    direction = "desc" if desc else "asc"
+    query.params = query.params.add(
+        "order", ",".join(f"{column}.{direction}" for column in columns)
+    )
+
+    return query.limit(limit + 1)
+
+
+def split_page(rows: List[dict], columns: Sequence[str], limit: int) -> Tuple[List[dict], Optional[str]]:
+    """Trim the look-ahead row and build the cursor for the next page"""
+    if len(rows) <= limit:
+        return rows, None
+
+    page = rows[:limit]
+    return page, encode_cursor([page[-1].get(column) for column in columns])
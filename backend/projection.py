@@ -0,0 +1,58 @@
+# projection.py
+from typing import Dict, Iterable, Optional, Sequence
+
+from fastapi import HTTPException
+
+
+class Projection:
+    """Resolve a fields= query parameter into the columns a list endpoint reads.
+
+    Without fields= the endpoint's default list is used, and fields=* asks for
+    whole rows. Required columns (pagination keys) and the source columns of
+    requested derived fields are always read; apply() drops them from rows
+    again unless they were asked for.
+    """
+
+    def __init__(
+        self,
+        fields: Optional[str],
+        allowed: Sequence[str],
+        default: Sequence[str],
+        required: Sequence[str] = (),
+        derived: Optional[Dict[str, Sequence[str]]] = None,
+    ):
+        derived = derived or {}
+        self.all_columns = bool(fields) and fields.strip() == "*"
+
+        if self.all_columns:
+            self.fields = tuple(allowed) + tuple(derived)
+        elif fields:
+            requested = [field.strip() for field in fields.split(",") if field.strip()]
+            unknown = [field for field in requested if field not in allowed and field not in derived]
+            if unknown:
+                raise HTTPException(
+                    status_code=400, detail=f"Unknown fields: {', '.join(unknown)}"
+                )
+            self.fields = tuple(dict.fromkeys(requested))
+        else:
+            self.fields = tuple(default)
+
+        columns = [field for field in self.fields if field not in derived]
+        for field in self.fields:
+            columns.extend(derived.get(field, ()))
+        columns.extend(required)
+        self.columns = tuple(dict.fromkeys(columns))
+        self._returned = set(self.fields)
+
+    @property
+    def select(self) -> str:
+        return "*" if self.all_columns else ", ".join(self.columns)
+
+    def wants(self, field: str) -> bool:
+        return field in self._returned
+
+    def apply(self, rows: Iterable[dict]) -> list:
+        """Trim helper columns from rows that were read for the endpoint's own use"""
+        if self.all_columns:
+            return list(rows)
+        return [{key: value for key, value in row.items() if key in self._returned} for row in rows]
@@ -0,0 +1,108 @@
+# columns.py
+# Columns clients may request through fields= on list endpoints
+
+ORDER_COLUMNS = (
+    "order_id",
+    "order_number",
+    "order_name",
+    "customer_id",
+    "workflow_type",
+    "workflow_status",
+    "workflow_stage",
+    "completed_statuses",
+    "completed_stages",
+    "progress_percentage",
+    "last_status_update",
+    "project_address",
+    "project_city",
+    "project_state",
+    "project_zip",
+    "site_visit_scheduled_date",
+    "site_visit_completed_date",
+    "site_visit_notes",
+    "detailed_measurement_date",
+    "detailed_measurement_notes",
+    "work_order_number",
+    "work_order_sent_date",
+    "work_order_signed_date",
+    "work_order_file_url",
+    "scope_of_work",
+    "estimated_total",
+    "actual_total",
+    "deposit_required",
+    "deposit_percentage",
+    "deposit_amount",
+    "deposit_received_date",
+    "balance_due",
+    "payment_method",
+    "delivery_type",
+    "delivery_scheduled_date",
+    "delivery_confirmed_date",
+    "installation_start_date",
+    "installation_end_date",
+    "installer_id",
+    "notes",
+    "priority",
+    "tags",
+    "created_by",
+    "created_at",
+    "updated_at",
+)
+
+TASK_COLUMNS = (
+    "task_id",
+    "title",
+    "description",
+    "task_type",
+    "order_id",
+    "related_entity_type",
+    "related_entity_id",
+    "assigned_to",
+    "status",
+    "priority",
+    "start_date",
+    "due_date",
+    "scheduled_date",
+    "completed_date",
+    "estimated_hours",
+    "actual_hours",
+    "completion_percentage",
+    "predecessor_task_id",
+    "recurring",
+    "recurrence_pattern",
+    "recurrence_end_date",
+    "reminder_date",
+    "reminder_sent",
+    "auto_generated",
+    "notes",
+    "created_by",
+    "created_at",
+    "updated_at",
+)
+
+WORK_ITEM_COLUMNS = (
+    "id",
+    "description",
+    "status",
+    "priority",
+    "assigned_to",
+    "entered_by",
+    "last_action",
+    "next_action",
+    "notes",
+    "due_date",
+    "project_id",
+    "last_status_update",
+)
+
+# Default for /work-items and /employees/work-items when fields= is not given
+WORK_ITEM_LIST_FIELDS = (
+    "id",
+    "description",
+    "status",
+    "priority",
+    "assigned_to",
+    "next_action",
+    "due_date",
+    "project_id",
+)
@@ -1,4 +1,6 @@
 # workflow_constants.py
+from types import MappingProxyType
+from typing import Mapping, NamedTuple, Optional, Tuple
 
 # Materials Only Workflow Stages
 
@@ -123,6 +125,126 @@ def get_workflow_stages(workflow_type):
     return MATERIALS_ONLY_STAGES
 
 
+class WorkflowTable(NamedTuple):
+    """Lookup tables for one workflow type, compiled once at import."""
+
+    statuses: Tuple[dict, ...]  # status dicts in workflow order
+    status_ids: Tuple[str, ...]
+    status_index: Mapping[str, int]
+    status_stage: Mapping[str, str]
+    stage_ids: Tuple[str, ...]
+    stage_statuses: Mapping[str, Tuple[str, ...]]
+    next_status: Mapping[str, Optional[str]]
+    total_statuses: int
+
+
+def _compile_workflow(stages):
+    statuses = tuple(status for stage in stages for status in stage["statuses"])
+    status_ids = tuple(status["id"] for status in statuses)
+
+    return WorkflowTable(
+        statuses=statuses,
+        status_ids=status_ids,
+        status_index=MappingProxyType({sid: i for i, sid in enumerate(status_ids)}),
+        status_stage=MappingProxyType(
+            {status["id"]: stage["id"] for stage in stages for status in stage["statuses"]}
+        ),
+        stage_ids=tuple(stage["id"] for stage in stages),
+        stage_statuses=MappingProxyType(
+            {stage["id"]: tuple(status["id"] for status in stage["statuses"]) for stage in stages}
+        ),
+        next_status=MappingProxyType(
+            {sid: (status_ids[i + 1] if i + 1 < len(status_ids) else None) for i, sid in enumerate(status_ids)}
+        ),
+        total_statuses=len(status_ids),
+    )
+
+
+WORKFLOW_TABLES = MappingProxyType(
+    {
+        "MATERIALS_ONLY": _compile_workflow(MATERIALS_ONLY_STAGES),
+        "MATERIALS_AND_INSTALLATION": _compile_workflow(MATERIALS_AND_INSTALLATION_STAGES),
+    }
+)
+
+
+def get_workflow_table(workflow_type):
+    """Get the compiled lookup tables for a workflow type (defaults to MATERIALS_ONLY)"""
+    return WORKFLOW_TABLES.get(workflow_type) or WORKFLOW_TABLES["MATERIALS_ONLY"]
+
+
+def calculate_progress_percentage(completed_statuses, workflow_type=None):
+    """Completed statuses over the workflow's total statuses, as a whole percentage.
+
+    This is the value stored in orders.progress_percentage on every status
+    write, and the same calculation the frontend OrderDetail page uses.
+    """
+    total_statuses = get_workflow_table(workflow_type).total_statuses
+    if not total_statuses:
+        return 0
+    return round((len(completed_statuses or []) / total_statuses) * 100)
+
+
+# Stage for statuses that predate the current workflows (or arrive without a
+# workflow type), kept so older orders still land in a sensible stage
+LEGACY_STATUS_STAGES = MappingProxyType(
+    {
+        status: stage
+        for stage, statuses in (
+            ("LEAD_ACQUISITION", ("NEW_LEAD",)),
+            (
+                "QUOTATION",
+                (
+                    "QUOTE_REQUESTED", "SITE_VISIT_SCHEDULED", "SITE_VISIT_COMPLETED",
+                    "DETAILED_MEASUREMENT_SCHEDULED", "DETAILED_MEASUREMENT_COMPLETED",
+                    "QUOTE_PREPARED", "QUOTE_SENT", "QUOTE_APPROVED",
+                ),
+            ),
+            (
+                "PROCUREMENT",
+                (
+                    "WORK_ORDER_SENT", "WORK_ORDER_SIGNED", "MATERIALS_ORDERED",
+                    "MATERIALS_RECEIVED", "MATERIALS_BACKORDERED",
+                ),
+            ),
+            (
+                "FULFILLMENT",
+                (
+                    "DELIVERY_SCHEDULED", "DELIVERY_COMPLETED", "INSTALLATION_SCHEDULED",
+                    "INSTALLATION_IN_PROGRESS", "INSTALLATION_COMPLETED", "DELIVERY_DELAYED",
+                    "INSTALLATION_DELAYED",
+                ),
+            ),
+            ("FINALIZATION", ("FINAL_INSPECTION", "PAYMENT_RECEIVED", "ORDER_COMPLETED", "FOLLOW_UP_SCHEDULED")),
+            ("CANCELLED", ("ORDER_CANCELLED", "QUOTE_REJECTED")),
+            (
+                "ON_HOLD",
+                (
+                    "CUSTOMER_COMMUNICATION_NEEDED", "AWAITING_CUSTOMER_APPROVAL",
+                    "CHANGE_ORDER_REQUESTED", "PAYMENT_PENDING",
+                ),
+            ),
+        )
+        for status in statuses
+    }
+)
+
+
+def map_workflow_status_to_stage(workflow_status, workflow_type=None):
+    """Map specific workflow status to broader stage for filtering"""
+    if not workflow_status:
+        return "LEAD_ACQUISITION"
+
+    status = workflow_status.upper()
+
+    if workflow_type:
+        stage = get_workflow_table(workflow_type).status_stage.get(status)
+        if stage:
+            return stage
+
+    return LEGACY_STATUS_STAGES.get(status, "LEAD_ACQUISITION")  # Default fallback
+
+
 def get_all_statuses(workflow_type):
     """
     Get all status IDs for a specific workflow type.
@@ -133,30 +255,20 @@ def get_all_statuses(workflow_type):
     Returns:
         list: List of all status IDs for the specified workflow type
     """
-    stages = []
-    if workflow_type == "MATERIALS_AND_INSTALLATION":
-        stages = MATERIALS_AND_INSTALLATION_STAGES
-    else:
-        stages = MATERIALS_ONLY_STAGES
-
-    statuses = []
-    for stage in stages:
-        for status in stage["statuses"]:
-            statuses.append(status)
-
-    return statuses
+    return list(get_workflow_table(workflow_type).statuses)
 
 
 # Function to find the next status in workflow
 def get_next_status(workflow_type, current_status_id, selected_stages):
-    stages = get_workflow_stages(workflow_type)
-    all_statuses = []
-
-    # Build list of all statuses from selected stages
-    for stage in stages:
-        if stage["id"] in selected_stages:
-            for status in stage["statuses"]:
-                all_statuses.append(status["id"])
+    table = get_workflow_table(workflow_type)
+
+    # Walk the statuses of the selected stages only
+    all_statuses = [
+        status_id
+        for stage_id in table.stage_ids
+        if stage_id in selected_stages
+        for status_id in table.stage_statuses[stage_id]
+    ]
 
     if current_status_id in all_statuses:
         current_index = all_statuses.index(current_status_id)
@@ -2,7 +2,9 @@
 from fastapi import APIRouter, HTTPException, Response, Request, Depends
 from fastapi.security import HTTPBearer
 from pydantic import BaseModel
-from database import supabase
+from database import db, supabase
+from starlette.concurrency import run_in_threadpool
+from auth import verify_token
 import logging
 import os
 from typing import Optional
@@ -48,28 +50,36 @@ def get_token_from_cookie(request: Request) -> Optional[str]:
     return cookie_token
 
 
-async def get_current_user(request: Request):
-    """Get current user from token cookie"""
+async def get_current_user(request: Request) -> Optional[dict]:
+    """Get the verified token claims from the token cookie"""
     token = get_token_from_cookie(request)
 
     if not token:
         return None
 
     try:
-        # Get user data from Supabase
-        user_response = supabase.auth.get_user(token)
-        return user_response.user
-    except Exception as e:
-        logger.error(f"Error getting user from token: {str(e)}")
+        return verify_token(token)
+    except HTTPException as he:
+        logger.info(f"Rejected token cookie: {he.detail}")
         return None
 
 
+def user_profile_from_claims(claims: dict) -> dict:
+    metadata = claims.get("user_metadata") or {}
+    return {
+        "id": claims.get("sub"),
+        "email": claims.get("email"),
+        "first_name": metadata.get("first_name"),
+        "last_name": metadata.get("last_name"),
+    }
+
+
 @router.post("/signup")
 async def signup(request: AuthRequest):
     try:
         # Check if user already exists
         existing_users = (
-            supabase.table("profiles").select("*").eq("email", request.email).execute()
+            await db.table("profiles").select("*").eq("email", request.email).execute()
         )
         if existing_users.data and len(existing_users.data) > 0:
             raise HTTPException(
@@ -77,7 +87,8 @@ async def signup(request: AuthRequest):
             )
 
         # Create user with Supabase auth
-        auth_response = supabase.auth.sign_up(
+        auth_response = await run_in_threadpool(
+            supabase.auth.sign_up,
             {"email": request.email, "password": request.password}
         )
 
@@ -86,7 +97,7 @@ async def signup(request: AuthRequest):
 
         # Optionally create user profile in database
         user_id = auth_response.user.id
-        supabase.table("profiles").insert(
+        await db.table("profiles").insert(
             {"id": user_id, "email": request.email, "created_at": "now()"}
         ).execute()
 
@@ -104,7 +115,8 @@ async def login(request: AuthRequest, response: Response):
         logger.info(f"Login attempt for email: {request.email}")
 
         # Sign in with Supabase
-        auth_response = supabase.auth.sign_in_with_password(
+        auth_response = await run_in_threadpool(
+            supabase.auth.sign_in_with_password,
             {"email": request.email, "password": request.password}
         )
 
@@ -169,16 +181,7 @@ async def get_user_profile(request: Request):
         raise HTTPException(status_code=401, detail="Not authenticated")
 
     # Return user data
-    return {
-        "id": user.id,
-        "email": user.email,
-        "first_name": (
-            user.user_metadata.get("first_name") if user.user_metadata else None
-        ),
-        "last_name": (
-            user.user_metadata.get("last_name") if user.user_metadata else None
-        ),
-    }
+    return user_profile_from_claims(user)
 
 
 @router.post("/refresh-token")
@@ -191,7 +194,9 @@ async def refresh_token(request: Request, response: Response):
             raise HTTPException(status_code=401, detail="No refresh token")
 
         # Use Supabase to refresh token
-        refresh_response = supabase.auth.refresh_session(refresh_token)
+        refresh_response = await run_in_threadpool(
+            supabase.auth.refresh_session, refresh_token
+        )
 
         if not refresh_response or not refresh_response.session:
             raise HTTPException(status_code=401, detail="Token refresh failed")
@@ -234,7 +239,7 @@ async def check_auth(request: Request):
     try:
         user = await get_current_user(request)
 
-        if user and user.id:
+        if user and user.get("sub"):
             return {"authenticated": True}
         else:
             return {"authenticated": False}
@@ -276,10 +281,10 @@ async def get_root_tasks(request: Request):
             logger.warning("Unauthenticated request to get tasks")
             raise HTTPException(status_code=401, detail="Not authenticated")
 
-        logger.info(f"Fetching tasks for user: {user.email}")
+        logger.info(f"Fetching tasks for user: {user.get('email')}")
 
         # Query the tasks table instead of the work_items table
-        response = supabase.table("tasks").select("*").execute()
+        response = await db.table("tasks").select("*").execute()
 
         # Log the response for debugging
         logger.info(f"Tasks query successful. Found {len(response.data)} items")
@@ -0,0 +1,82 @@
+# backend/routes/change_routes.py
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import Dict, Any, Optional
+import json
+import logging
+import os
+import time
+from auth import get_current_user
+from services.change_feed import RESET, ChangeFilter, change_feed
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/changes", tags=["changes"])
+
+CHANGE_KINDS = ("order", "task", "order_event")
+
+# Seconds between keep-alive comments on an idle stream; proxies drop
+# connections that stay silent for too long
+CHANGE_FEED_HEARTBEAT = float(os.getenv("CHANGE_FEED_HEARTBEAT", "15"))
+
+
+def format_event(event: str, data: dict, event_id: Optional[str] = None) -> str:
+    lines = []
+    if event_id:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+@router.get("/stream")
+async def stream_changes(
+    request: Request,
+    kinds: Optional[str] = Query(None, description="Comma-separated kinds: order, task, order_event"),
+    order_id: Optional[str] = Query(None, description="Only changes to this order"),
+    assigned_to: Optional[str] = Query(None, description="Only task changes for this assignee"),
+    last_event_id: Optional[str] = Header(None),
+    current_user: Dict[str, Any] = Depends(get_current_user),
+):
+    """Server-Sent Events stream of order, task and order event changes.
+
+    Each change is sent as a "change" event. A "reset" event means changes
+    were missed and the client should refetch what it shows. The stream ends
+    when the access token expires; EventSource reconnects with the refreshed
+    cookie and Last-Event-ID, and missed changes are replayed.
+    """
+    kind_set = None
+    if kinds:
+        kind_set = frozenset(kind.strip() for kind in kinds.split(",") if kind.strip())
+        unknown = kind_set - set(CHANGE_KINDS)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown kinds: {', '.join(sorted(unknown))}")
+
+    change_filter = ChangeFilter(kinds=kind_set, order_id=order_id, assigned_to=assigned_to)
+    expires_at = current_user.get("exp") or time.time() + 3600
+
+    async def events():
+        subscription = change_feed.subscribe(change_filter, last_event_id)
+        try:
+            # Opening comment so proxies and the browser see the stream start
+            yield ": connected\n\n"
+            while time.time() < expires_at:
+                timeout = min(CHANGE_FEED_HEARTBEAT, max(expires_at - time.time(), 0))
+                item = await subscription.get(timeout)
+                if await request.is_disconnected():
+                    break
+                if item is None:
+                    yield ": keep-alive\n\n"
+                elif item is RESET:
+                    yield format_event("reset", {}, f"{change_feed.epoch}-{change_feed.last_id}")
+                else:
+                    yield format_event("change", item.as_message(), change_feed.event_id(item))
+        finally:
+            subscription.close()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
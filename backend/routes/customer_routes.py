@@ -3,8 +3,13 @@ from fastapi import APIRouter, HTTPException, Depends, Query
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 import logging
-from database import supabase
+from postgrest.types import CountMethod
+from database import db
 from auth import get_current_user
+from pagination import apply_keyset, decode_cursor, encode_cursor, split_page
+from projection import Projection
+from resources.columns import ORDER_COLUMNS
+from services.customer_search import invalidate_customer_search, search_customers
 from pydantic import BaseModel, Field
 from uuid import UUID
 
@@ -14,6 +19,24 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/customers", tags=["customers"])
 
+# Keyset pagination orders
+CUSTOMER_PAGE_KEYS = ("name", "customer_id")
+CUSTOMER_ORDER_PAGE_KEYS = ("created_at", "order_id")
+
+# Order columns returned for a customer unless fields= asks for others
+CUSTOMER_ORDER_LIST_FIELDS = (
+    "order_id",
+    "order_number",
+    "order_name",
+    "workflow_type",
+    "workflow_status",
+    "workflow_stage",
+    "priority",
+    "estimated_total",
+    "created_at",
+    "updated_at",
+)
+
 # Request/Response models
 class CustomerBase(BaseModel):
     name: str = Field(..., description="Customer name (individual for residential, company for commercial)")
@@ -49,38 +72,49 @@ class CustomerResponse(CustomerBase):
     created_at: datetime
     updated_at: datetime
 
-@router.get("/", response_model=List[CustomerResponse])
+class CustomerPage(BaseModel):
+    customers: List[CustomerResponse]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+
+@router.get("/", response_model=CustomerPage)
 async def get_customers(
-    search: Optional[str] = Query(None, description="Search by name or contact name"),
+    search: Optional[str] = Query(None, description="Search by name, contact, email, phone or address"),
     customer_type: Optional[str] = Query(None, description="Filter by customer type"),
-    limit: int = Query(100, le=1000),
-    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page's next_cursor"),
+    count: Optional[CountMethod] = Query(None, description="Include an exact or estimated total"),
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
-    """Get all customers with optional search and filtering"""
+    """Get a page of customers with optional search and filtering"""
     try:
+        # Searches are ranked by the indexed search_customers() function, so
+        # their cursor is a position in the ranking rather than a sort key
+        if search and search.strip():
+            offset = decode_cursor(cursor, 1)[0] if cursor else 0
+            if not isinstance(offset, int) or offset < 0:
+                raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+            customers = await search_customers(search, customer_type, limit + 1, offset)
+            next_cursor = encode_cursor([offset + limit]) if len(customers) > limit else None
+            return {"customers": customers[:limit], "next_cursor": next_cursor}
+
         # Build query
-        query = supabase.table("customers").select("*")
-        
-        # Add search filter if provided
-        if search:
-            query = query.or_(
-                f"name.ilike.%{search}%,"
-                f"contact_first_name.ilike.%{search}%,"
-                f"contact_last_name.ilike.%{search}%"
-            )
+        query = db.table("customers").select("*", count=count)
         
         # Add customer type filter if provided
         if customer_type:
             query = query.eq("customer_type", customer_type.upper())
         
-        # Add ordering and pagination
-        query = query.order("name").range(offset, offset + limit - 1)
+        # Keyset pagination on (name, customer_id)
+        query = apply_keyset(query, CUSTOMER_PAGE_KEYS, cursor, limit, desc=False)
         
         # Execute query
-        response = query.execute()
+        response = await query.execute()
         
-        return response.data
+        customers, next_cursor = split_page(response.data or [], CUSTOMER_PAGE_KEYS, limit)
+        return {"customers": customers, "next_cursor": next_cursor, "total": response.count}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching customers: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch customers: {str(e)}")
@@ -92,7 +126,7 @@ async def get_customer(
 ):
     """Get a specific customer by ID"""
     try:
-        response = supabase.table("customers").select("*").eq("customer_id", str(customer_id)).single().execute()
+        response = await db.table("customers").select("*").eq("customer_id", str(customer_id)).single().execute()
         
         if not response.data:
             raise HTTPException(status_code=404, detail="Customer not found")
@@ -120,9 +154,10 @@ async def create_customer(
         customer_data["customer_type"] = customer_data["customer_type"].upper()
         
         # Insert customer
-        response = supabase.table("customers").insert(customer_data).execute()
+        response = await db.table("customers").insert(customer_data).execute()
         
         if response.data:
+            invalidate_customer_search()
             logger.info(f"Customer created: {response.data[0]['customer_id']}")
             return response.data[0]
         else:
@@ -143,7 +178,7 @@ async def update_customer(
     """Update an existing customer"""
     try:
         # Get existing customer first
-        existing = supabase.table("customers").select("*").eq("customer_id", str(customer_id)).single().execute()
+        existing = await db.table("customers").select("*").eq("customer_id", str(customer_id)).single().execute()
         
         if not existing.data:
             raise HTTPException(status_code=404, detail="Customer not found")
@@ -164,9 +199,10 @@ async def update_customer(
         update_data["updated_at"] = datetime.utcnow().isoformat()
         
         # Update customer
-        response = supabase.table("customers").update(update_data).eq("customer_id", str(customer_id)).execute()
+        response = await db.table("customers").update(update_data).eq("customer_id", str(customer_id)).execute()
         
         if response.data:
+            invalidate_customer_search()
             logger.info(f"Customer updated: {customer_id}")
             return response.data[0]
         else:
@@ -186,7 +222,7 @@ async def delete_customer(
     """Delete a customer (will cascade delete related orders)"""
     try:
         # Check if customer has orders
-        orders_response = supabase.table("orders").select("order_id").eq("customer_id", str(customer_id)).execute()
+        orders_response = await db.table("orders").select("order_id").eq("customer_id", str(customer_id)).execute()
         
         if orders_response.data:
             raise HTTPException(
@@ -195,9 +231,10 @@ async def delete_customer(
             )
         
         # Delete customer
-        response = supabase.table("customers").delete().eq("customer_id", str(customer_id)).execute()
+        response = await db.table("customers").delete().eq("customer_id", str(customer_id)).execute()
         
         if response.data:
+            invalidate_customer_search()
             logger.info(f"Customer deleted: {customer_id}")
         else:
             raise HTTPException(status_code=404, detail="Customer not found")
@@ -211,14 +248,36 @@ async def delete_customer(
 @router.get("/{customer_id}/orders")
 async def get_customer_orders(
     customer_id: UUID,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page's next_cursor"),
+    count: Optional[CountMethod] = Query(None, description="Include an exact or estimated total"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, or * for whole rows"),
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
-    """Get all orders for a specific customer"""
+    """Get a page of orders for a specific customer, newest first"""
     try:
-        response = supabase.table("orders").select("*").eq("customer_id", str(customer_id)).order("created_at", desc=True).execute()
-        
-        return {"customer_id": customer_id, "orders": response.data, "total": len(response.data)}
-        
+        projection = Projection(
+            fields, ORDER_COLUMNS, CUSTOMER_ORDER_LIST_FIELDS, required=CUSTOMER_ORDER_PAGE_KEYS
+        )
+        query = (
+            db.table("orders")
+            .select(projection.select, count=count)
+            .eq("customer_id", str(customer_id))
+        )
+
+        # Keyset pagination on (created_at, order_id)
+        query = apply_keyset(query, CUSTOMER_ORDER_PAGE_KEYS, cursor, limit)
+        response = await query.execute()
+
+        orders, next_cursor = split_page(response.data or [], CUSTOMER_ORDER_PAGE_KEYS, limit)
+        return {
+            "customer_id": customer_id,
+            "orders": projection.apply(orders),
+            "next_cursor": next_cursor,
+            "total": response.count,
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching orders for customer {customer_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch customer orders: {str(e)}")
\ No newline at end of file
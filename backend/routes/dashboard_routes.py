@@ -0,0 +1,21 @@
+# backend/routes/dashboard_routes.py
+from fastapi import APIRouter, HTTPException, Depends
+from typing import Dict, Any
+import logging
+from auth import get_current_user
+from services.dashboard import get_dashboard_summary
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/dashboard", tags=["dashboard"])
+
+
+@router.get("/summary")
+async def dashboard_summary(current_user: Dict[str, Any] = Depends(get_current_user)):
+    """Order and task counts, per-assignee task load and recent activity for the dashboard"""
+    try:
+        return await get_dashboard_summary()
+    except Exception as e:
+        logger.error(f"Error building dashboard summary: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to load dashboard summary: {str(e)}")
@@ -1,7 +1,11 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Depends
+from fastapi import APIRouter, HTTPException, UploadFile, File, Depends, Query
+from typing import Optional
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from database import supabase, SUPABASE_BUCKET, SUPABASE_URL
+from database import db, supabase, SUPABASE_BUCKET, SUPABASE_URL
 from auth import get_current_user
+from projection import Projection
+from resources.columns import WORK_ITEM_COLUMNS, WORK_ITEM_LIST_FIELDS
 
 router = APIRouter(prefix="/employees", tags=["employees"])
 
@@ -25,7 +29,7 @@ class EmployeeUpdate(BaseModel):
 async def get_employees(current_user: dict = Depends(get_current_user)):
     """Get all active employees for dropdowns and selection"""
     try:
-        response = supabase.table("employees").select("employee_id, full_name, email").eq("is_active", True).execute()
+        response = await db.table("employees").select("employee_id, full_name, email").eq("is_active", True).execute()
         employees = response.data
         
         # Format the data for the frontend
@@ -44,8 +48,12 @@ async def get_employees(current_user: dict = Depends(get_current_user)):
 
 
 @router.get("/work-items")
-async def read_work_items(current_user: dict = Depends(get_current_user)):
-    response = supabase.table("work_items").select("*").execute()
+async def read_work_items(
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, or * for whole rows"),
+    current_user: dict = Depends(get_current_user),
+):
+    projection = Projection(fields, WORK_ITEM_COLUMNS, WORK_ITEM_LIST_FIELDS)
+    response = await db.table("work_items").select(projection.select).execute()
     work_items = response.data
     return {"work_items": work_items}
 
@@ -60,13 +68,15 @@ async def add_employee(
     if image and image.filename != "":
         image_filename = f"{employee.first_name}_{employee.last_name}_{image.filename}"
         file_content = await image.read()
-        res = supabase.storage.from_(SUPABASE_BUCKET).upload(
-            image_filename, file_content
+        res = await run_in_threadpool(
+            supabase.storage.from_(SUPABASE_BUCKET).upload,
+            image_filename,
+            file_content,
         )
         if res.status_code == 200:
             image_url = f"{SUPABASE_URL}/storage/v1/object/public/{SUPABASE_BUCKET}/{image_filename}"
 
-    supabase.table("employees").insert(
+    await db.table("employees").insert(
         {
             "first_name": employee.first_name,
             "last_name": employee.last_name,
@@ -90,8 +100,10 @@ async def edit_employee(
     if image and image.filename != "":
         image_filename = f"{employee.first_name}_{employee.last_name}_{image.filename}"
         file_content = await image.read()
-        res = supabase.storage.from_(SUPABASE_BUCKET).upload(
-            image_filename, file_content
+        res = await run_in_threadpool(
+            supabase.storage.from_(SUPABASE_BUCKET).upload,
+            image_filename,
+            file_content,
         )
         if res.status_code == 200:
             image_url = f"{SUPABASE_URL}/storage/v1/object/public/{SUPABASE_BUCKET}/{image_filename}"
@@ -100,7 +112,7 @@ async def edit_employee(
     if image_url:
         update_data["image_url"] = image_url
 
-    supabase.table("employees").update(update_data).eq("id", employee_id).execute()
+    await db.table("employees").update(update_data).eq("id", employee_id).execute()
 
     return {"message": "Employee updated successfully"}
 
@@ -109,7 +121,7 @@ async def edit_employee(
 async def deactivate_employee(
     employee_id: int, current_user: dict = Depends(get_current_user)
 ):
-    supabase.table("employees").update({"is_active": False}).eq(
+    await db.table("employees").update({"is_active": False}).eq(
         "id", employee_id
     ).execute()
     return {"message": "Employee deactivated successfully"}
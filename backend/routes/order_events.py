@@ -4,7 +4,10 @@ from typing import List, Optional, Dict, Any
 from pydantic import BaseModel, Field
 from datetime import datetime
 import logging
-from database import supabase
+from database import db
+from services.change_feed import change_feed
+from services.order_cache import require_order
+from services.user_directory import attach_user_emails
 from auth import get_current_user
 
 # Set up logging
@@ -70,7 +73,8 @@ async def create_order_event(
         }
 
         # Insert event into database
-        response = supabase.table("order_events").insert(event_data).execute()
+        response = await db.table("order_events").insert(event_data).execute()
+        change_feed.publish_many("order_event", "created", response.data)
 
         if not response.data:
             raise HTTPException(status_code=500, detail="Failed to create order event")
@@ -101,14 +105,10 @@ async def get_order_events(
             raise HTTPException(status_code=401, detail="Not authenticated")
 
         # Check if order exists
-        order = supabase.table("orders").select("*").eq("order_id", order_id).execute()
-        if not order.data:
-            raise HTTPException(
-                status_code=404, detail=f"Order with ID {order_id} not found"
-            )
+        await require_order(order_id)
 
         # Start query
-        query = supabase.table("order_events").select("*").eq("order_id", order_id)
+        query = db.table("order_events").select("*").eq("order_id", order_id)
 
         # Apply event type filter if provided
         if event_type:
@@ -118,25 +118,13 @@ async def get_order_events(
         query = query.order("created_at", desc=False).range(skip, skip + limit - 1)
 
         # Execute query
-        response = query.execute()
+        response = await query.execute()
 
         if not response.data:
             return []
 
-        # For each event, fetch the user's email/name for display purposes
-        events = response.data
-        for event in events:
-            if event.get("created_by"):
-                try:
-                    # Try to get user info from Supabase auth
-                    user_response = supabase.auth.admin.get_user_by_id(event["created_by"])
-                    if user_response.user and user_response.user.email:
-                        event["user_email"] = user_response.user.email
-                    else:
-                        event["user_email"] = "Unknown User"
-                except Exception as e:
-                    # If auth lookup fails, just use a default
-                    event["user_email"] = "System User"
+        # Resolve the user's email for display purposes in one batched lookup
+        events = await attach_user_emails(response.data)
 
         return events
 
@@ -181,7 +169,8 @@ async def record_stage_change(
         }
 
         # Insert event into database
-        response = supabase.table("order_events").insert(event_data).execute()
+        response = await db.table("order_events").insert(event_data).execute()
+        change_feed.publish_many("order_event", "created", response.data)
 
         if not response.data:
             raise HTTPException(status_code=500, detail="Failed to record stage change")
@@ -225,7 +214,8 @@ async def add_order_note(
         }
 
         # Insert event into database
-        response = supabase.table("order_events").insert(event_data).execute()
+        response = await db.table("order_events").insert(event_data).execute()
+        change_feed.publish_many("order_event", "created", response.data)
 
         if not response.data:
             raise HTTPException(status_code=500, detail="Failed to add note")
@@ -281,7 +271,8 @@ async def record_document_event(
         }
 
         # Insert event into database
-        response = supabase.table("order_events").insert(event_data).execute()
+        response = await db.table("order_events").insert(event_data).execute()
+        change_feed.publish_many("order_event", "created", response.data)
 
         if not response.data:
             raise HTTPException(
@@ -344,7 +335,8 @@ async def record_payment_event(
         }
 
         # Insert event into database
-        response = supabase.table("order_events").insert(event_data).execute()
+        response = await db.table("order_events").insert(event_data).execute()
+        change_feed.publish_many("order_event", "created", response.data)
 
         if not response.data:
             raise HTTPException(
@@ -422,7 +414,8 @@ async def record_task_event(
         }
 
         # Insert event into database
-        response = supabase.table("order_events").insert(event_data).execute()
+        response = await db.table("order_events").insert(event_data).execute()
+        change_feed.publish_many("order_event", "created", response.data)
 
         if not response.data:
             raise HTTPException(
@@ -478,7 +471,8 @@ async def record_workflow_status_change(
         }
 
         # Insert event into database
-        response = supabase.table("order_events").insert(event_data).execute()
+        response = await db.table("order_events").insert(event_data).execute()
+        change_feed.publish_many("order_event", "created", response.data)
 
         if not response.data:
             raise HTTPException(status_code=500, detail="Failed to record workflow status change")
@@ -1,12 +1,28 @@
 # backend/routes/order_routes.py
 from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import ORJSONResponse
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
+import asyncio
 import logging
-from database import supabase
+from postgrest.types import CountMethod
+from database import db
+from services.change_feed import change_feed
+from services.event_sink import audit_events
+from services.order_cache import invalidate_order, remember_order, require_order
+from services.user_directory import attach_user_emails
 from auth import get_current_user
+from http_cache import immutable
 from pydantic import BaseModel, Field
-from resources.workflow_constants import get_workflow_stages
+from resources.workflow_constants import (
+    WORKFLOW_TABLES,
+    calculate_progress_percentage,
+    get_workflow_table,
+    map_workflow_status_to_stage,
+)
+from pagination import apply_keyset, split_page
+from projection import Projection
+from resources.columns import ORDER_COLUMNS
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -24,51 +40,6 @@ WORKFLOW_STAGES = [
 ]
 
 
-def map_workflow_status_to_stage(workflow_status):
-    """Map specific workflow status to broader stage for filtering"""
-    if not workflow_status:
-        return "LEAD_ACQUISITION"
-    
-    status = workflow_status.upper()
-    
-    # LEAD_ACQUISITION stage
-    if status in ['NEW_LEAD']:
-        return 'LEAD_ACQUISITION'
-    
-    # QUOTATION stage
-    elif status in ['QUOTE_REQUESTED', 'SITE_VISIT_SCHEDULED', 'SITE_VISIT_COMPLETED',
-                   'DETAILED_MEASUREMENT_SCHEDULED', 'DETAILED_MEASUREMENT_COMPLETED',
-                   'QUOTE_PREPARED', 'QUOTE_SENT', 'QUOTE_APPROVED']:
-        return 'QUOTATION'
-    
-    # PROCUREMENT stage
-    elif status in ['WORK_ORDER_SENT', 'WORK_ORDER_SIGNED', 'MATERIALS_ORDERED',
-                   'MATERIALS_RECEIVED', 'MATERIALS_BACKORDERED']:
-        return 'PROCUREMENT'
-    
-    # FULFILLMENT stage
-    elif status in ['DELIVERY_SCHEDULED', 'DELIVERY_COMPLETED', 'INSTALLATION_SCHEDULED',
-                   'INSTALLATION_IN_PROGRESS', 'INSTALLATION_COMPLETED', 'DELIVERY_DELAYED',
-                   'INSTALLATION_DELAYED']:
-        return 'FULFILLMENT'
-    
-    # FINALIZATION stage
-    elif status in ['FINAL_INSPECTION', 'PAYMENT_RECEIVED', 'ORDER_COMPLETED',
-                   'FOLLOW_UP_SCHEDULED']:
-        return 'FINALIZATION'
-    
-    # Handle special cases
-    elif status in ['ORDER_CANCELLED', 'QUOTE_REJECTED']:
-        return 'CANCELLED'
-    
-    elif status in ['CUSTOMER_COMMUNICATION_NEEDED', 'AWAITING_CUSTOMER_APPROVAL',
-                   'CHANGE_ORDER_REQUESTED', 'PAYMENT_PENDING']:
-        return 'ON_HOLD'
-    
-    else:
-        return 'LEAD_ACQUISITION'  # Default fallback
-
-
 WORKFLOW_STAGES = [
     "LEAD_ACQUISITION",
     "QUOTATION", 
@@ -79,6 +50,37 @@ WORKFLOW_STAGES = [
     "CANCELLED",
 ]
 
+# Sort key for keyset pagination of order lists
+ORDER_PAGE_KEYS = ("created_at", "order_id")
+
+# Sort key for keyset pagination of an order's history
+ORDER_EVENT_PAGE_KEYS = ("created_at", "event_id")
+
+# Columns the order list returns unless the client asks for others with fields=
+ORDER_LIST_FIELDS = (
+    "order_id",
+    "order_number",
+    "order_name",
+    "customer_id",
+    "workflow_type",
+    "workflow_status",
+    "current_stage",
+    "progress_percentage",
+    "priority",
+    "project_address",
+    "project_city",
+    "project_state",
+    "work_order_number",
+    "estimated_total",
+    "created_at",
+    "updated_at",
+)
+
+# Fields computed for the order list and the columns they are computed from
+ORDER_DERIVED_FIELDS = {
+    "current_stage": ("workflow_stage", "workflow_status", "workflow_type"),
+}
+
 
 # Request/Response models
 class OrderBase(BaseModel):
@@ -114,7 +116,6 @@ class OrderUpdate(BaseModel):
     budget: Optional[float] = None
     order_manager_id: Optional[str] = None
     contract_signed_date: Optional[str] = None
-    progress_percentage: Optional[int] = None
     contract_number: Optional[str] = None
     contract_file_path: Optional[str] = None
     notes: Optional[str] = None
@@ -127,6 +128,24 @@ class OrderStageUpdate(BaseModel):
     notes: Optional[str] = None
 
 
+async def insert_side_effect_rows(rows_by_table: Dict[str, List[dict]]):
+    """Write audit rows with one multi-row insert per table, run concurrently.
+
+    The primary write has already succeeded by the time these are recorded, so
+    failures are logged rather than raised. Rows for one table must share the
+    same keys for PostgREST to accept them as a single insert.
+    """
+    tables = [table for table, rows in rows_by_table.items() if rows]
+    results = await asyncio.gather(
+        *(db.table(table).insert(rows_by_table[table]).execute() for table in tables),
+        return_exceptions=True,
+    )
+    for table, result in zip(tables, results):
+        if isinstance(result, Exception):
+            # Log but don't fail the request if recording fails
+            logger.warning(f"Failed to record {table} rows: {str(result)}")
+
+
 @router.post("/")
 async def create_order(
     order: OrderCreate, current_user: dict = Depends(get_current_user)
@@ -151,16 +170,23 @@ async def create_order(
 
         # Prepare order data for db
         order_data = order.dict(exclude={"selected_stages", "site_visit_required"})
+        order_data["workflow_stage"] = map_workflow_status_to_stage(
+            order.workflow_status, order.workflow_type
+        )
+        order_data["progress_percentage"] = 0  # No statuses are completed yet
         order_data["created_at"] = now
         order_data["updated_at"] = now
 
         # Insert order into database
-        response = supabase.table("orders").insert(order_data).execute()
+        response = await db.table("orders").insert(order_data).execute()
 
         if not response.data:
             raise HTTPException(status_code=500, detail="Failed to create order")
 
         created_order = response.data[0]
+        remember_order(created_order)
+        change_feed.publish("order", "created", created_order)
+        events = []
         
         # Create site visit record and task if required
         if order.site_visit_required:
@@ -173,7 +199,7 @@ async def create_order(
                     "created_at": now,
                     "updated_at": now
                 }
-                site_visit_response = supabase.table("site_visits").insert(site_visit_data).execute()
+                site_visit_response = await db.table("site_visits").insert(site_visit_data).execute()
                 logger.info(f"Site visit created for order {created_order['order_id']}")
                 
                 # Create task for site visit scheduling
@@ -200,28 +226,30 @@ async def create_order(
                         "created_at": now,
                         "updated_at": now
                     }
-                    task_response = supabase.table("tasks").insert(task_data).execute()
+                    task_response = await db.table("tasks").insert(task_data).execute()
+                    change_feed.publish_many("task", "created", task_response.data)
                     logger.info(f"Site visit scheduling task created for order {created_order['order_id']}")
                     
-                    # Create order event for task creation
+                    # Record the task creation together with the order creation event
                     if task_response.data:
-                        task_event_data = {
-                            "order_id": created_order["order_id"],
-                            "event_type": "task",
-                            "description": f"Task 'Schedule Site Visit' was automatically created and assigned",
-                            "created_by": current_user.get("id"),
-                            "created_at": now,
-                        }
-                        supabase.table("order_events").insert(task_event_data).execute()
-                        logger.info(f"Task creation event recorded for order {created_order['order_id']}")
+                        events.append(
+                            {
+                                "order_id": created_order["order_id"],
+                                "event_type": "task",
+                                "description": f"Task 'Schedule Site Visit' was automatically created and assigned",
+                                "new_stage": None,  # keep keys aligned for the batch insert
+                                "created_by": current_user.get("id"),
+                                "created_at": now,
+                            }
+                        )
                 
             except Exception as site_visit_error:
                 # Log but don't fail order creation if site visit creation fails
                 logger.warning(f"Failed to create site visit or task: {str(site_visit_error)}")
         
         # Record the order creation event
-        try:
-            event_data = {
+        events.append(
+            {
                 "order_id": created_order["order_id"],
                 "event_type": "order_creation",
                 "description": f"Order '{order.order_name or 'Untitled'}' was created" + (" with site visit requested and scheduling task assigned" if order.site_visit_required else ""),
@@ -229,10 +257,9 @@ async def create_order(
                 "created_by": current_user.get("id"),
                 "created_at": now,
             }
-            supabase.table("order_events").insert(event_data).execute()
-        except Exception as event_error:
-            # Log but don't fail order creation if event recording fails
-            logger.warning(f"Failed to record order creation event: {str(event_error)}")
+        )
+        audit_events.emit_many(events)
+        change_feed.publish_many("order_event", "created", events)
 
         return created_order
     except HTTPException as he:
@@ -248,102 +275,117 @@ async def get_orders(
     current_stage: Optional[str] = None,
     type: Optional[str] = None,
     customer_id: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500, description="Maximum number of orders to return"),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page's next_cursor"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, or * for whole rows"),
     current_user: dict = Depends(get_current_user),
 ):
-    """Get all orders with optional filtering"""
+    """Get a page of orders with optional filtering, newest first"""
     try:
         if not current_user:
             raise HTTPException(status_code=401, detail="Not authenticated")
 
-        # Start with base query - no stage filtering here
-        query = supabase.table("orders").select("*")
-        
-        # Apply non-stage filters
+        projection = Projection(
+            fields,
+            ORDER_COLUMNS,
+            ORDER_LIST_FIELDS,
+            required=ORDER_PAGE_KEYS,
+            derived=ORDER_DERIVED_FIELDS,
+        )
+        query = db.table("orders").select(projection.select)
+
+        # Stage is persisted on each status write, so it filters in the database
+        if current_stage:
+            query = query.eq("workflow_stage", current_stage)
         if type:
             query = query.eq("type", type)
         if customer_id:
             query = query.eq("customer_id", customer_id)
 
-        # Execute query
-        response = query.order("created_at", desc=True).execute()
+        # Keyset pagination on (created_at, order_id)
+        query = apply_keyset(query, ORDER_PAGE_KEYS, cursor, limit)
+        response = await query.execute()
 
-        if not response.data:
-            return {"orders": []}
+        orders, next_cursor = split_page(response.data or [], ORDER_PAGE_KEYS, limit)
 
-        # Add mapped stage and calculate progress for each order
+        # Stage and progress are stored on status writes; the mapping only runs
+        # for rows written before the backfill
         orders_with_stages = []
-        for order in response.data:
+        for order in orders:
             order_with_stage = dict(order)
-            mapped_stage = map_workflow_status_to_stage(order.get('workflow_status'))
-            order_with_stage['current_stage'] = mapped_stage
-            
-            # Calculate progress using the exact same method as frontend OrderDetail page
-            try:
-                # Use the same workflow API call that the frontend uses
-                workflow_type = order.get('workflow_type') or order.get('type') or 'MATERIALS_ONLY'
-                stages = get_workflow_stages(workflow_type)
-                
-                # Extract all statuses from stages (exactly like frontend does)
-                all_statuses = []
-                for stage in stages:
-                    if stage.get('statuses') and isinstance(stage['statuses'], list):
-                        for status in stage['statuses']:
-                            all_statuses.append(status)
-                
-                # Count completed statuses (same as frontend)
-                completed_statuses = order.get('completed_statuses', [])
-                if completed_statuses and len(all_statuses) > 0:
-                    progress = round((len(completed_statuses) / len(all_statuses)) * 100)
-                else:
-                    progress = 0
-                
-                
-                order_with_stage['progress_percentage'] = progress
-                
-            except Exception as progress_error:
-                logger.warning(f"Failed to calculate progress for order {order.get('order_id')}: {str(progress_error)}")
-                order_with_stage['progress_percentage'] = 0
-            
-            # Apply stage filter after mapping
-            if not current_stage or mapped_stage == current_stage:
-                orders_with_stages.append(order_with_stage)
+            if projection.wants('current_stage'):
+                order_with_stage['current_stage'] = order.get('workflow_stage') or map_workflow_status_to_stage(
+                    order.get('workflow_status'),
+                    order.get('workflow_type') or order.get('type') or 'MATERIALS_ONLY',
+                )
+
+            orders_with_stages.append(order_with_stage)
 
-        return {"orders": orders_with_stages}
+        # PostgREST rows are already JSON types, so skip jsonable_encoder's walk
+        return ORJSONResponse(
+            {"orders": projection.apply(orders_with_stages), "next_cursor": next_cursor}
+        )
+    except HTTPException as he:
+        raise he
     except Exception as e:
         logger.error(f"Error fetching orders: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error fetching orders: {str(e)}")
 
 
 @router.get("/order-stages")
+@immutable
 async def get_order_stages():
     """Get all valid order stages for filtering"""
     return {"stages": WORKFLOW_STAGES}
 
 
+@router.get("/stage-counts")
+async def get_order_stage_counts(
+    customer_id: Optional[str] = None,
+    current_user: dict = Depends(get_current_user),
+):
+    """Count orders per stage, with the same customer filter as the order list"""
+    try:
+        if not current_user:
+            raise HTTPException(status_code=401, detail="Not authenticated")
+
+        query = await db.rpc("order_stage_counts", {"p_customer_id": customer_id})
+        response = await query.execute()
+
+        counts = {stage: 0 for stage in WORKFLOW_STAGES}
+        for group in response.data or []:
+            # Orders written before migration 014 have no stored stage yet
+            stage = group.get("workflow_stage") or map_workflow_status_to_stage(
+                group.get("workflow_status"),
+                group.get("workflow_type") or "MATERIALS_ONLY",
+            )
+            counts[stage] = counts.get(stage, 0) + group["count"]
+        return {"counts": counts}
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        logger.error(f"Error counting orders by stage: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error counting orders by stage: {str(e)}")
+
+
 @router.get("/order-statuses")
+@immutable
 async def get_order_statuses(
     workflow_type: str = Query("MATERIALS_ONLY", description="Type of workflow")
 ):
     """Get all valid order statuses for a specific workflow type"""
     # Validate workflow type
-    if workflow_type not in ["MATERIALS_ONLY", "MATERIALS_AND_INSTALLATION"]:
+    if workflow_type not in WORKFLOW_TABLES:
         raise HTTPException(
             status_code=400,
             detail="Invalid workflow type. Must be MATERIALS_ONLY or MATERIALS_AND_INSTALLATION",
         )
 
-    # Get all statuses for the specified workflow type using same method as frontend
-    stages = get_workflow_stages(workflow_type)
-    all_statuses = []
-    for stage in stages:
-        if stage.get('statuses'):
-            for status in stage['statuses']:
-                all_statuses.append(status)
-
-    return {"statuses": all_statuses}
+    return {"statuses": list(WORKFLOW_TABLES[workflow_type].statuses)}
 
 
 @router.get("/order-priorities")
+@immutable
 async def get_order_priorities():
     """Get all valid order priorities"""
     priorities = ["Low", "Medium", "High", "Critical"]
@@ -351,6 +393,7 @@ async def get_order_priorities():
 
 
 @router.get("/order-types")
+@immutable
 async def get_order_types():
     """Get all valid order types"""
     # Since we no longer have different workflow types,
@@ -358,6 +401,13 @@ async def get_order_types():
     return {"types": ["ORDER"]}
 
 
+@router.get("/workflow-stages")
+@immutable
+async def get_workflow_stages_endpoint():
+    """Get all workflow stages"""
+    return {"stages": WORKFLOW_STAGES}
+
+
 @router.get("/{order_id}")
 async def get_order(order_id: str, current_user: dict = Depends(get_current_user)):
     """Get a specific order by ID"""
@@ -366,7 +416,7 @@ async def get_order(order_id: str, current_user: dict = Depends(get_current_user
             raise HTTPException(status_code=401, detail="Not authenticated")
 
         response = (
-            supabase.table("orders").select("*").eq("order_id", order_id).execute()
+            await db.table("orders").select("*").eq("order_id", order_id).execute()
         )
 
         if not response.data:
@@ -375,67 +425,52 @@ async def get_order(order_id: str, current_user: dict = Depends(get_current_user
             )
 
         order = response.data[0]
-        
-        # Get status history
-        status_history_response = (
-            supabase.table("order_status_history")
+        remember_order(order)
+
+        # The related lookups only depend on the order row, so issue them
+        # concurrently instead of paying one round trip after another
+        related_queries = [
+            db.table("order_status_history")
             .select("*")
             .eq("order_id", order_id)
-            .order("completed_at", desc=False)
-            .execute()
+            .order("completed_at", desc=False),
+            db.table("tasks").select("*").eq("order_id", order_id),
+            db.table("quotes").select("*").eq("order_id", order_id),
+            db.table("invoices").select("*").eq("order_id", order_id),
+        ]
+        if order.get("customer_id"):
+            related_queries.append(
+                db.table("customers")
+                .select("*")
+                .eq("customer_id", order["customer_id"])
+            )
+
+        (
+            status_history_response,
+            tasks_response,
+            quotes_response,
+            invoices_response,
+            *customer_responses,
+        ) = await asyncio.gather(
+            *(query.execute() for query in related_queries)
         )
-        if status_history_response.data:
-            order["status_history"] = status_history_response.data
-        else:
-            order["status_history"] = []
-        
+
+        order["status_history"] = status_history_response.data or []
+
         # Ensure completed_statuses is included (it should be from the main query)
         if "completed_statuses" not in order:
             order["completed_statuses"] = []
-            
+
         # Map workflow_status to current_status for frontend compatibility
         order["current_status"] = order.get("workflow_status")
 
-        # Get related tasks
-        tasks_response = (
-            supabase.table("tasks").select("*").eq("order_id", order_id).execute()
-        )
-        if tasks_response.data:
-            order["tasks"] = tasks_response.data
-        else:
-            order["tasks"] = []
+        order["tasks"] = tasks_response.data or []
 
-        # Get customer information
-        if order.get("customer_id"):
-            customer_response = (
-                supabase.table("customers")
-                .select("*")
-                .eq("customer_id", order["customer_id"])
-                .execute()
-            )
-            if customer_response.data:
-                order["customer"] = customer_response.data[0]
+        if customer_responses and customer_responses[0].data:
+            order["customer"] = customer_responses[0].data[0]
 
-        # Get related quotes
-        quotes_response = (
-            supabase.table("quotes").select("*").eq("order_id", order_id).execute()
-        )
-        if quotes_response.data:
-            order["quotes"] = quotes_response.data
-        else:
-            order["quotes"] = []
-
-        # Get related invoices
-        invoices_response = (
-            supabase.table("invoices")
-            .select("*")
-            .eq("order_id", order_id)
-            .execute()
-        )
-        if invoices_response.data:
-            order["invoices"] = invoices_response.data
-        else:
-            order["invoices"] = []
+        order["quotes"] = quotes_response.data or []
+        order["invoices"] = invoices_response.data or []
 
         return {
             "order": order,
@@ -462,7 +497,7 @@ async def update_order(
 
         # Check if order exists
         existing_order = (
-            supabase.table("orders").select("*").eq("order_id", order_id).execute()
+            await db.table("orders").select("*").eq("order_id", order_id).execute()
         )
 
         if not existing_order.data:
@@ -500,15 +535,18 @@ async def update_order(
 
         # Update order
         response = (
-            supabase.table("orders")
+            await db.table("orders")
             .update(update_data)
             .eq("order_id", order_id)
             .execute()
         )
+        invalidate_order(order_id)
 
         if not response.data:
             raise HTTPException(status_code=500, detail="Failed to update order")
 
+        change_feed.publish("order", "updated", response.data[0])
+
         return response.data[0]
     except HTTPException as he:
         raise he
@@ -530,7 +568,7 @@ async def update_order_stage(
 
         # Check if order exists
         existing_order = (
-            supabase.table("orders").select("*").eq("order_id", order_id).execute()
+            await db.table("orders").select("*").eq("order_id", order_id).execute()
         )
 
         if not existing_order.data:
@@ -593,28 +631,28 @@ async def update_order_stage(
             **completion_update,
         }
 
-        # Update progress percentage based on current stage
-        progress_percent = int((current_stage_index + 1) / len(WORKFLOW_STAGES) * 100)
-        update_data["progress_percentage"] = progress_percent
-
         response = (
-            supabase.table("orders")
+            await db.table("orders")
             .update(update_data)
             .eq("order_id", order_id)
             .execute()
         )
+        invalidate_order(order_id)
 
         if not response.data:
             raise HTTPException(status_code=500, detail="Failed to update order stage")
 
-        # Record the stage completion event
-        try:
-            if stage_update.notes:
-                description = f"Stage '{stage_update.stage}' completed: {stage_update.notes}"
-            else:
-                description = f"Stage '{stage_update.stage}' completed"
-                
-            event_data = {
+        change_feed.publish("order", "updated", response.data[0])
+
+        # Build the event and activity rows in memory; events go through the
+        # write-behind sink and activities are written with one multi-row insert
+        if stage_update.notes:
+            description = f"Stage '{stage_update.stage}' completed: {stage_update.notes}"
+        else:
+            description = f"Stage '{stage_update.stage}' completed"
+
+        events = [
+            {
                 "order_id": order_id,
                 "event_type": "stage_completion",
                 "description": description,
@@ -623,31 +661,9 @@ async def update_order_stage(
                 "created_by": current_user.get("id"),
                 "created_at": now,
             }
-            supabase.table("order_events").insert(event_data).execute()
-        except Exception as event_error:
-            # Log but don't fail if event recording fails
-            logger.warning(f"Failed to record stage completion event: {str(event_error)}")
-
-        # If moved to next stage, record stage transition event
-        if next_stage:
-            try:
-                event_data = {
-                    "order_id": order_id,
-                    "event_type": "stage_transition",
-                    "description": f"Moved to stage '{next_stage}' from '{stage_update.stage}'",
-                    "previous_stage": stage_update.stage,
-                    "new_stage": next_stage,
-                    "created_by": current_user.get("id"),
-                    "created_at": now,
-                }
-                supabase.table("order_events").insert(event_data).execute()
-            except Exception as event_error:
-                # Log but don't fail if event recording fails
-                logger.warning(f"Failed to record stage transition event: {str(event_error)}")
-
-        # Create activity record if you have an activities table
-        try:
-            activity_data = {
+        ]
+        activities = [
+            {
                 "order_id": order_id,
                 "user_id": current_user.get("id", 0),
                 "user_name": current_user.get("email", "unknown"),
@@ -656,16 +672,23 @@ async def update_order_stage(
                 "notes": stage_update.notes,
                 "created_at": now,
             }
+        ]
 
-            supabase.table("order_activities").insert(activity_data).execute()
-        except Exception as activity_error:
-            # Log but don't fail if activity recording fails
-            logger.error(f"Error recording activity: {str(activity_error)}")
-
-        # If moved to next stage, create another activity record
+        # If moved to next stage, record the transition as well
         if next_stage:
-            try:
-                next_activity_data = {
+            events.append(
+                {
+                    "order_id": order_id,
+                    "event_type": "stage_transition",
+                    "description": f"Moved to stage '{next_stage}' from '{stage_update.stage}'",
+                    "previous_stage": stage_update.stage,
+                    "new_stage": next_stage,
+                    "created_by": current_user.get("id"),
+                    "created_at": now,
+                }
+            )
+            activities.append(
+                {
                     "order_id": order_id,
                     "user_id": current_user.get("id", 0),
                     "user_name": current_user.get("email", "unknown"),
@@ -674,13 +697,11 @@ async def update_order_stage(
                     "notes": f"Advanced from {stage_update.stage}",
                     "created_at": now,
                 }
+            )
 
-                supabase.table("order_activities").insert(next_activity_data).execute()
-            except Exception as next_activity_error:
-                # Log but don't fail if activity recording fails
-                logger.error(
-                    f"Error recording next stage activity: {str(next_activity_error)}"
-                )
+        audit_events.emit_many(events)
+        change_feed.publish_many("order_event", "created", events)
+        await insert_side_effect_rows({"order_activities": activities})
 
         return response.data[0]
     except HTTPException as he:
@@ -702,19 +723,12 @@ async def get_order_activities(
             raise HTTPException(status_code=401, detail="Not authenticated")
 
         # Check if order exists
-        existing_order = (
-            supabase.table("orders").select("*").eq("order_id", order_id).execute()
-        )
-
-        if not existing_order.data:
-            raise HTTPException(
-                status_code=404, detail=f"Order with ID {order_id} not found"
-            )
+        await require_order(order_id)
 
         # Check if activities table exists, if not return empty list
         try:
             response = (
-                supabase.table("order_activities")
+                await db.table("order_activities")
                 .select("*")
                 .eq("order_id", order_id)
                 .order("created_at", desc=True)
@@ -743,14 +757,7 @@ async def delete_order(order_id: str, current_user: dict = Depends(get_current_u
             raise HTTPException(status_code=401, detail="Not authenticated")
 
         # Check if order exists
-        existing_order = (
-            supabase.table("orders").select("*").eq("order_id", order_id).execute()
-        )
-
-        if not existing_order.data:
-            raise HTTPException(
-                status_code=404, detail=f"Order with ID {order_id} not found"
-            )
+        await require_order(order_id)
 
         # Soft delete by changing to Cancelled stage
         now = datetime.now().isoformat()
@@ -761,15 +768,18 @@ async def delete_order(order_id: str, current_user: dict = Depends(get_current_u
         }
 
         response = (
-            supabase.table("orders")
+            await db.table("orders")
             .update(update_data)
             .eq("order_id", order_id)
             .execute()
         )
+        invalidate_order(order_id)
 
         if not response.data:
             raise HTTPException(status_code=500, detail="Failed to delete order")
 
+        change_feed.publish("order", "updated", response.data[0])
+
         return {"message": "Order cancelled successfully"}
     except HTTPException as he:
         raise he
@@ -778,103 +788,42 @@ async def delete_order(order_id: str, current_user: dict = Depends(get_current_u
         raise HTTPException(status_code=500, detail=f"Error deleting order: {str(e)}")
 
 
-@router.get("/workflow-stages")
-async def get_workflow_stages_endpoint():
-    """Get all workflow stages"""
-    return {"stages": WORKFLOW_STAGES}
-
-
 # Get order history events
 @router.get("/{order_id}/history")
 async def get_order_history(
     order_id: str,
-    limit: Optional[int] = Query(50, description="Limit the number of events returned"),
-    skip: Optional[int] = Query(0, description="Skip the first N events"),
+    limit: int = Query(50, ge=1, le=200, description="Limit the number of events returned"),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page's next_cursor"),
     event_type: Optional[str] = Query(None, description="Filter by event type"),
     current_user: dict = Depends(get_current_user),
 ):
-    """Get history events for a specific order"""
+    """Get a page of history events for a specific order, newest first"""
     try:
         if not current_user:
             raise HTTPException(status_code=401, detail="Not authenticated")
 
         # Check if order exists
-        order = supabase.table("orders").select("*").eq("order_id", order_id).execute()
-        if not order.data:
-            raise HTTPException(
-                status_code=404, detail=f"Order with ID {order_id} not found"
-            )
+        await require_order(order_id)
 
-        # Start with base query for order_events table
-        query = supabase.table("order_events").select("*").eq("order_id", order_id)
+        # The total is counted with the first page only; later pages reuse it
+        query = (
+            db.table("order_events")
+            .select("*", count=None if cursor else CountMethod.exact)
+            .eq("order_id", order_id)
+        )
 
         # Apply event type filter if provided
         if event_type:
             query = query.eq("event_type", event_type)
 
-        # Apply sorting and pagination
-        query = query.order("created_at", desc=True).range(skip, skip + limit - 1)
+        # Keyset pagination on (created_at, event_id)
+        query = apply_keyset(query, ORDER_EVENT_PAGE_KEYS, cursor, limit)
+        response = await query.execute()
 
-        # Execute query
-        response = query.execute()
+        events, next_cursor = split_page(response.data or [], ORDER_EVENT_PAGE_KEYS, limit)
+        events = await attach_user_emails(events)
 
-        # If no events found, generate some dummy events for demonstration
-        events = response.data or []
-        if not events:
-            # Create current timestamp for dummy data
-            current_timestamp = datetime.now()
-            user_id = current_user.get("id", "system")
-            user_email = current_user.get("email", "system@example.com")
-
-            # Generate dummy events
-            events = [
-                {
-                    "event_id": 1,
-                    "order_id": order_id,
-                    "event_type": "creation",
-                    "description": f"Order #{order_id} was created",
-                    "created_by": user_id,
-                    "created_at": (current_timestamp - timedelta(days=30)).isoformat(),
-                    "user_email": user_email,
-                },
-                {
-                    "event_id": 2,
-                    "order_id": order_id,
-                    "event_type": "stage_change",
-                    "description": "Order moved to QUOTATION stage",
-                    "previous_stage": "LEAD_ACQUISITION",
-                    "new_stage": "QUOTATION",
-                    "created_by": user_id,
-                    "created_at": (current_timestamp - timedelta(days=25)).isoformat(),
-                    "user_email": user_email,
-                },
-                {
-                    "event_id": 3,
-                    "order_id": order_id,
-                    "event_type": "note",
-                    "description": "Customer requested additional information about materials",
-                    "created_by": user_id,
-                    "created_at": (current_timestamp - timedelta(days=20)).isoformat(),
-                    "user_email": user_email,
-                },
-            ]
-
-            # If event_type filter is applied, filter the dummy events
-            if event_type:
-                events = [
-                    event for event in events if event["event_type"] == event_type
-                ]
-
-        # Return events with pagination info
-        return {
-            "events": events,
-            "pagination": {
-                "total": len(events),
-                "page": (skip // limit) + 1 if limit > 0 else 1,
-                "limit": limit,
-                "pages": (len(events) + limit - 1) // limit if limit > 0 else 1,
-            },
-        }
+        return {"events": events, "next_cursor": next_cursor, "total": response.count}
 
     except HTTPException as he:
         raise he
@@ -898,11 +847,7 @@ async def add_order_note(
             raise HTTPException(status_code=401, detail="Not authenticated")
 
         # Check if order exists
-        order = supabase.table("orders").select("*").eq("order_id", order_id).execute()
-        if not order.data:
-            raise HTTPException(
-                status_code=404, detail=f"Order with ID {order_id} not found"
-            )
+        await require_order(order_id)
 
         # Create note event
         event_data = {
@@ -915,11 +860,13 @@ async def add_order_note(
         }
 
         # Insert event
-        response = supabase.table("order_events").insert(event_data).execute()
+        response = await db.table("order_events").insert(event_data).execute()
 
         if not response.data:
             raise HTTPException(status_code=500, detail="Failed to add note")
 
+        change_feed.publish("order_event", "created", response.data[0])
+
         return {"message": "Note added successfully", "event": response.data[0]}
 
     except HTTPException as he:
@@ -942,7 +889,7 @@ async def set_current_order_status(
 
         # Get the order
         order_response = (
-            supabase.table("orders").select("*").eq("order_id", order_id).execute()
+            await db.table("orders").select("*").eq("order_id", order_id).execute()
         )
 
         if not order_response.data:
@@ -962,43 +909,37 @@ async def set_current_order_status(
         logger.info(f"Setting current status: order_id={order_id}, from={current_status} to={status_value}, workflow_type={workflow_type}")
 
         # Validate that the status exists in the current workflow
-        try:
-            from resources.workflow_constants import get_workflow_stages
-            stages = get_workflow_stages(workflow_type)
-            all_statuses = []
-            for stage in stages:
-                if stage.get('statuses'):
-                    for status in stage['statuses']:
-                        all_statuses.append(status['id'])
-            
-            if status_value not in all_statuses:
-                logger.warning(f"Status {status_value} not valid for workflow {workflow_type}. Available statuses: {all_statuses}")
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"Status '{status_value}' is not valid for workflow type '{workflow_type}'. Available statuses: {', '.join(all_statuses)}"
-                )
-            
-        except HTTPException:
-            raise
-        except Exception as validation_error:
-            logger.warning(f"Could not validate status: {str(validation_error)}")
+        table = get_workflow_table(workflow_type)
+        if status_value not in table.status_index:
+            logger.warning(f"Status {status_value} not valid for workflow {workflow_type}. Available statuses: {table.status_ids}")
+            raise HTTPException(
+                status_code=400,
+                detail=f"Status '{status_value}' is not valid for workflow type '{workflow_type}'. Available statuses: {', '.join(table.status_ids)}"
+            )
 
         # Update the order with new current status
         update_data = {
             "workflow_status": status_value,
+            "workflow_stage": map_workflow_status_to_stage(status_value, workflow_type),
+            "progress_percentage": calculate_progress_percentage(
+                order.get("completed_statuses"), workflow_type
+            ),
             "updated_at": now,
         }
 
         response = (
-            supabase.table("orders")
+            await db.table("orders")
             .update(update_data)
             .eq("order_id", order_id)
             .execute()
         )
+        invalidate_order(order_id)
 
         if not response.data:
             raise HTTPException(status_code=500, detail="Failed to update order status")
 
+        change_feed.publish("order", "updated", response.data[0])
+
         # Record the status change event
         try:
             if notes:
@@ -1016,7 +957,8 @@ async def set_current_order_status(
                 "created_at": now,
             }
 
-            supabase.table("order_events").insert(event_data).execute()
+            audit_events.emit(event_data)
+            change_feed.publish("order_event", "created", event_data)
         except Exception as event_error:
             logger.warning(f"Failed to record status change event: {str(event_error)}")
 
@@ -1024,7 +966,7 @@ async def set_current_order_status(
         if status_value == "QUOTE_REQUESTED" and current_status != "QUOTE_REQUESTED":
             try:
                 # Check if a quote generation task already exists for this order
-                existing_tasks = supabase.table("tasks").select("*").eq("order_id", order_id).ilike("title", "%Generate quote%").execute()
+                existing_tasks = await db.table("tasks").select("*").eq("order_id", order_id).ilike("title", "%Generate quote%").execute()
                 
                 if not existing_tasks.data:
                     # Get order details for task creation
@@ -1046,7 +988,8 @@ async def set_current_order_status(
                         "updated_at": now,
                     }
                     
-                    supabase.table("tasks").insert(task_data).execute()
+                    task_response = await db.table("tasks").insert(task_data).execute()
+                    change_feed.publish_many("task", "created", task_response.data)
                     logger.info(f"Auto-created quote generation task for order {order_id}")
                 else:
                     logger.info(f"Quote generation task already exists for order {order_id}")
@@ -1082,7 +1025,7 @@ async def remove_completed_status(
 
         # Get the order
         order_response = (
-            supabase.table("orders").select("*").eq("order_id", order_id).execute()
+            await db.table("orders").select("*").eq("order_id", order_id).execute()
         )
 
         if not order_response.data:
@@ -1103,24 +1046,29 @@ async def remove_completed_status(
         now = datetime.now().isoformat()
 
         # Update the order
+        workflow_type = order.get("workflow_type") or order.get("type") or "MATERIALS_ONLY"
         update_data = {
             "completed_statuses": completed_statuses,
+            "progress_percentage": calculate_progress_percentage(completed_statuses, workflow_type),
             "updated_at": now,
         }
 
         response = (
-            supabase.table("orders")
+            await db.table("orders")
             .update(update_data)
             .eq("order_id", order_id)
             .execute()
         )
+        invalidate_order(order_id)
 
         if not response.data:
             raise HTTPException(status_code=500, detail="Failed to update completed statuses")
 
+        change_feed.publish("order", "updated", response.data[0])
+
         # Remove from status history table
         try:
-            supabase.table("order_status_history").delete().eq("order_id", order_id).eq("status", status_to_remove).execute()
+            await db.table("order_status_history").delete().eq("order_id", order_id).eq("status", status_to_remove).execute()
         except:
             pass  # Ignore if doesn't exist
 
@@ -1141,7 +1089,8 @@ async def remove_completed_status(
                 "created_at": now,
             }
 
-            supabase.table("order_events").insert(event_data).execute()
+            audit_events.emit(event_data)
+            change_feed.publish("order_event", "created", event_data)
         except Exception as event_error:
             logger.warning(f"Failed to record status removal event: {str(event_error)}")
 
@@ -1172,7 +1121,7 @@ async def change_order_workflow_type(
 
         # Get the order
         order_response = (
-            supabase.table("orders").select("*").eq("order_id", order_id).execute()
+            await db.table("orders").select("*").eq("order_id", order_id).execute()
         )
 
         if not order_response.data:
@@ -1198,20 +1147,25 @@ async def change_order_workflow_type(
             "workflow_type": new_workflow_type,
             "type": new_workflow_type,
             "workflow_status": "NEW_LEAD",  # Reset to start of new workflow
+            "workflow_stage": map_workflow_status_to_stage("NEW_LEAD", new_workflow_type),
             "completed_statuses": [],  # Clear completed statuses
+            "progress_percentage": 0,
             "updated_at": now,
         }
 
         response = (
-            supabase.table("orders")
+            await db.table("orders")
             .update(update_data)
             .eq("order_id", order_id)
             .execute()
         )
+        invalidate_order(order_id)
 
         if not response.data:
             raise HTTPException(status_code=500, detail="Failed to update workflow type")
 
+        change_feed.publish("order", "updated", response.data[0])
+
         # Record the workflow type change event
         try:
             if notes:
@@ -1229,7 +1183,8 @@ async def change_order_workflow_type(
                 "created_at": now,
             }
 
-            supabase.table("order_events").insert(event_data).execute()
+            audit_events.emit(event_data)
+            change_feed.publish("order_event", "created", event_data)
         except Exception as event_error:
             logger.warning(f"Failed to record workflow type change event: {str(event_error)}")
 
@@ -1260,7 +1215,7 @@ async def update_order_status(
 
         # Get the order
         order_response = (
-            supabase.table("orders").select("*").eq("order_id", order_id).execute()
+            await db.table("orders").select("*").eq("order_id", order_id).execute()
         )
 
         if not order_response.data:
@@ -1293,7 +1248,7 @@ async def update_order_status(
             
         # Add to status history table for the completed status
         try:
-            supabase.table("order_status_history").insert({
+            await db.table("order_status_history").insert({
                 "order_id": order_id,
                 "status": status_value,
                 "completed_at": now,
@@ -1308,55 +1263,43 @@ async def update_order_status(
         # The frontend will handle showing the next available status
         next_workflow_status = status_value
         
-        # Try to find the next status in workflow progression
-        try:
-            from resources.workflow_constants import get_workflow_stages, get_next_status
-            workflow_type = order.get('workflow_type') or order.get('type') or 'MATERIALS_ONLY'
-            
-            logger.info(f"Order {order_id}: workflow_type={workflow_type}, completing status={status_value}")
-            
-            # Get all statuses for this workflow
-            stages = get_workflow_stages(workflow_type)
-            all_statuses = []
-            for stage in stages:
-                if stage.get('statuses'):
-                    for status in stage['statuses']:
-                        all_statuses.append(status['id'])
-            
-            logger.info(f"Available statuses for {workflow_type}: {all_statuses}")
-            
-            # Find next status
-            if status_value in all_statuses:
-                current_index = all_statuses.index(status_value)
-                if current_index < len(all_statuses) - 1:
-                    next_workflow_status = all_statuses[current_index + 1]
-                    logger.info(f"Next status after {status_value}: {next_workflow_status}")
-                else:
-                    logger.info(f"Status {status_value} is the last status in workflow")
+        # Find the next status in workflow progression
+        workflow_type = order.get('workflow_type') or order.get('type') or 'MATERIALS_ONLY'
+        table = get_workflow_table(workflow_type)
+
+        logger.info(f"Order {order_id}: workflow_type={workflow_type}, completing status={status_value}")
+
+        if status_value in table.next_status:
+            if table.next_status[status_value]:
+                next_workflow_status = table.next_status[status_value]
+                logger.info(f"Next status after {status_value}: {next_workflow_status}")
             else:
-                logger.warning(f"Status {status_value} not found in {workflow_type} workflow. Available: {all_statuses}")
-                    
-        except Exception as workflow_error:
-            logger.warning(f"Could not determine next workflow status: {str(workflow_error)}")
-            next_workflow_status = status_value
+                logger.info(f"Status {status_value} is the last status in workflow")
+        else:
+            logger.warning(f"Status {status_value} not found in {workflow_type} workflow. Available: {table.status_ids}")
 
         # Update the order
         update_data = {
             "workflow_status": next_workflow_status,
+            "workflow_stage": map_workflow_status_to_stage(next_workflow_status, workflow_type),
             "completed_statuses": completed_statuses,
+            "progress_percentage": calculate_progress_percentage(completed_statuses, workflow_type),
             "updated_at": now,
         }
 
         response = (
-            supabase.table("orders")
+            await db.table("orders")
             .update(update_data)
             .eq("order_id", order_id)
             .execute()
         )
+        invalidate_order(order_id)
 
         if not response.data:
             raise HTTPException(status_code=500, detail="Failed to update order status")
 
+        change_feed.publish("order", "updated", response.data[0])
+
         # Record the workflow status change event
         try:
             if notes:
@@ -1378,7 +1321,8 @@ async def update_order_status(
                 "created_at": now,
             }
 
-            supabase.table("order_events").insert(event_data).execute()
+            audit_events.emit(event_data)
+            change_feed.publish("order_event", "created", event_data)
         except Exception as event_error:
             # Log but don't fail the status update if event recording fails
             logger.warning(f"Failed to record status change event: {str(event_error)}")
@@ -1387,7 +1331,7 @@ async def update_order_status(
         if next_workflow_status == "QUOTE_REQUESTED" and current_status != "QUOTE_REQUESTED":
             try:
                 # Check if a quote generation task already exists for this order
-                existing_tasks = supabase.table("tasks").select("*").eq("order_id", order_id).ilike("title", "%Generate quote%").execute()
+                existing_tasks = await db.table("tasks").select("*").eq("order_id", order_id).ilike("title", "%Generate quote%").execute()
                 
                 if not existing_tasks.data:
                     # Get order details for task creation
@@ -1409,7 +1353,8 @@ async def update_order_status(
                         "updated_at": now,
                     }
                     
-                    supabase.table("tasks").insert(task_data).execute()
+                    task_response = await db.table("tasks").insert(task_data).execute()
+                    change_feed.publish_many("task", "created", task_response.data)
                     logger.info(f"Auto-created quote generation task for order {order_id}")
                 else:
                     logger.info(f"Quote generation task already exists for order {order_id}")
@@ -1424,7 +1369,7 @@ async def update_order_status(
         
         # Get updated status history
         status_history_response = (
-            supabase.table("order_status_history")
+            await db.table("order_status_history")
             .select("*")
             .eq("order_id", order_id)
             .order("completed_at", desc=False)
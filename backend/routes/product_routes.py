@@ -0,0 +1,29 @@
+# backend/routes/product_routes.py
+from fastapi import APIRouter, HTTPException, Depends, Query
+from typing import Optional, Dict, Any
+import logging
+from auth import get_current_user
+from services.product_index import product_index
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/products", tags=["products"])
+
+
+@router.get("/search")
+async def search_products(
+    q: str = Query(..., min_length=2, description="Search by name, SKU or description"),
+    type: Optional[str] = Query(None, description="Filter by product type"),
+    is_active: Optional[bool] = Query(None, description="Filter by active status"),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: Dict[str, Any] = Depends(get_current_user),
+):
+    """Typeahead search over the synced products, best matches first"""
+    try:
+        await product_index.ensure_current()
+        products = product_index.search(q, product_type=type, is_active=is_active, limit=limit)
+        return {"products": products, "count": len(products)}
+    except Exception as e:
+        logger.error(f"Error searching products: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to search products: {str(e)}")
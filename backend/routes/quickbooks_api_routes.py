@@ -1,18 +1,40 @@
 # Updated version of quickbooks_api_routes.py with comprehensive fixes
 from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import JSONResponse
 from typing import List, Optional
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime
 import os
 import uuid
-from intuitlib.client import AuthClient
 from intuitlib.exceptions import AuthClientError
 from intuitlib.enums import Scopes
 from quickbooks import QuickBooks
-from quickbooks.objects.item import Item
 from quickbooks.exceptions import QuickbooksException, AuthorizationException
-from database import supabase
+from starlette.concurrency import run_in_threadpool
 from auth import get_current_user
+from http_cache import cache_headers, etag_matches, make_etag, not_modified
+from services.settings_store import settings_store
+from services.product_index import product_index
+from clients.quickbooks_client import (
+    QB_CLIENT_ID,
+    QB_ENVIRONMENT,
+    QuickBooksTokenManager,
+    forget_token_manager,
+    get_token_manager,
+    new_auth_client,
+    register_token_manager,
+)
+from services.product_sync import (
+    FULL_SYNC_WHERE,
+    PRODUCTS_LAST_FULL_SYNC_KEY,
+    PRODUCTS_WATERMARK_KEY,
+    fetch_product_map,
+    incremental_where_clause,
+    iter_item_pages,
+    needs_full_reconcile,
+    newest_time,
+    sync_products,
+)
 import urllib.parse
 
 # Set up logging
@@ -21,87 +43,46 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/quickbooks", tags=["quickbooks"])
 
-# Environment variables for QuickBooks OAuth
-QB_CLIENT_ID = os.getenv("QB_CLIENT_ID")
-QB_CLIENT_SECRET = os.getenv("QB_CLIENT_SECRET")
-QB_REDIRECT_URI = os.getenv(
-    "QB_REDIRECT_URI", "http://localhost:3000/quickbooks/callback"
-)
-QB_ENVIRONMENT = os.getenv("QB_ENVIRONMENT", "sandbox")  # "sandbox" or "production"
-
-# Initialize QuickBooks auth client
-auth_client = AuthClient(
-    client_id=QB_CLIENT_ID,
-    client_secret=QB_CLIENT_SECRET,
-    redirect_uri=QB_REDIRECT_URI,
-    environment=QB_ENVIRONMENT,
-)
-
-
-# Safely save a setting to the database with delete-then-insert pattern
-def safe_save_setting(key, value, updated_at=None):
-    if updated_at is None:
-        updated_at = datetime.now().isoformat()
+# Part of the synced catalog's ETag; bump it whenever the rows or fields
+# served change without a new sync, so clients drop cached copies.
+# 2: only active products are served
+SYNCED_PRODUCTS_VERSION = 2
 
+# Safely save settings to the database with a single upsert
+async def safe_save_settings(values, updated_at=None):
     try:
-        # Delete any existing record first
-        supabase.table("integration_settings").delete().eq("key", key).execute()
-        # Then insert new record
-        supabase.table("integration_settings").insert(
-            {"key": key, "value": value, "updated_at": updated_at}
-        ).execute()
+        await settings_store.save(values, updated_at)
         return True
     except Exception as e:
-        logger.warning(f"Failed to save setting '{key}': {str(e)}")
+        logger.warning(f"Failed to save settings {list(values)}: {str(e)}")
         return False
 
 
-# Function to get authorized QuickBooks client
-def get_quickbooks_client():
-    try:
-        # Fetch settings from database
-        settings_response = supabase.table("integration_settings").select("*").execute()
-        settings = {}
+async def safe_save_setting(key, value, updated_at=None):
+    return await safe_save_settings({key: value}, updated_at)
 
-        if settings_response.data:
-            for setting in settings_response.data:
-                settings[setting.get("key")] = setting.get("value")
 
-        refresh_token = settings.get("qb_refresh_token")
-        realm_id = settings.get("qb_realm_id")
+# Function to get authorized QuickBooks client
+async def get_quickbooks_client():
+    try:
+        manager = await get_token_manager()
 
-        if not refresh_token:
+        if manager is None:
             raise HTTPException(
                 status_code=401,
                 detail="No QuickBooks refresh token available. Please authenticate with QuickBooks first.",
             )
 
-        if not realm_id:
-            raise HTTPException(
-                status_code=400, detail="QuickBooks company ID (realm_id) is required"
-            )
-
-        # Get a new access token using the refresh token
+        # Reuses the in-memory access token; Intuit is only called when it is
+        # about to expire
         try:
-            auth_client.refresh(refresh_token=refresh_token)
-
-            # Update refresh token if it changed
-            if auth_client.refresh_token != refresh_token:
-                safe_save_setting("qb_refresh_token", auth_client.refresh_token)
-
-            # Update access token
-            safe_save_setting("qb_access_token", auth_client.access_token)
-
-            # Update token expiry
-            expiry_time = (
-                datetime.now() + timedelta(seconds=auth_client.expires_in)
-            ).isoformat()
-            safe_save_setting("qb_token_expiry", expiry_time)
-
+            auth_client = await manager.get_auth_client()
         except AuthClientError as e:
             # Check if it's a refresh token error
             logger.error(f"Error refreshing token: {str(e)}")
-            safe_save_setting("qb_last_error", f"Token refresh error: {str(e)}")
+            # Another worker may have rotated the token; pick it up next time
+            settings_store.invalidate()
+            await safe_save_setting("qb_last_error", f"Token refresh error: {str(e)}")
 
             if "invalid_grant" in str(e).lower():
                 raise HTTPException(
@@ -114,14 +95,14 @@ def get_quickbooks_client():
         client = QuickBooks(
             auth_client=auth_client,
             refresh_token=auth_client.refresh_token,
-            company_id=realm_id,
+            company_id=manager.realm_id,
         )
 
         return client
 
     except AuthClientError as e:
         logger.error(f"QuickBooks auth error: {str(e)}")
-        safe_save_setting("qb_last_error", str(e))
+        await safe_save_setting("qb_last_error", str(e))
 
         raise HTTPException(
             status_code=401,
@@ -143,27 +124,14 @@ async def get_auth_url(current_user: dict = Depends(get_current_user)):
         if not current_user:
             raise HTTPException(status_code=401, detail="Not authenticated")
 
-        # Clear any existing state first
-        try:
-            supabase.table("integration_settings").delete().eq(
-                "key", "qb_auth_state"
-            ).execute()
-        except Exception as del_error:
-            logger.warning(f"Could not delete existing auth state: {str(del_error)}")
-
         # Generate state parameter to prevent CSRF
         state = str(uuid.uuid4())
 
-        # Store state in database for verification
-        safe_save_setting("qb_auth_state", state)
+        # Store state in database for verification (replaces any existing state)
+        await safe_save_setting("qb_auth_state", state)
 
         # Create a new AuthClient instance with no implicit state
-        temp_auth_client = AuthClient(
-            client_id=QB_CLIENT_ID,
-            client_secret=QB_CLIENT_SECRET,
-            redirect_uri=QB_REDIRECT_URI,
-            environment=QB_ENVIRONMENT,
-        )
+        temp_auth_client = await run_in_threadpool(new_auth_client)
 
         # Generate authorization URL - DO NOT add state here
         # The QuickBooks SDK might be adding its own state parameter
@@ -215,17 +183,16 @@ async def auth_callback(
         if not current_user:
             raise HTTPException(status_code=401, detail="Not authenticated")
 
+        # The state and tokens may have been written by another worker, so
+        # start the callback from a fresh settings snapshot
+        settings_store.invalidate()
+
         # Verify state parameter to prevent CSRF (optional)
         if state:
             try:
-                stored_state = (
-                    supabase.table("integration_settings")
-                    .select("value")
-                    .eq("key", "qb_auth_state")
-                    .execute()
-                )
+                stored_state = await settings_store.get("qb_auth_state")
 
-                if not stored_state.data or stored_state.data[0].get("value") != state:
+                if stored_state != state:
                     logger.warning("State parameter mismatch - possible CSRF attempt")
                     # Continue anyway - don't block the flow if state doesn't match
             except Exception as state_error:
@@ -239,37 +206,15 @@ async def auth_callback(
         )
 
         # Check if we already have tokens for this company
-        settings_response = supabase.table("integration_settings").select("*").execute()
-        settings = {}
-        if settings_response.data:
-            for setting in settings_response.data:
-                settings[setting.get("key")] = setting.get("value")
-
-        existing_realm_id = settings.get("qb_realm_id")
-        existing_refresh_token = settings.get("qb_refresh_token")
+        manager = await get_token_manager()
 
         # If we already have a connection and this is the same company, check if it's still valid
-        if existing_refresh_token and existing_realm_id == realmId:
+        if manager and manager.realm_id == realmId:
             try:
-                # Try to refresh the token to see if it's still valid
-                auth_client.refresh(refresh_token=existing_refresh_token)
+                # Refresh the token to see if it's still valid
+                await manager.get_auth_client(force_refresh=True)
                 logger.info("Existing token is still valid, using it instead")
 
-                # Update the tokens if needed
-                now = datetime.now().isoformat()
-
-                if auth_client.refresh_token != existing_refresh_token:
-                    safe_save_setting(
-                        "qb_refresh_token", auth_client.refresh_token, now
-                    )
-
-                safe_save_setting("qb_access_token", auth_client.access_token, now)
-
-                expiry_time = (
-                    datetime.now() + timedelta(seconds=auth_client.expires_in)
-                ).isoformat()
-                safe_save_setting("qb_token_expiry", expiry_time, now)
-
                 return {
                     "message": "QuickBooks connection refreshed successfully",
                     "company_id": realmId,
@@ -280,17 +225,19 @@ async def auth_callback(
                 )
                 # Continue with the new authorization code
 
-        # Exchange authorization code for tokens
+        # Exchange authorization code for tokens; this also persists them
         try:
-            auth_client.get_bearer_token(code, realm_id=realmId)
+            new_manager = QuickBooksTokenManager(realmId, {})
+            await new_manager.exchange_code(code)
+            register_token_manager(new_manager)
         except AuthClientError as e:
             if "invalid_grant" in str(e).lower():
                 # If token is invalid but we already have tokens for this realm,
                 # the authorization may have been successful on a previous attempt
-                if existing_refresh_token and existing_realm_id == realmId:
+                if manager and manager.realm_id == realmId:
                     try:
                         # Try to use the existing refresh token
-                        auth_client.refresh(refresh_token=existing_refresh_token)
+                        await manager.get_auth_client(force_refresh=True)
 
                         # If that worked, our connection is still good
                         logger.info("Using existing token after auth code failure")
@@ -308,27 +255,16 @@ async def auth_callback(
                 detail=f"QuickBooks authentication failed: {str(e)}. Please try again.",
             )
 
-        # Store tokens and realm ID in database
+        # Tokens, realm ID and expiry were stored by the token manager
         now = datetime.now().isoformat()
 
-        # Save access token, refresh token, realm ID, and token expiry
-        access_token = auth_client.access_token
-        refresh_token = auth_client.refresh_token
-        expires_in = auth_client.expires_in
-        expiry_time = (datetime.now() + timedelta(seconds=expires_in)).isoformat()
-
-        safe_save_setting("qb_access_token", access_token, now)
-        safe_save_setting("qb_refresh_token", refresh_token, now)
-        safe_save_setting("qb_realm_id", realmId, now)
-        safe_save_setting("qb_token_expiry", expiry_time, now)
-
         # Add company name (simplified approach)
         # We're not using client.company_info since it's not available
+        # and clear any previous errors
         company_name = f"QuickBooks Company ({realmId})"
-        safe_save_setting("qb_company_name", company_name, now)
-
-        # Clear any previous errors
-        safe_save_setting("qb_last_error", "", now)
+        await safe_save_settings(
+            {"qb_company_name": company_name, "qb_last_error": ""}, now
+        )
 
         return {
             "message": "QuickBooks authentication successful",
@@ -338,7 +274,7 @@ async def auth_callback(
         raise he
     except Exception as e:
         logger.error(f"Error in QuickBooks auth callback: {str(e)}")
-        safe_save_setting("qb_last_error", str(e))
+        await safe_save_setting("qb_last_error", str(e))
         raise HTTPException(
             status_code=500, detail=f"Error in QuickBooks auth callback: {str(e)}"
         )
@@ -351,13 +287,8 @@ async def check_quickbooks_connection(current_user: dict = Depends(get_current_u
         if not current_user:
             raise HTTPException(status_code=401, detail="Not authenticated")
 
-        # Get settings from database
-        settings_response = supabase.table("integration_settings").select("*").execute()
-        settings = {}
-
-        if settings_response.data:
-            for setting in settings_response.data:
-                settings[setting.get("key")] = setting.get("value")
+        # Get settings (served from the cached snapshot)
+        settings = await settings_store.get_all()
 
         # Check for required settings
         has_refresh_token = bool(settings.get("qb_refresh_token"))
@@ -379,37 +310,25 @@ async def check_quickbooks_connection(current_user: dict = Depends(get_current_u
         company_name = settings.get("qb_company_name")
         last_error = settings.get("qb_last_error")
 
-        if has_refresh_token and has_realm_id and not is_token_expired:
+        if has_refresh_token and has_realm_id:
             try:
-                # Try to refresh token to verify connection
-                refresh_token = settings.get("qb_refresh_token")
-                auth_client.refresh(refresh_token=refresh_token)
-
-                # Update refresh token if it changed
-                if auth_client.refresh_token != refresh_token:
-                    safe_save_setting("qb_refresh_token", auth_client.refresh_token)
-
-                # Update access token
-                safe_save_setting("qb_access_token", auth_client.access_token)
-
-                # Update token expiry
-                expiry_time = (
-                    datetime.now() + timedelta(seconds=auth_client.expires_in)
-                ).isoformat()
-                safe_save_setting("qb_token_expiry", expiry_time)
+                # Verify the connection; the token manager only calls Intuit
+                # when the in-memory access token is about to expire
+                manager = await get_token_manager(settings)
+                await manager.get_auth_client()
 
                 is_connected = True
 
                 # Clear any previous errors
                 if last_error:
-                    safe_save_setting("qb_last_error", "")
+                    await safe_save_setting("qb_last_error", "")
                     last_error = None
             except Exception as e:
                 logger.warning(f"Error refreshing QuickBooks token: {str(e)}")
                 is_connected = False
 
                 # Store error
-                safe_save_setting("qb_last_error", str(e))
+                await safe_save_setting("qb_last_error", str(e))
                 last_error = str(e)
 
         return {
@@ -433,7 +352,9 @@ async def check_quickbooks_connection(current_user: dict = Depends(get_current_u
 
 
 @router.get("/products")
-async def get_quickbooks_products(current_user: dict = Depends(get_current_user)):
+async def get_quickbooks_products(
+    request: Request, current_user: dict = Depends(get_current_user)
+):
     """Get products from QuickBooks API (fallback to mock data if not connected)"""
     try:
         if not current_user:
@@ -446,7 +367,9 @@ async def get_quickbooks_products(current_user: dict = Depends(get_current_user)
         if status_response["is_connected"]:
             try:
                 # Try to get real products
-                return await get_quickbooks_products_real(current_user)
+                return await get_quickbooks_products_real(
+                    request, live=False, current_user=current_user
+                )
             except Exception as e:
                 logger.warning(
                     f"Failed to get real products, falling back to mock data: {str(e)}"
@@ -520,77 +443,118 @@ async def get_quickbooks_products(current_user: dict = Depends(get_current_user)
         )
 
 
+def product_from_row(row: dict) -> dict:
+    """Shape a synced products row like a live QuickBooks product"""
+    return {
+        "id": row.get("quickbooks_id"),
+        "name": row.get("name"),
+        "sku": row.get("sku"),
+        "description": row.get("description"),
+        "type": row.get("type"),
+        "is_active": row.get("is_active") is not False,
+        "default_price": row.get("default_price"),
+        "cost_price": row.get("cost_price"),
+        "category": None,
+        # The products table tracks when a row was last synced, not edited
+        "last_modified_time": row.get("last_synced_at"),
+        "created_time": row.get("created_at"),
+    }
+
+
+async def get_synced_products(request: Request):
+    """Serve the active catalog from the products table, revalidated against the last sync.
+
+    Like the live QuickBooks query, only active items are returned. The
+    products table is only written by the sync, so the last sync time is
+    enough to tell whether the client's copy is current.
+    """
+    last_synced_at = await settings_store.get("qb_products_last_synced")
+    etag = make_etag("products", SYNCED_PRODUCTS_VERSION, last_synced_at)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    products = [product_from_row(row) for row in (await fetch_product_map(active_only=True)).values()]
+    return JSONResponse(
+        {"products": products, "last_synced_at": last_synced_at, "source": "local"},
+        headers=cache_headers(etag),
+    )
+
+
 @router.get("/products/real")
-async def get_quickbooks_products_real(current_user: dict = Depends(get_current_user)):
-    """Get real products from QuickBooks API"""
+async def get_quickbooks_products_real(
+    request: Request,
+    live: bool = Query(False, description="Query QuickBooks instead of the synced table"),
+    current_user: dict = Depends(get_current_user),
+):
+    """Get real products from QuickBooks.
+
+    Served from the synced products table with an ETag, so an unchanged
+    catalog costs a 304. Pass live=true to query the QuickBooks API directly.
+    """
     try:
         if not current_user:
             raise HTTPException(status_code=401, detail="Not authenticated")
 
+        if not live:
+            return await get_synced_products(request)
+
         # Get QuickBooks client
-        client = get_quickbooks_client()
+        client = await get_quickbooks_client()
 
-        # Query for all items
+        # Query for all active items, page by page
+        products = []
         try:
-            items = Item.all(qb=client)
+            async for page in iter_item_pages("", client):
+                # Format products for response
+                for item in page:
+                    # Only include products (not services, categories, etc.)
+                    if item.Type in [
+                        "Inventory",
+                        "NonInventory",
+                        "Service",
+                    ]:  # Include Service type too
+                        try:
+                            product = {
+                                "id": item.Id,
+                                "name": item.Name,
+                                "sku": getattr(item, "Sku", None),
+                                "description": getattr(item, "Description", None),
+                                "type": item.Type,
+                                "is_active": getattr(item, "Active", True),
+                                "default_price": (
+                                    float(item.UnitPrice)
+                                    if hasattr(item, "UnitPrice") and item.UnitPrice is not None
+                                    else None
+                                ),
+                                "cost_price": (
+                                    float(item.PurchaseCost)
+                                    if hasattr(item, "PurchaseCost")
+                                    and item.PurchaseCost is not None
+                                    else None
+                                ),
+                                "category": getattr(item, "SubItem", False)
+                                and getattr(item, "ParentRef", None),
+                                "last_modified_time": getattr(item, "MetaData", {}).get(
+                                    "LastUpdatedTime"
+                                ),
+                                "created_time": getattr(item, "MetaData", {}).get("CreateTime"),
+                            }
+                            products.append(product)
+                        except Exception as item_error:
+                            logger.warning(
+                                f"Error processing item {getattr(item, 'Id', 'unknown')}: {str(item_error)}"
+                            )
+                            # Continue with next item
         except QuickbooksException as e:
             logger.error(f"QuickBooks API error when querying items: {str(e)}")
             raise HTTPException(
                 status_code=400, detail=f"QuickBooks API error: {str(e)}"
             )
 
-        # Format products for response
-        products = []
-        for item in items:
-            # Only include products (not services, categories, etc.)
-            if item.Type in [
-                "Inventory",
-                "NonInventory",
-                "Service",
-            ]:  # Include Service type too
-                try:
-                    product = {
-                        "id": item.Id,
-                        "name": item.Name,
-                        "sku": getattr(item, "Sku", None),
-                        "description": getattr(item, "Description", None),
-                        "type": item.Type,
-                        "is_active": getattr(item, "Active", True),
-                        "default_price": (
-                            float(item.UnitPrice)
-                            if hasattr(item, "UnitPrice") and item.UnitPrice is not None
-                            else None
-                        ),
-                        "cost_price": (
-                            float(item.PurchaseCost)
-                            if hasattr(item, "PurchaseCost")
-                            and item.PurchaseCost is not None
-                            else None
-                        ),
-                        "category": getattr(item, "SubItem", False)
-                        and getattr(item, "ParentRef", None),
-                        "last_modified_time": getattr(item, "MetaData", {}).get(
-                            "LastUpdatedTime"
-                        ),
-                        "created_time": getattr(item, "MetaData", {}).get("CreateTime"),
-                    }
-                    products.append(product)
-                except Exception as item_error:
-                    logger.warning(
-                        f"Error processing item {getattr(item, 'Id', 'unknown')}: {str(item_error)}"
-                    )
-                    # Continue with next item
-
         # Get last sync time
-        settings = (
-            supabase.table("integration_settings")
-            .select("value")
-            .eq("key", "qb_products_last_synced")
-            .execute()
-        )
-        last_synced_at = settings.data[0].get("value") if settings.data else None
+        last_synced_at = await settings_store.get("qb_products_last_synced")
 
-        return {"products": products, "last_synced_at": last_synced_at}
+        return {"products": products, "last_synced_at": last_synced_at, "source": "live"}
     except AuthorizationException as e:
         logger.error(f"QuickBooks authorization error: {str(e)}")
         raise HTTPException(
@@ -623,7 +587,9 @@ async def sync_quickbooks_products(current_user: dict = Depends(get_current_user
         if status_response["is_connected"]:
             try:
                 # Try to sync real products
-                return await sync_quickbooks_products_real(current_user)
+                return await sync_quickbooks_products_real(
+                    full=False, current_user=current_user
+                )
             except Exception as e:
                 logger.warning(
                     f"Failed to sync real products, simulating sync with mock data: {str(e)}"
@@ -633,7 +599,7 @@ async def sync_quickbooks_products(current_user: dict = Depends(get_current_user
         now = datetime.now().isoformat()
 
         # Update last sync time
-        safe_save_setting("qb_products_last_synced", now)
+        await safe_save_setting("qb_products_last_synced", now)
 
         return {
             "success": True,
@@ -648,121 +614,75 @@ async def sync_quickbooks_products(current_user: dict = Depends(get_current_user
 
 
 @router.post("/sync/products/real")
-async def sync_quickbooks_products_real(current_user: dict = Depends(get_current_user)):
-    """Sync products with QuickBooks and store in local database"""
+async def sync_quickbooks_products_real(
+    full: bool = Query(False, description="Force a full catalog reconcile"),
+    current_user: dict = Depends(get_current_user),
+):
+    """Sync products with QuickBooks and store in local database.
+
+    Only items changed since the stored watermark are fetched, unless a full
+    reconcile is requested or due.
+    """
     try:
         if not current_user:
             raise HTTPException(status_code=401, detail="Not authenticated")
 
         # Get QuickBooks client
-        client = get_quickbooks_client()
+        client = await get_quickbooks_client()
 
-        # Query for all items
+        # Decide between an incremental pass and a full reconcile
+        settings = await settings_store.get_all()
+        watermark = settings.get(PRODUCTS_WATERMARK_KEY)
+        full_sync = full or needs_full_reconcile(
+            watermark, settings.get(PRODUCTS_LAST_FULL_SYNC_KEY)
+        )
+
+        # Stream changed items (or all items on a full reconcile) page by page
+        # into the diff, writing only the changes
+        where_clause = (
+            FULL_SYNC_WHERE if full_sync else incremental_where_clause(watermark)
+        )
+        now = datetime.now().isoformat()
         try:
-            items = Item.all(qb=client)
+            report = await sync_products(
+                iter_item_pages(where_clause, client), now, full=full_sync
+            )
         except QuickbooksException as e:
             logger.error(f"QuickBooks API error when querying items: {str(e)}")
             raise HTTPException(
                 status_code=400, detail=f"QuickBooks API error: {str(e)}"
             )
-
-        # Process and store items
-        now = datetime.now().isoformat()
-        sync_count = 0
-        error_count = 0
-
-        for item in items:
+        sync_count = report["inserted"] + report["updated"] + report["unchanged"]
+
+        # Only advance the watermark once every change has been committed, so
+        # failed items are picked up again by the next sync
+        sync_settings = {"qb_products_last_synced": now}
+        latest_updated_at = report.pop("latest_updated_at")
+        if report["failed"] == 0:
+            new_watermark = newest_time(watermark, latest_updated_at)
+            if new_watermark:
+                sync_settings[PRODUCTS_WATERMARK_KEY] = new_watermark
+            if full_sync:
+                sync_settings[PRODUCTS_LAST_FULL_SYNC_KEY] = now
+
+        # Update last sync time (and the watermark) in one write
+        await safe_save_settings(sync_settings, now)
+
+        # Fold the rows this sync wrote into the search index; an index that
+        # is not loaded yet is built by the first search instead
+        if product_index.loaded:
             try:
-                # Only process products (not services, categories, etc.)
-                if item.Type in [
-                    "Inventory",
-                    "NonInventory",
-                    "Service",
-                ]:  # Include Service type too
-                    # Format product data
-                    product_data = {
-                        "quickbooks_id": str(item.Id),
-                        "name": item.Name,
-                        "sku": getattr(item, "Sku", None),
-                        "description": getattr(item, "Description", None),
-                        "type": item.Type,
-                        "is_active": getattr(item, "Active", True),
-                        "default_price": (
-                            float(item.UnitPrice)
-                            if hasattr(item, "UnitPrice") and item.UnitPrice is not None
-                            else None
-                        ),
-                        "cost_price": (
-                            float(item.PurchaseCost)
-                            if hasattr(item, "PurchaseCost")
-                            and item.PurchaseCost is not None
-                            else None
-                        ),
-                        "last_synced_at": now,
-                    }
-
-                    # Check if product already exists
-                    existing = (
-                        supabase.table("products")
-                        .select("product_id")
-                        .eq("quickbooks_id", str(item.Id))
-                        .execute()
-                    )
-
-                    # Use delete and insert pattern to avoid foreign key conflicts
-                    if existing.data and len(existing.data) > 0:
-                        # Update existing product (delete and re-insert)
-                        product_id = existing.data[0]["product_id"]
-
-                        try:
-                            # Add created_at to keep it from original record
-                            orig_product = (
-                                supabase.table("products")
-                                .select("created_at")
-                                .eq("product_id", product_id)
-                                .execute()
-                            )
-
-                            if orig_product.data and len(orig_product.data) > 0:
-                                product_data["created_at"] = orig_product.data[0][
-                                    "created_at"
-                                ]
-                            else:
-                                product_data["created_at"] = now
-
-                            # Delete existing record
-                            supabase.table("products").delete().eq(
-                                "product_id", product_id
-                            ).execute()
-
-                            # Insert updated record
-                            product_data["product_id"] = product_id  # Keep same ID
-                            supabase.table("products").insert(product_data).execute()
-                        except Exception as update_error:
-                            logger.warning(
-                                f"Error updating product {item.Id}: {str(update_error)}"
-                            )
-                            error_count += 1
-                    else:
-                        # Create new product
-                        product_data["created_at"] = now
-                        supabase.table("products").insert(product_data).execute()
-
-                    sync_count += 1
-            except Exception as item_error:
-                logger.warning(
-                    f"Error processing item {getattr(item, 'Id', 'unknown')}: {str(item_error)}"
-                )
-                error_count += 1
-
-        # Update last sync time
-        safe_save_setting("qb_products_last_synced", now)
+                await product_index.refresh()
+            except Exception as e:
+                logger.warning(f"Failed to refresh product search index: {str(e)}")
 
         return {
             "success": True,
             "message": f"Successfully synced {sync_count} products with QuickBooks",
             "sync_count": sync_count,
-            "error_count": error_count,
+            "error_count": report["failed"],
+            "mode": "full" if full_sync else "incremental",
+            **report,
             "last_synced_at": now,
         }
     except AuthorizationException as e:
@@ -790,21 +710,16 @@ async def revoke_quickbooks_auth(current_user: dict = Depends(get_current_user))
         if not current_user:
             raise HTTPException(status_code=401, detail="Not authenticated")
 
-        # Get refresh token
-        settings = (
-            supabase.table("integration_settings")
-            .select("value")
-            .eq("key", "qb_refresh_token")
-            .execute()
-        )
-        refresh_token = settings.data[0].get("value") if settings.data else None
+        # Get the connected company's tokens
+        manager = await get_token_manager()
 
-        if refresh_token:
+        if manager:
             try:
                 # Revoke the token
-                auth_client.revoke(refresh_token)
+                await manager.revoke()
             except Exception as e:
                 logger.warning(f"Error revoking token with Intuit: {str(e)}")
+            forget_token_manager(manager.realm_id)
 
         # Remove all QuickBooks settings
         keys_to_remove = [
@@ -815,11 +730,10 @@ async def revoke_quickbooks_auth(current_user: dict = Depends(get_current_user))
             "qb_company_name",
         ]
 
-        for key in keys_to_remove:
-            try:
-                supabase.table("integration_settings").delete().eq("key", key).execute()
-            except Exception as e:
-                logger.warning(f"Error removing key {key}: {str(e)}")
+        try:
+            await settings_store.delete(keys_to_remove)
+        except Exception as e:
+            logger.warning(f"Error removing QuickBooks settings: {str(e)}")
 
         return {"message": "QuickBooks authorization revoked successfully"}
     except Exception as e:
@@ -1,9 +1,16 @@
 # task_routes.py
 from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import ORJSONResponse
 from typing import List, Optional
 from pydantic import BaseModel
-from database import supabase
+from database import db
+from services.change_feed import change_feed
+from services.event_sink import audit_events
+from services.order_cache import get_order_header, invalidate_order
 from auth import get_current_user
+from http_cache import immutable
+from projection import Projection
+from resources.columns import TASK_COLUMNS
 import logging
 from datetime import datetime, timedelta
 
@@ -30,6 +37,24 @@ TASK_STATUSES = {
 # Priority levels - must match database enum values
 PRIORITIES = {"URGENT": "URGENT", "HIGH": "HIGH", "MEDIUM": "MEDIUM", "LOW": "LOW"}
 
+# Columns the task list returns unless the client asks for others with fields=
+TASK_LIST_FIELDS = (
+    "task_id",
+    "title",
+    "description",
+    "task_type",
+    "order_id",
+    "assigned_to",
+    "status",
+    "priority",
+    "start_date",
+    "due_date",
+    "completed_date",
+    "notes",
+    "created_at",
+    "updated_at",
+)
+
 
 # Request/Response models
 class TaskBase(BaseModel):
@@ -105,13 +130,7 @@ async def create_task(task: TaskCreate, current_user: dict = Depends(get_current
 
         # Check if order exists if order_id is provided
         if task.order_id:
-            order = (
-                supabase.table("orders")
-                .select("order_id")
-                .eq("order_id", task.order_id)
-                .execute()
-            )
-            if not order.data:
+            if await get_order_header(task.order_id) is None:
                 raise HTTPException(
                     status_code=404,
                     detail=f"Order with id {task.order_id} not found",
@@ -120,7 +139,7 @@ async def create_task(task: TaskCreate, current_user: dict = Depends(get_current
         # Validate employee if assigned_to is provided
         if task.assigned_to:
             employee = (
-                supabase.table("employees")
+                await db.table("employees")
                 .select("employee_id")
                 .eq("employee_id", task.assigned_to)
                 .execute()
@@ -155,12 +174,13 @@ async def create_task(task: TaskCreate, current_user: dict = Depends(get_current
         if task.notes:
             task_data["notes"] = task.notes
 
-        response = supabase.table("tasks").insert(task_data).execute()
+        response = await db.table("tasks").insert(task_data).execute()
 
         if not response.data:
             raise HTTPException(status_code=500, detail="Failed to create task")
 
         created_task = response.data[0]
+        change_feed.publish("task", "created", created_task)
 
         # Create order event for task creation if task is associated with an order
         if task.order_id:
@@ -172,7 +192,8 @@ async def create_task(task: TaskCreate, current_user: dict = Depends(get_current
                     "created_by": current_user.get("id"),
                     "created_at": now,
                 }
-                supabase.table("order_events").insert(task_event_data).execute()
+                audit_events.emit(task_event_data)
+                change_feed.publish("order_event", "created", task_event_data)
                 logger.info(f"Task creation event recorded for order {task.order_id}")
             except Exception as event_error:
                 # Log but don't fail task creation if event recording fails
@@ -180,27 +201,20 @@ async def create_task(task: TaskCreate, current_user: dict = Depends(get_current
 
         # If this is an order-related task with a specific status, update order stage
         if task.order_id and task.title:
-            # Get the order to check its current stage
-            order_response = (
-                supabase.table("orders")
-                .select("*")
-                .eq("order_id", task.order_id)
-                .execute()
-            )
-
-            if order_response.data:
-                order = order_response.data[0]
-
+            # Check the order still exists before moving its stage
+            if await get_order_header(task.order_id) is not None:
                 # Update order stage based on task title/type
                 if "quote accepted" in task.title.lower():
                     # For quote acceptance tasks, update the order's current stage
-                    supabase.table("orders").update(
+                    order_response = await db.table("orders").update(
                         {
                             "current_stage": "QUOTE_ACCEPTED",  # Use appropriate stage ID from workflow
                             "last_status_update": now,
                             "updated_at": now,
                         }
                     ).eq("order_id", task.order_id).execute()
+                    invalidate_order(task.order_id)
+                    change_feed.publish_many("order", "updated", order_response.data)
 
         return {
             "message": "Task created successfully",
@@ -223,6 +237,7 @@ async def get_tasks(
     priority: Optional[str] = None,
     assigned_to: Optional[str] = None,
     order_id: Optional[int] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, or * for whole rows"),
     current_user: dict = Depends(get_current_user),
 ):
     """Get all tasks with optional filtering"""
@@ -234,8 +249,9 @@ async def get_tasks(
             f"Fetching tasks with filters: status={status}, priority={priority}, assigned_to={assigned_to}"
         )
 
-        # Start with base query
-        query = supabase.table("tasks").select("*")
+        # Start with base query, reading only the columns the list needs
+        projection = Projection(fields, TASK_COLUMNS, TASK_LIST_FIELDS)
+        query = db.table("tasks").select(projection.select)
 
         # Apply filters if provided
         if status:
@@ -248,11 +264,12 @@ async def get_tasks(
             query = query.eq("order_id", order_id)
 
         # Execute query
-        response = query.order("created_at", desc=True).execute()
+        response = await query.order("created_at", desc=True).execute()
 
         logger.info(f"Found {len(response.data)} tasks")
 
-        return {"tasks": response.data}
+        # PostgREST rows are already JSON types, so skip jsonable_encoder's walk
+        return ORJSONResponse({"tasks": response.data})
 
     except HTTPException as he:
         # Re-raise HTTP exceptions
@@ -264,6 +281,21 @@ async def get_tasks(
         raise HTTPException(status_code=500, detail=error_msg)
 
 
+# Registered before /{task_id} so the literal paths are matched first
+@router.get("/statuses")
+@immutable
+async def get_task_statuses():
+    """Get all valid statuses for tasks"""
+    return {"statuses": list(TASK_STATUSES.values())}
+
+
+@router.get("/priorities")
+@immutable
+async def get_task_priorities():
+    """Get all valid priorities for tasks"""
+    return {"priorities": list(PRIORITIES.values())}
+
+
 @router.get("/{task_id}")
 async def get_task(task_id: int, current_user: dict = Depends(get_current_user)):
     """Get a specific task by ID"""
@@ -271,7 +303,7 @@ async def get_task(task_id: int, current_user: dict = Depends(get_current_user))
         if not current_user:
             raise HTTPException(status_code=401, detail="Not authenticated")
 
-        response = supabase.table("tasks").select("*").eq("task_id", task_id).execute()
+        response = await db.table("tasks").select("*").eq("task_id", task_id).execute()
 
         if not response.data:
             raise HTTPException(
@@ -303,7 +335,7 @@ async def update_task(
 
         # Check if task exists
         existing_task = (
-            supabase.table("tasks").select("*").eq("task_id", task_id).execute()
+            await db.table("tasks").select("*").eq("task_id", task_id).execute()
         )
 
         if not existing_task.data:
@@ -335,13 +367,7 @@ async def update_task(
         if task_update.order_id and task_update.order_id != current_task.get(
             "order_id"
         ):
-            order = (
-                supabase.table("orders")
-                .select("order_id")
-                .eq("order_id", task_update.order_id)
-                .execute()
-            )
-            if not order.data:
+            if await get_order_header(task_update.order_id) is None:
                 raise HTTPException(
                     status_code=404,
                     detail=f"Order with id {task_update.order_id} not found",
@@ -363,13 +389,14 @@ async def update_task(
 
         # Update task
         response = (
-            supabase.table("tasks").update(update_data).eq("task_id", task_id).execute()
+            await db.table("tasks").update(update_data).eq("task_id", task_id).execute()
         )
 
         if not response.data:
             raise HTTPException(status_code=500, detail="Failed to update task")
 
         updated_task = response.data[0]
+        change_feed.publish("task", "updated", updated_task, previous=current_task)
 
         # Create order event for task updates if task is associated with an order
         if current_task.get("order_id"):
@@ -393,7 +420,8 @@ async def update_task(
                         "created_by": current_user.get("id"),
                         "created_at": update_data["updated_at"],
                     }
-                    supabase.table("order_events").insert(task_event_data).execute()
+                    audit_events.emit(task_event_data)
+                    change_feed.publish("order_event", "created", task_event_data)
                     logger.info(f"Task update event recorded for order {current_task['order_id']}")
             except Exception as event_error:
                 # Log but don't fail task update if event recording fails
@@ -410,13 +438,8 @@ async def update_task(
         ):
             order_id = current_task["order_id"]
 
-            # Get the order
-            order_response = (
-                supabase.table("orders").select("*").eq("order_id", order_id).execute()
-            )
-
-            if order_response.data:
-                order = order_response.data[0]
+            # Check the order still exists before moving its stage
+            if await get_order_header(order_id) is not None:
                 title_lower = current_task.get("title", "").lower()
 
                 # Update order stage based on task type
@@ -432,13 +455,15 @@ async def update_task(
                     stage_update = "PAYMENT_RECEIVED"
 
                 if stage_update:
-                    supabase.table("orders").update(
+                    order_response = await db.table("orders").update(
                         {
                             "current_stage": stage_update,
                             "updated_at": now,
                             "last_status_update": now,
                         }
                     ).eq("order_id", order_id).execute()
+                    invalidate_order(order_id)
+                    change_feed.publish_many("order", "updated", order_response.data)
 
         return {
             "message": "Task updated successfully",
@@ -464,7 +489,7 @@ async def delete_task(task_id: int, current_user: dict = Depends(get_current_use
 
         # Check if task exists
         existing_task = (
-            supabase.table("tasks").select("*").eq("task_id", task_id).execute()
+            await db.table("tasks").select("*").eq("task_id", task_id).execute()
         )
 
         if not existing_task.data:
@@ -473,11 +498,13 @@ async def delete_task(task_id: int, current_user: dict = Depends(get_current_use
             )
 
         # Delete task
-        response = supabase.table("tasks").delete().eq("task_id", task_id).execute()
+        response = await db.table("tasks").delete().eq("task_id", task_id).execute()
 
         if not response.data:
             raise HTTPException(status_code=500, detail="Failed to delete task")
 
+        change_feed.publish("task", "deleted", existing_task.data[0])
+
         return {"message": "Task deleted successfully"}
 
     except HTTPException as he:
@@ -488,15 +515,3 @@ async def delete_task(task_id: int, current_user: dict = Depends(get_current_use
         error_msg = f"Error deleting task: {str(e)}"
         logger.error(error_msg)
         raise HTTPException(status_code=500, detail=error_msg)
-
-
-@router.get("/statuses")
-async def get_task_statuses():
-    """Get all valid statuses for tasks"""
-    return {"statuses": list(TASK_STATUSES.values())}
-
-
-@router.get("/priorities")
-async def get_task_priorities():
-    """Get all valid priorities for tasks"""
-    return {"priorities": list(PRIORITIES.values())}
@@ -2,8 +2,11 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
 from typing import List, Optional
 from pydantic import BaseModel
-from database import supabase
+from database import db
 from auth import get_current_user
+from http_cache import immutable
+from projection import Projection
+from resources.columns import WORK_ITEM_COLUMNS, WORK_ITEM_LIST_FIELDS
 import logging
 from datetime import datetime, timedelta
 
@@ -98,7 +101,7 @@ async def create_work_item(
         # Check if project exists if project_id is provided
         if work_item.project_id:
             project = (
-                supabase.table("projects")
+                await db.table("projects")
                 .select("project_id")
                 .eq("project_id", work_item.project_id)
                 .execute()
@@ -116,7 +119,7 @@ async def create_work_item(
         due_date = work_item.due_date if work_item.due_date else None
 
         response = (
-            supabase.table("work_items")
+            await db.table("work_items")
             .insert(
                 {
                     "description": work_item.description,
@@ -142,7 +145,7 @@ async def create_work_item(
             follow_up_date = (datetime.now() + timedelta(days=3)).date().isoformat()
 
             # Create a task record for the follow-up
-            supabase.table("tasks").insert(
+            await db.table("tasks").insert(
                 {
                     "title": f"Follow up with {work_item.description}",
                     "project_id": work_item.project_id
@@ -181,6 +184,7 @@ async def get_work_items(
     priority: Optional[str] = None,
     assigned_to: Optional[str] = None,
     project_id: Optional[int] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, or * for whole rows"),
     current_user: dict = Depends(get_current_user),
 ):
     """Get all work items with optional filtering"""
@@ -192,8 +196,9 @@ async def get_work_items(
             f"Fetching work items with filters: status={status}, priority={priority}, assigned_to={assigned_to}"
         )
 
-        # Start with base query
-        query = supabase.table("work_items").select("*")
+        # Start with base query, reading only the columns the list needs
+        projection = Projection(fields, WORK_ITEM_COLUMNS, WORK_ITEM_LIST_FIELDS)
+        query = db.table("work_items").select(projection.select)
 
         # Apply filters if provided
         if status:
@@ -206,7 +211,7 @@ async def get_work_items(
             query = query.eq("project_id", project_id)
 
         # Execute query
-        response = query.order("id", desc=True).execute()
+        response = await query.order("id", desc=True).execute()
 
         logger.info(f"Found {len(response.data)} work items")
 
@@ -232,7 +237,7 @@ async def get_work_item(
             raise HTTPException(status_code=401, detail="Not authenticated")
 
         response = (
-            supabase.table("work_items").select("*").eq("id", work_item_id).execute()
+            await db.table("work_items").select("*").eq("id", work_item_id).execute()
         )
 
         if not response.data:
@@ -265,7 +270,7 @@ async def update_work_item(
 
         # Check if work item exists
         existing_item = (
-            supabase.table("work_items").select("*").eq("id", work_item_id).execute()
+            await db.table("work_items").select("*").eq("id", work_item_id).execute()
         )
 
         if not existing_item.data:
@@ -321,7 +326,7 @@ async def update_work_item(
 
         # Update work item
         response = (
-            supabase.table("work_items")
+            await db.table("work_items")
             .update(update_data)
             .eq("id", work_item_id)
             .execute()
@@ -338,12 +343,12 @@ async def update_work_item(
             if work_item_update.status == STATUSES["QUOTE_ACCEPTED"]:
                 # If quote is accepted and the item has a project_id, update the project status
                 if current_item.get("project_id"):
-                    supabase.table("projects").update(
+                    await db.table("projects").update(
                         {"status": "Active", "last_status_update": now.isoformat()}
                     ).eq("project_id", current_item["project_id"]).execute()
 
                 # Create a task for materials ordering
-                supabase.table("tasks").insert(
+                await db.table("tasks").insert(
                     {
                         "title": f"Order materials for {current_item['description']}",
                         "project_id": current_item.get("project_id") or 0,
@@ -360,7 +365,7 @@ async def update_work_item(
 
             elif work_item_update.status == STATUSES["DELIVERED"]:
                 # Create a task for invoice generation
-                supabase.table("tasks").insert(
+                await db.table("tasks").insert(
                     {
                         "title": f"Generate invoice for {current_item['description']}",
                         "project_id": current_item.get("project_id") or 0,
@@ -376,7 +381,7 @@ async def update_work_item(
                 ).execute()
 
                 # Create a task for customer follow-up (14 days later)
-                supabase.table("tasks").insert(
+                await db.table("tasks").insert(
                     {
                         "title": f"Follow up with customer after delivery: {current_item['description']}",
                         "project_id": current_item.get("project_id") or 0,
@@ -392,7 +397,7 @@ async def update_work_item(
                 ).execute()
 
                 # Also create a communication record for scheduling
-                supabase.table("communications").insert(
+                await db.table("communications").insert(
                     {
                         "related_to_type": "Project",
                         "related_to_id": current_item.get("project_id") or 0,
@@ -435,7 +440,7 @@ async def delete_work_item(
 
         # Check if work item exists
         existing_item = (
-            supabase.table("work_items").select("*").eq("id", work_item_id).execute()
+            await db.table("work_items").select("*").eq("id", work_item_id).execute()
         )
 
         if not existing_item.data:
@@ -445,7 +450,7 @@ async def delete_work_item(
 
         # Delete work item
         response = (
-            supabase.table("work_items").delete().eq("id", work_item_id).execute()
+            await db.table("work_items").delete().eq("id", work_item_id).execute()
         )
 
         if not response.data:
@@ -464,12 +469,14 @@ async def delete_work_item(
 
 
 @router.get("/statuses")
+@immutable
 async def get_statuses():
     """Get all valid statuses for work items"""
     return {"statuses": list(STATUSES.values())}
 
 
 @router.get("/priorities")
+@immutable
 async def get_priorities():
     """Get all valid priorities for work items"""
     return {"priorities": list(PRIORITIES.values())}
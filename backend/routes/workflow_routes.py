@@ -2,8 +2,14 @@
 from fastapi import APIRouter, HTTPException, Depends
 from typing import Optional
 from auth import get_current_user
+from http_cache import immutable
 import logging
-from resources.workflow_constants import get_workflow_stages, get_all_statuses
+from resources.workflow_constants import (
+    WORKFLOW_TABLES,
+    get_all_statuses,
+    get_workflow_stages,
+    get_workflow_table,
+)
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -13,6 +19,7 @@ router = APIRouter(prefix="/workflow", tags=["workflow"])
 
 
 @router.get("/stages/{workflow_type}")
+@immutable
 async def get_workflow_stages_endpoint(
     workflow_type: str, current_user: dict = Depends(get_current_user)
 ):
@@ -21,7 +28,7 @@ async def get_workflow_stages_endpoint(
         if not current_user:
             raise HTTPException(status_code=401, detail="Not authenticated")
 
-        if workflow_type not in ["MATERIALS_ONLY", "MATERIALS_AND_INSTALLATION"]:
+        if workflow_type not in WORKFLOW_TABLES:
             raise HTTPException(
                 status_code=400,
                 detail="Invalid workflow type. Must be MATERIALS_ONLY or MATERIALS_AND_INSTALLATION",
@@ -46,6 +53,7 @@ async def get_workflow_stages_endpoint(
 
 
 @router.get("/statuses/{workflow_type}")
+@immutable
 async def get_workflow_statuses_endpoint(
     workflow_type: str, current_user: dict = Depends(get_current_user)
 ):
@@ -54,14 +62,13 @@ async def get_workflow_statuses_endpoint(
         if not current_user:
             raise HTTPException(status_code=401, detail="Not authenticated")
 
-        if workflow_type not in ["MATERIALS_ONLY", "MATERIALS_AND_INSTALLATION"]:
+        if workflow_type not in WORKFLOW_TABLES:
             raise HTTPException(
                 status_code=400,
                 detail="Invalid workflow type. Must be MATERIALS_ONLY or MATERIALS_AND_INSTALLATION",
             )
 
-        stages = get_workflow_stages(workflow_type)
-        statuses = get_all_stages(stages)
+        statuses = get_all_statuses(workflow_type)
 
         return {"statuses": statuses}
     except HTTPException as he:
@@ -84,30 +91,23 @@ async def get_next_status_endpoint(
         if not current_user:
             raise HTTPException(status_code=401, detail="Not authenticated")
 
-        if workflow_type not in ["MATERIALS_ONLY", "MATERIALS_AND_INSTALLATION"]:
+        if workflow_type not in WORKFLOW_TABLES:
             raise HTTPException(
                 status_code=400,
                 detail="Invalid workflow type. Must be MATERIALS_ONLY or MATERIALS_AND_INSTALLATION",
             )
 
-        stages = get_workflow_stages(workflow_type)
-
-        # Find the current status in all stages
-        all_statuses = []
-        for stage in stages:
-            for status in stage["statuses"]:
-                all_statuses.append(status["id"])
+        table = get_workflow_table(workflow_type)
 
-        if current_status not in all_statuses:
+        if current_status not in table.next_status:
             raise HTTPException(
                 status_code=400,
                 detail=f"Invalid status '{current_status}' for workflow type {workflow_type}",
             )
 
         # Find the next status
-        current_index = all_statuses.index(current_status)
-        if current_index < len(all_statuses) - 1:
-            next_status = all_statuses[current_index + 1]
+        next_status = table.next_status[current_status]
+        if next_status:
             return {"next_status": next_status}
         else:
             return {
@@ -125,6 +125,7 @@ async def get_next_status_endpoint(
 
 
 @router.get("/full-workflow/{workflow_type}")
+@immutable
 async def get_full_workflow_endpoint(
     workflow_type: str, current_user: dict = Depends(get_current_user)
 ):
@@ -133,7 +134,7 @@ async def get_full_workflow_endpoint(
         if not current_user:
             raise HTTPException(status_code=401, detail="Not authenticated")
 
-        if workflow_type not in ["MATERIALS_ONLY", "MATERIALS_AND_INSTALLATION"]:
+        if workflow_type not in WORKFLOW_TABLES:
             raise HTTPException(
                 status_code=400,
                 detail="Invalid workflow type. Must be MATERIALS_ONLY or MATERIALS_AND_INSTALLATION",
@@ -146,7 +147,7 @@ async def get_full_workflow_endpoint(
             "workflow_type": workflow_type,
             "stages": stages,
             "total_stages": len(stages),
-            "total_statuses": len(stages),
+            "total_statuses": get_workflow_table(workflow_type).total_statuses,
         }
 
     except HTTPException as he:
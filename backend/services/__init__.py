@@ -0,0 +1,3 @@
+# services/__init__.py
+# Shared, stateful helpers used by the route modules and scripts
+# Do not import modules here to avoid circular imports
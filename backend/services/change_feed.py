@@ -0,0 +1,165 @@
+# change_feed.py
+import asyncio
+import itertools
+import os
+import secrets
+from collections import deque
+from typing import FrozenSet, Iterable, List, NamedTuple, Optional
+
+# Changes kept for clients that reconnect with Last-Event-ID
+CHANGE_FEED_HISTORY = int(os.getenv("CHANGE_FEED_HISTORY", "1000"))
+
+# Changes a slow subscriber may fall behind by before it is told to reload
+CHANGE_FEED_QUEUE_SIZE = int(os.getenv("CHANGE_FEED_QUEUE_SIZE", "256"))
+
+
+class Change(NamedTuple):
+    """One delta published to the feed: what changed, how, and the new row"""
+
+    id: int
+    kind: str  # "order", "task" or "order_event"
+    action: str  # "created", "updated" or "deleted"
+    order_id: Optional[str]
+    assignees: FrozenSet[str]
+    data: dict
+
+    def as_message(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "action": self.action,
+            "order_id": self.order_id,
+            "data": self.data,
+        }
+
+
+class ChangeFilter(NamedTuple):
+    kinds: Optional[FrozenSet[str]] = None
+    order_id: Optional[str] = None
+    assigned_to: Optional[str] = None
+
+    def matches(self, change: Change) -> bool:
+        if self.kinds is not None and change.kind not in self.kinds:
+            return False
+        if self.order_id is not None and change.order_id != self.order_id:
+            return False
+        if self.assigned_to is not None and self.assigned_to not in change.assignees:
+            return False
+        return True
+
+
+# Queued for a subscriber that fell too far behind; its client should refetch
+RESET = object()
+
+
+class Subscription:
+    def __init__(self, feed: "ChangeFeed", change_filter: ChangeFilter):
+        self.feed = feed
+        self.filter = change_filter
+        # Subscriptions are opened from request handlers, so on Python 3.9 the
+        # queue binds to the serving loop
+        self.queue: "asyncio.Queue" = asyncio.Queue(maxsize=CHANGE_FEED_QUEUE_SIZE)
+
+    def offer(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # Dropping single changes would leave the client silently wrong, so
+            # discard the backlog and ask it to reload instead
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESET)
+
+    async def get(self, timeout: float):
+        """Next change (or RESET) for this subscriber, or None after timeout seconds"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.feed._subscriptions.discard(self)
+
+
+class ChangeFeed:
+    """In-process pub/sub for order, task and order event writes.
+
+    Write paths call publish() after their database write succeeds; each
+    open /changes/stream connection holds a Subscription that receives the
+    changes matching its filter. The feed is per worker: subscribers only
+    see writes handled by the same process.
+    """
+
+    def __init__(self, history: int = CHANGE_FEED_HISTORY):
+        # Event ids are "<epoch>-<n>"; the epoch tells ids from an earlier run
+        # (or another worker) apart from this feed's own
+        self.epoch = secrets.token_hex(4)
+        self._ids = itertools.count(1)
+        self._history: "deque[Change]" = deque(maxlen=history)
+        self._subscriptions = set()
+
+    def publish(self, kind: str, action: str, data: Optional[dict], previous: Optional[dict] = None):
+        """Record a change and hand it to every matching subscriber.
+
+        previous is the row before an update; its assignee also receives the
+        change so a reassigned task leaves the old assignee's list.
+        """
+        if not data:
+            return
+        order_id = data.get("order_id") or (previous or {}).get("order_id")
+        assignees = frozenset(
+            str(row["assigned_to"]) for row in (data, previous or {}) if row.get("assigned_to")
+        )
+        change = Change(
+            id=next(self._ids),
+            kind=kind,
+            action=action,
+            order_id=str(order_id) if order_id else None,
+            assignees=assignees,
+            data=data,
+        )
+        self._history.append(change)
+        for subscription in list(self._subscriptions):
+            if subscription.filter.matches(change):
+                subscription.offer(change)
+
+    def publish_many(self, kind: str, action: str, rows: Iterable[dict]):
+        for row in rows or ():
+            self.publish(kind, action, row)
+
+    def event_id(self, change: Change) -> str:
+        return f"{self.epoch}-{change.id}"
+
+    def subscribe(self, change_filter: ChangeFilter, last_event_id: Optional[str] = None) -> Subscription:
+        """Open a subscription, first queueing changes missed since last_event_id"""
+        subscription = Subscription(self, change_filter)
+        if last_event_id:
+            missed = self._since(last_event_id)
+            if missed is None:
+                subscription.offer(RESET)
+            else:
+                for change in missed:
+                    if change_filter.matches(change):
+                        subscription.offer(change)
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def _since(self, last_event_id: str) -> Optional[List[Change]]:
+        # None when the history no longer reaches back that far, or the id
+        # came from another process or from before a restart
+        epoch, _, seq = last_event_id.partition("-")
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        last_event_id = int(seq)
+        if last_event_id >= self.last_id:
+            return [] if last_event_id == self.last_id else None
+        if not self._history or self._history[0].id > last_event_id + 1:
+            return None
+        return [change for change in self._history if change.id > last_event_id]
+
+    @property
+    def last_id(self) -> int:
+        return self._history[-1].id if self._history else 0
+
+
+change_feed = ChangeFeed()
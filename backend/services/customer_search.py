@@ -0,0 +1,49 @@
+# customer_search.py
+import os
+from typing import List, Optional
+
+from database import db
+from services.cache import TTLCache
+
+# Results for a query are reused for this long; typing in the customer picker
+# repeats the same prefixes within seconds
+CUSTOMER_SEARCH_TTL = float(os.getenv("CUSTOMER_SEARCH_TTL", "15"))
+
+_search_cache = TTLCache(ttl=CUSTOMER_SEARCH_TTL, maxsize=512)
+
+
+async def search_customers(
+    search: str,
+    customer_type: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0,
+) -> List[dict]:
+    """Ranked customer search through the search_customers() database function.
+
+    Matches name, contact name, email, phone and address using the trigram
+    index from migration 017.
+    """
+    term = " ".join(search.lower().split())
+    customer_type = customer_type.upper() if customer_type else None
+    key = (term, customer_type, limit, offset)
+
+    customers = _search_cache.get(key)
+    if customers is TTLCache.MISSING:
+        query = await db.rpc(
+            "search_customers",
+            {
+                "p_query": term,
+                "p_customer_type": customer_type,
+                "p_limit": limit,
+                "p_offset": offset,
+            },
+        )
+        response = await query.execute()
+        customers = response.data or []
+        _search_cache.set(key, customers)
+    return customers
+
+
+def invalidate_customer_search():
+    """Drop cached results after a customer is created, changed or removed"""
+    _search_cache.clear()
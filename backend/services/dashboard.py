@@ -0,0 +1,81 @@
+# dashboard.py
+import os
+from collections import Counter
+from datetime import date
+
+from database import db
+from resources.workflow_constants import map_workflow_status_to_stage
+from services.cache import TTLCache
+from services.user_directory import attach_user_emails
+
+# The dashboard is reloaded by every open session; a few seconds of staleness
+# lets them share one query
+DASHBOARD_SUMMARY_TTL = float(os.getenv("DASHBOARD_SUMMARY_TTL", "5"))
+
+# Days ahead counted as upcoming, and the length of each list on the dashboard
+DASHBOARD_UPCOMING_DAYS = 7
+DASHBOARD_LIST_LIMIT = 5
+
+_summary_cache = TTLCache(ttl=DASHBOARD_SUMMARY_TTL, maxsize=8)
+
+
+def _fold_order_counts(groups):
+    """Fold the grouped order rows into totals per stage, workflow type and priority"""
+    by_stage, by_type, by_priority = Counter(), Counter(), Counter()
+    for group in groups:
+        count = group["count"]
+        # Orders written before migration 014 have no stored stage yet
+        stage = group.get("workflow_stage") or map_workflow_status_to_stage(
+            group.get("workflow_status"), group.get("workflow_type")
+        )
+        by_stage[stage] += count
+        by_type[group.get("workflow_type") or "UNSPECIFIED"] += count
+        by_priority[group.get("priority") or "UNSPECIFIED"] += count
+    return {
+        "total": sum(by_stage.values()),
+        "by_stage": dict(by_stage),
+        "by_workflow_type": dict(by_type),
+        "by_priority": dict(by_priority),
+    }
+
+
+async def get_dashboard_summary() -> dict:
+    """Counts and short lists for the dashboard from one dashboard_summary() call"""
+    today = date.today()
+    summary = _summary_cache.get(today)
+    if summary is TTLCache.MISSING:
+        query = await db.rpc(
+            "dashboard_summary",
+            {
+                "p_today": today.isoformat(),
+                "p_upcoming_days": DASHBOARD_UPCOMING_DAYS,
+                "p_list_limit": DASHBOARD_LIST_LIMIT,
+            },
+        )
+        response = await query.execute()
+        data = response.data or {}
+
+        by_assignee = data.get("tasks_by_assignee") or []
+        orders = _fold_order_counts(data.get("orders") or [])
+        orders["completed_this_month"] = data.get("orders_completed_this_month") or 0
+
+        summary = {
+            "as_of": today.isoformat(),
+            "orders": orders,
+            "tasks": {
+                "by_status": data.get("tasks_by_status") or {},
+                "by_assignee": by_assignee,
+                "open": sum(row["open"] for row in by_assignee),
+                "overdue": sum(row["overdue"] for row in by_assignee),
+                "due_today": sum(row["due_today"] for row in by_assignee),
+                "upcoming": sum(row["upcoming"] for row in by_assignee),
+                "overdue_tasks": data.get("overdue_tasks") or [],
+                "due_today_tasks": data.get("due_today_tasks") or [],
+                "upcoming_tasks": data.get("upcoming_tasks") or [],
+            },
+            "recent_orders": data.get("recent_orders") or [],
+            "recent_activity": await attach_user_emails(data.get("recent_activity") or []),
+        }
+        _summary_cache.set(today, summary)
+    return summary
+
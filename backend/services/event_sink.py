@@ -0,0 +1,299 @@
+# event_sink.py
+import asyncio
+import glob
+import json
+import logging
+import os
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+from postgrest.exceptions import APIError
+from starlette.concurrency import run_in_threadpool
+
+from database import db
+from services.change_feed import change_feed
+
+logger = logging.getLogger(__name__)
+
+EVENT_SINK_BATCH_SIZE = int(os.getenv("EVENT_SINK_BATCH_SIZE", "100"))
+EVENT_SINK_FLUSH_INTERVAL = float(os.getenv("EVENT_SINK_FLUSH_INTERVAL", "1.0"))
+# Each worker process spools to its own files in this directory, so workers
+# never race on one file's replay rename
+EVENT_SINK_SPOOL_DIR = os.path.abspath(
+    os.getenv("EVENT_SINK_SPOOL_DIR", os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+# SQLSTATE classes worth retrying: connection exceptions, transaction
+# rollbacks (serialization failures, deadlocks), insufficient resources,
+# operator intervention (shutdown) and system errors. PGRST000-PGRST003 are
+# PostgREST failing to reach or pool connections to the database.
+TRANSIENT_SQLSTATE_CLASSES = ("08", "40", "53", "57", "58")
+TRANSIENT_POSTGREST_CODES = ("PGRST000", "PGRST001", "PGRST002", "PGRST003")
+
+
+def is_transient(error: Exception) -> bool:
+    """Whether a failed insert may succeed if retried later.
+
+    Transport errors and server-side outages are transient. A row the
+    database rejects (constraint or foreign key violation, bad column or
+    value) will be rejected again, so retrying it is pointless.
+    """
+    if not isinstance(error, APIError):
+        return True
+    code = error.code
+    if isinstance(code, int):
+        # The response wasn't JSON, e.g. a proxy error page
+        return code >= 500
+    code = str(code or "")
+    return code.startswith(TRANSIENT_SQLSTATE_CLASSES) or code in TRANSIENT_POSTGREST_CODES
+
+
+class EventSink:
+    """Write-behind buffer for audit rows.
+
+    Routes call emit() and return immediately. A background task writes the
+    buffered rows as bulk inserts once batch_size rows are waiting or every
+    flush_interval seconds.
+
+    Rows that fail for a transient reason (database or network down) are
+    appended to a per-process JSONL spool file and replayed after the next
+    successful flush or restart. A chunk the database rejects is retried row
+    by row, and the rows rejected on their own go to a dead-letter file
+    instead, so one bad row never holds back the rest.
+
+    With id_column set, emit() gives each row a uuid4 in that column, so
+    callers can publish a row before it is written under the id it will be
+    stored with. on_rejected is called with the rows sent to the dead-letter
+    file.
+    """
+
+    def __init__(
+        self,
+        table: str,
+        batch_size: int = EVENT_SINK_BATCH_SIZE,
+        flush_interval: float = EVENT_SINK_FLUSH_INTERVAL,
+        spool_dir: str = EVENT_SINK_SPOOL_DIR,
+        id_column: Optional[str] = None,
+        on_rejected: Optional[Callable[[List[dict]], None]] = None,
+    ):
+        self.table = table
+        self.id_column = id_column
+        self.on_rejected = on_rejected
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spool_dir = spool_dir
+        self._buffer: List[dict] = []
+        # Created in start(): on Python 3.9 asyncio primitives bind to the
+        # loop that is current when they are constructed
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # Paths are resolved on use rather than in __init__, so a worker forked
+    # after import still gets files named after its own pid
+    @property
+    def spool_path(self) -> str:
+        return os.path.join(self.spool_dir, f"{self.table}.{os.getpid()}.spool.jsonl")
+
+    @property
+    def dead_letter_path(self) -> str:
+        return os.path.join(self.spool_dir, f"{self.table}.{os.getpid()}.dead.jsonl")
+
+    def emit(self, row: dict):
+        if self.id_column:
+            row.setdefault(self.id_column, str(uuid.uuid4()))
+        self._buffer.append(row)
+        if self._wakeup is not None and len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    def emit_many(self, rows: List[dict]):
+        for row in rows:
+            self.emit(row)
+
+    def _bind(self):
+        if self._flush_lock is None:
+            self._wakeup = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+
+    async def start(self):
+        if self._task is None:
+            self._bind()
+            await self.replay_spool()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing {self.table} buffer: {str(e)}")
+
+    async def flush(self):
+        self._bind()
+        async with self._flush_lock:
+            rows, self._buffer = self._buffer, []
+            if not rows:
+                return
+
+            failed, rejected = await self._write(rows)
+            await self._dead_letter(rejected)
+            if failed:
+                await self._spool(failed)
+            elif os.path.exists(self.spool_path):
+                # The database is reachable again, so retry anything spooled
+                await self._replay_spool_locked()
+
+    async def replay_spool(self):
+        self._bind()
+        async with self._flush_lock:
+            await self._replay_spool_locked()
+
+    async def _write(self, rows: List[dict]) -> Tuple[List[dict], List[dict]]:
+        """Insert rows in bulk.
+
+        Returns the rows to retry later and the rows the database rejected.
+        """
+        # PostgREST needs every row in one insert to have the same keys
+        groups: Dict[Tuple[str, ...], List[dict]] = {}
+        for row in rows:
+            groups.setdefault(tuple(sorted(row)), []).append(row)
+
+        failed = []
+        rejected = []
+        for group in groups.values():
+            for start in range(0, len(group), self.batch_size):
+                chunk = group[start : start + self.batch_size]
+                try:
+                    await db.table(self.table).insert(chunk).execute()
+                except Exception as e:
+                    if is_transient(e):
+                        logger.warning(
+                            f"Failed to write {len(chunk)} {self.table} rows, spooling: {str(e)}"
+                        )
+                        failed.extend(chunk)
+                        continue
+                    # One bad row fails the whole insert; find it by writing
+                    # the chunk's rows one at a time
+                    for row in chunk:
+                        try:
+                            await db.table(self.table).insert(row).execute()
+                        except Exception as row_error:
+                            if is_transient(row_error):
+                                failed.append(row)
+                            elif self.id_column and getattr(row_error, "code", None) == "23505":
+                                # Unique violation on a generated id: an earlier
+                                # attempt was stored before its response was lost
+                                continue
+                            else:
+                                logger.error(
+                                    f"{self.table} row rejected, dead-lettering: {str(row_error)}"
+                                )
+                                rejected.append(row)
+        return failed, rejected
+
+    async def _spool(self, rows: List[dict]):
+        await self._append(self.spool_path, rows)
+
+    async def _dead_letter(self, rows: List[dict]):
+        # Kept for inspection; nothing replays this file
+        await self._append(self.dead_letter_path, rows)
+        if rows and self.on_rejected is not None:
+            try:
+                self.on_rejected(rows)
+            except Exception as e:
+                logger.error(f"Error handling rejected {self.table} rows: {str(e)}")
+
+    async def _append(self, path: str, rows: List[dict]):
+        if not rows:
+            return
+        lines = "".join(json.dumps(row, default=str) + "\n" for row in rows)
+
+        def append():
+            with open(path, "a", encoding="utf-8") as spool:
+                spool.write(lines)
+
+        await run_in_threadpool(append)
+
+    def _orphaned_spools(self) -> List[str]:
+        """Spool and replay files left by worker processes that have exited"""
+        orphans = []
+        pattern = os.path.join(self.spool_dir, f"{self.table}.*.spool.jsonl*")
+        for path in glob.glob(pattern):
+            pid = os.path.basename(path)[len(self.table) + 1 :].split(".", 1)[0]
+            if not pid.isdigit() or int(pid) == os.getpid():
+                continue
+            try:
+                os.kill(int(pid), 0)
+            except ProcessLookupError:
+                orphans.append(path)
+            except PermissionError:
+                # Alive, but owned by another user
+                pass
+        return orphans
+
+    async def _replay_spool_locked(self):
+        replay_path = f"{self.spool_path}.replay"
+        adopt_path = f"{self.spool_path}.adopt"
+
+        def take_spool():
+            # Move the spool aside first so rows that fail again are appended
+            # to a fresh file instead of being read twice. A replay file left
+            # behind by a crash mid-replay is picked up as well, and so are
+            # the spools of workers that have since exited.
+            rows = []
+            sources = [replay_path, adopt_path, self.spool_path] + self._orphaned_spools()
+            for path in sources:
+                if path != replay_path:
+                    # rename is atomic, so when several workers find the same
+                    # orphan only one of them claims it
+                    try:
+                        os.rename(path, adopt_path)
+                    except FileNotFoundError:
+                        continue
+                    path = adopt_path
+                try:
+                    with open(path, encoding="utf-8") as spool:
+                        rows.extend(json.loads(line) for line in spool if line.strip())
+                except FileNotFoundError:
+                    continue
+                if path == adopt_path:
+                    with open(replay_path, "w", encoding="utf-8") as spool:
+                        spool.writelines(json.dumps(row, default=str) + "\n" for row in rows)
+                    os.remove(adopt_path)
+            return rows
+
+        rows = await run_in_threadpool(take_spool)
+        if not rows:
+            if os.path.exists(replay_path):
+                os.remove(replay_path)
+            return
+        logger.info(f"Replaying {len(rows)} spooled {self.table} rows")
+        failed, rejected = await self._write(rows)
+        await self._dead_letter(rejected)
+        if failed:
+            await self._spool(failed)
+        os.remove(replay_path)
+
+
+# Audit trail for order mutations. Rows are published to the change feed as
+# they are emitted, so rows the database later rejects are retracted.
+audit_events = EventSink(
+    "order_events",
+    id_column="event_id",
+    on_rejected=lambda rows: change_feed.publish_many("order_event", "deleted", rows),
+)
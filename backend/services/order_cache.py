@@ -0,0 +1,57 @@
+# order_cache.py
+import os
+from typing import Optional
+
+from fastapi import HTTPException
+
+from database import db
+from services.cache import TTLCache
+
+# The handful of order columns guard checks need
+ORDER_HEADER_FIELDS = ("order_id", "workflow_type", "workflow_status", "customer_id", "updated_at")
+
+# Every write in this process invalidates its entry; the TTL bounds how long
+# a write made by another worker can go unseen
+ORDER_HEADER_TTL = float(os.getenv("ORDER_HEADER_TTL", "60"))
+
+_order_headers = TTLCache(ttl=ORDER_HEADER_TTL, maxsize=4096)
+
+
+def remember_order(order: dict):
+    """Cache the header of an order row that was just read or written"""
+    if order and order.get("order_id"):
+        _order_headers.set(
+            str(order["order_id"]), {field: order.get(field) for field in ORDER_HEADER_FIELDS}
+        )
+
+
+def invalidate_order(order_id):
+    _order_headers.invalidate(str(order_id))
+
+
+async def get_order_header(order_id) -> Optional[dict]:
+    """Return the cached header of an order, or None if the order does not exist"""
+    order_id = str(order_id)
+    header = _order_headers.get(order_id)
+    if header is TTLCache.MISSING:
+        response = (
+            await db.table("orders")
+            .select(", ".join(ORDER_HEADER_FIELDS))
+            .eq("order_id", order_id)
+            .limit(1)
+            .execute()
+        )
+        if not response.data:
+            # Misses are not cached: the order may be created by another worker
+            return None
+        header = response.data[0]
+        _order_headers.set(order_id, header)
+    return header
+
+
+async def require_order(order_id) -> dict:
+    """Return the header of an order, raising 404 if it does not exist"""
+    header = await get_order_header(order_id)
+    if header is None:
+        raise HTTPException(status_code=404, detail=f"Order with ID {order_id} not found")
+    return header
@@ -0,0 +1,511 @@
+# product_index.py
+import asyncio
+import heapq
+import logging
+import re
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+from database import db
+from pagination import apply_keyset, split_page
+from services.cache import TTLCache
+from services.settings_store import settings_store
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_INDEX_COLUMNS = (
+    "product_id, quickbooks_id, name, sku, description, type, is_active, "
+    "default_price, cost_price, last_synced_at"
+)
+PRODUCT_INDEX_PAGE_SIZE = 1000
+# Typeahead repeats the same prefixes; results are cached until the index changes
+PRODUCT_SEARCH_CACHE_SIZE = 512
+
+# How much a query token matching each field counts towards the score
+FIELD_WEIGHTS = {"sku": 4.0, "name": 3.0, "description": 1.0}
+# A query token equal to an indexed token scores this much more than a prefix
+EXACT_TOKEN_BOOST = 2.0
+# Fuzzy (trigram) matches count for less than a prefix match of the same field
+FUZZY_MATCH_WEIGHT = 0.5
+# Minimum trigram similarity for a fuzzy match, as in pg_trgm
+TRIGRAM_SIMILARITY_THRESHOLD = 0.3
+# Trigrams shared by more tokens than this only confirm candidates found
+# through rarer trigrams, so digit runs like "000" do not scan every SKU
+COMMON_TRIGRAM_TOKENS = 2000
+# A query token whose prefix matches more postings than this is common: it
+# is not matched in full but checked against the candidates of rarer query
+# tokens, or, when every token is common, read best match first
+COMMON_TOKEN_POSTINGS = 2000
+# When every query token is common, candidates read best first before giving
+# up on stopping early (the tokens rarely occur together, or few products pass
+# the filters) and matching the rarest token in full instead
+PRODUCT_SEARCH_SCAN_LIMIT = 2000
+# Posting lists at least this long are ranked after each load rather than
+# on the first search that needs them
+RANKED_POSTINGS_WARM_SIZE = 256
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _TOKEN_PATTERN.findall(text.lower()) if text else []
+
+
+def trigrams(token: str) -> Set[str]:
+    # Padded like pg_trgm so short tokens and word starts still get trigrams
+    padded = f"  {token} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class ProductIndex:
+    """In-memory typeahead index over the products table.
+
+    Query tokens are matched as prefixes of the words in each product's SKU,
+    name and description via a sorted vocabulary. When prefixes find too few
+    products, tokens are also matched by trigram similarity, which tolerates
+    typos and partial SKUs. Every query token has to match for a product to
+    be returned.
+
+    The index is loaded once and then kept current from the rows the
+    QuickBooks sync stamps with last_synced_at, so a refresh only reads the
+    products changed by syncs since the previous one.
+    """
+
+    def __init__(self):
+        self._products: Dict[str, dict] = {}
+        # product id -> {token: field weight}
+        self._product_tokens: Dict[str, Dict[str, float]] = {}
+        # token -> {product id: field weight}
+        self._postings: Dict[str, Dict[str, float]] = {}
+        # Sorted copy of the postings keys, for prefix lookups
+        self._vocabulary: List[str] = []
+        # token -> [(-field weight, rank, product id)], best first; built on
+        # demand and dropped when the token's postings change
+        self._ranked: Dict[str, List[tuple]] = {}
+        # trigram -> tokens containing it
+        self._trigrams: Dict[str, Set[str]] = {}
+        # product id -> tie-break key: shorter, then alphabetical names first,
+        # then product id so equal names order the same way on every path
+        self._rank: Dict[str, tuple] = {}
+        self._results = TTLCache(ttl=float("inf"), maxsize=PRODUCT_SEARCH_CACHE_SIZE)
+        self.loaded = False
+        self._since: Optional[str] = None
+        self._synced_marker: Optional[str] = None
+        # Created on first use: on Python 3.9 asyncio primitives bind to the
+        # loop that is current when they are constructed
+        self._lock: Optional[asyncio.Lock] = None
+
+    def __len__(self):
+        return len(self._products)
+
+    # Maintenance
+
+    def upsert(self, rows: Iterable[dict]):
+        for row in rows:
+            product_id = str(row["product_id"])
+            self._remove(product_id)
+            self._products[product_id] = row
+            name = row.get("name") or ""
+            self._rank[product_id] = (len(name), name.lower(), product_id)
+            tokens = self._tokens_for(row)
+            self._product_tokens[product_id] = tokens
+            for token, weight in tokens.items():
+                self._add_posting(token, product_id, weight)
+            synced_at = row.get("last_synced_at")
+            if synced_at and (self._since is None or synced_at > self._since):
+                self._since = synced_at
+        self._results.clear()
+
+    def _tokens_for(self, row: dict) -> Dict[str, float]:
+        tokens: Dict[str, float] = {}
+        fields = [(field, tokenize(row.get(field))) for field in FIELD_WEIGHTS]
+        # Also index the SKU with its punctuation removed, so "AB-100" is
+        # found by "ab100" as well as by "ab" and "100"
+        sku_tokens = tokenize(row.get("sku"))
+        if len(sku_tokens) > 1:
+            fields.append(("sku", ["".join(sku_tokens)]))
+        for field, field_tokens in fields:
+            for token in field_tokens:
+                tokens[token] = max(tokens.get(token, 0.0), FIELD_WEIGHTS[field])
+        return tokens
+
+    def _remove(self, product_id: str):
+        self._products.pop(product_id, None)
+        self._rank.pop(product_id, None)
+        for token in self._product_tokens.pop(product_id, {}):
+            postings = self._postings[token]
+            postings.pop(product_id, None)
+            self._ranked.pop(token, None)
+            if not postings:
+                self._drop_token(token)
+
+    def _add_posting(self, token: str, product_id: str, weight: float):
+        postings = self._postings.get(token)
+        if postings is None:
+            postings = self._postings[token] = {}
+            insort(self._vocabulary, token)
+            for trigram in trigrams(token):
+                self._trigrams.setdefault(trigram, set()).add(token)
+        postings[product_id] = weight
+        self._ranked.pop(token, None)
+
+    def _drop_token(self, token: str):
+        del self._postings[token]
+        del self._vocabulary[bisect_left(self._vocabulary, token)]
+        for trigram in trigrams(token):
+            tokens = self._trigrams[trigram]
+            tokens.discard(token)
+            if not tokens:
+                del self._trigrams[trigram]
+
+    def _ranked_postings(self, token: str) -> List[tuple]:
+        ranked = self._ranked.get(token)
+        if ranked is None:
+            rank = self._rank
+            ranked = self._ranked[token] = sorted(
+                (-weight, rank[product_id], product_id)
+                for product_id, weight in self._postings[token].items()
+            )
+        return ranked
+
+    def _warm_ranked_postings(self):
+        for token, postings in self._postings.items():
+            if len(postings) >= RANKED_POSTINGS_WARM_SIZE:
+                self._ranked_postings(token)
+
+    # Search
+
+    def _prefix_tokens(self, query_token: str) -> List[str]:
+        """Indexed tokens that start with query_token"""
+        vocabulary = self._vocabulary
+        # Tokens are [a-z0-9], all of which sort before "{"
+        return vocabulary[
+            bisect_left(vocabulary, query_token) : bisect_left(vocabulary, query_token + "{")
+        ]
+
+    def _matches(self, multipliers: Dict[str, float]) -> Dict[str, float]:
+        matches: Dict[str, float] = {}
+        for token, multiplier in multipliers.items():
+            for product_id, weight in self._postings[token].items():
+                score = weight * multiplier
+                if score > matches.get(product_id, 0.0):
+                    matches[product_id] = score
+        return matches
+
+    def _multipliers(self, query_token: str, tokens: List[str]) -> Dict[str, float]:
+        """Score multiplier of each indexed token matching query_token as a prefix"""
+        multipliers = dict.fromkeys(tokens, 1.0)
+        if query_token in multipliers:
+            multipliers[query_token] = EXACT_TOKEN_BOOST
+        return multipliers
+
+    def _ranked_matches(self, multipliers: Dict[str, float]) -> Iterator[tuple]:
+        """Yield (score, product id) for products having any of the tokens.
+
+        Products come best score first, then by rank, each once at its best
+        score, so a caller that only needs the top few can stop early. Tokens
+        are merged in groups by multiplier, and a group is only opened once
+        its best possible score could compete, so a short prefix's exact
+        token is read without touching the many longer tokens it prefixes.
+        """
+        groups: Dict[float, List[str]] = {}
+        for token, multiplier in multipliers.items():
+            groups.setdefault(multiplier, []).append(token)
+        pending = sorted(groups.items(), reverse=True)
+        top_weight = max(FIELD_WEIGHTS.values())
+
+        heap: List[tuple] = []
+        seen = set()
+        while True:
+            opened = False
+            while pending and (not heap or pending[0][0] * top_weight >= -heap[0][0]):
+                multiplier, tokens = pending.pop(0)
+                for token in tokens:
+                    weight, rank, product_id = self._ranked_postings(token)[0]
+                    heap.append((weight * multiplier, rank, product_id, 0, token, multiplier))
+                opened = True
+            if opened:
+                heapq.heapify(heap)
+            if not heap:
+                return
+            score, _, product_id, position, token, multiplier = heap[0]
+            ranked = self._ranked[token]
+            if position + 1 < len(ranked):
+                weight, rank, next_id = ranked[position + 1]
+                heapq.heapreplace(heap, (weight * multiplier, rank, next_id, position + 1, token, multiplier))
+            else:
+                heapq.heappop(heap)
+            if product_id not in seen:
+                seen.add(product_id)
+                yield -score, product_id
+
+    def _best_score(self, multipliers: Dict[str, float]) -> float:
+        """Highest score any product can get from the tokens"""
+        groups: Dict[float, List[str]] = {}
+        for token, multiplier in multipliers.items():
+            groups.setdefault(multiplier, []).append(token)
+        top_weight = max(FIELD_WEIGHTS.values())
+        best = 0.0
+        for multiplier, tokens in sorted(groups.items(), reverse=True):
+            if multiplier * top_weight <= best:
+                break
+            for token in tokens:
+                best = max(best, -self._ranked_postings(token)[0][0] * multiplier)
+        return best
+
+    def _token_score(self, product_id: str, multipliers: Dict[str, float]) -> float:
+        """Score of one product for a query token, from the product's own tokens"""
+        best = 0.0
+        for token, weight in self._product_tokens[product_id].items():
+            multiplier = multipliers.get(token)
+            if multiplier is not None and weight * multiplier > best:
+                best = weight * multiplier
+        return best
+
+    def _similar_tokens(self, query_token: str) -> Iterable[tuple]:
+        query_trigrams = trigrams(query_token)
+        # Jaccard similarity can only reach the threshold between tokens of
+        # comparable length (a padded token has len + 1 trigrams)
+        min_length = TRIGRAM_SIMILARITY_THRESHOLD * len(query_trigrams) - 1
+        max_length = len(query_trigrams) / TRIGRAM_SIMILARITY_THRESHOLD - 1
+
+        shared: Dict[str, int] = {}
+        common = 0
+        for trigram in query_trigrams:
+            tokens = self._trigrams.get(trigram, ())
+            if len(tokens) > COMMON_TRIGRAM_TOKENS:
+                common += 1
+                continue
+            for token in tokens:
+                shared[token] = shared.get(token, 0) + 1
+
+        for token, rare_shared in shared.items():
+            if not min_length <= len(token) <= max_length:
+                continue
+            # Cheap upper bound before computing the exact similarity
+            token_trigram_count = len(token) + 1
+            best_case = rare_shared + common
+            if best_case < TRIGRAM_SIMILARITY_THRESHOLD * (
+                len(query_trigrams) + token_trigram_count - best_case
+            ):
+                continue
+            token_trigrams = trigrams(token)
+            overlap = len(query_trigrams & token_trigrams)
+            similarity = overlap / (len(query_trigrams) + len(token_trigrams) - overlap)
+            if similarity >= TRIGRAM_SIMILARITY_THRESHOLD:
+                yield token, similarity
+
+    def _fuzzy_matches(self, similar: List[tuple], matches: Dict[str, float]):
+        for token, similarity in similar:
+            for product_id, weight in self._postings[token].items():
+                score = weight * similarity * FUZZY_MATCH_WEIGHT
+                if score > matches.get(product_id, 0.0):
+                    matches[product_id] = score
+
+    def search(
+        self,
+        query: str,
+        product_type: Optional[str] = None,
+        is_active: Optional[bool] = None,
+        limit: int = 20,
+    ) -> List[dict]:
+        """Return up to limit products matching every token of query, best first"""
+        query_tokens = tuple(dict.fromkeys(tokenize(query)))
+        if not query_tokens:
+            return []
+
+        cache_key = (query_tokens, (product_type or "").lower() or None, is_active, limit)
+        results = self._results.get(cache_key)
+        if results is TTLCache.MISSING:
+            results = self._search(query_tokens, cache_key[1], is_active, limit)
+            self._results.set(cache_key, results)
+        return [dict(product) for product in results]
+
+    def _search(
+        self,
+        query_tokens: tuple,
+        product_type: Optional[str],
+        is_active: Optional[bool],
+        limit: int,
+    ) -> List[dict]:
+        # Rare query tokens are matched in full; common ones (short prefixes,
+        # words in most descriptions) would touch most of the catalog, so
+        # they are only scored for the candidates rarer tokens leave
+        matched: List[Dict[str, float]] = []
+        common: List[Dict[str, float]] = []
+        for query_token in query_tokens:
+            tokens = self._prefix_tokens(query_token)
+            postings = 0
+            for token in tokens:
+                postings += len(self._postings[token])
+                if postings > COMMON_TOKEN_POSTINGS:
+                    break
+            if postings > COMMON_TOKEN_POSTINGS:
+                common.append(self._multipliers(query_token, tokens))
+                continue
+            matches = self._matches(self._multipliers(query_token, tokens))
+            if len(matches) < limit and len(query_token) >= 3:
+                similar = list(self._similar_tokens(query_token))
+                fuzzy_postings = sum(len(self._postings[token]) for token, _ in similar)
+                if postings + fuzzy_postings > COMMON_TOKEN_POSTINGS:
+                    # A typo of a common word
+                    multipliers = self._multipliers(query_token, tokens)
+                    for token, similarity in similar:
+                        multiplier = similarity * FUZZY_MATCH_WEIGHT
+                        if multiplier > multipliers.get(token, 0.0):
+                            multipliers[token] = multiplier
+                    common.append(multipliers)
+                    continue
+                self._fuzzy_matches(similar, matches)
+            if not matches:
+                return []
+            matched.append(matches)
+
+        if not matched:
+            results = self._search_common(common, product_type, is_active, limit)
+            if results is not None:
+                return results
+            # Stopping early did not pay off, so match the rarest token in full
+            common.sort(key=lambda multipliers: sum(len(self._postings[token]) for token in multipliers))
+            matched.append(self._matches(common.pop(0)))
+
+        # Intersect from the rarest token, so each step filters fewer products
+        matched.sort(key=len)
+        scores = dict(matched[0])
+        for matches in matched[1:]:
+            scores = {
+                product_id: score + matches[product_id]
+                for product_id, score in scores.items()
+                if product_id in matches
+            }
+            if not scores:
+                return []
+        scores = {
+            product_id: score
+            for product_id, score in scores.items()
+            if self._passes(product_id, product_type, is_active)
+        }
+        for multipliers in common:
+            next_scores = {}
+            for product_id, score in scores.items():
+                token_score = self._token_score(product_id, multipliers)
+                if token_score:
+                    next_scores[product_id] = score + token_score
+            scores = next_scores
+            if not scores:
+                return []
+
+        rank = self._rank
+        best = heapq.nsmallest(
+            limit,
+            scores,
+            key=lambda product_id: (-scores[product_id], rank[product_id]),
+        )
+        return [
+            {**self._products[product_id], "score": round(scores[product_id], 3)}
+            for product_id in best
+        ]
+
+    def _search_common(
+        self,
+        common: List[Dict[str, float]],
+        product_type: Optional[str],
+        is_active: Optional[bool],
+        limit: int,
+    ) -> Optional[List[dict]]:
+        """Search when every query token is common.
+
+        Candidates are read best match first from the token that is cheapest
+        to read that way, the one with the fewest indexed tokens at its top
+        multiplier (a prefix that is itself an indexed word has just one),
+        and the other tokens are scored per candidate. Reading stops as soon
+        as no later candidate could make the top limit; returns None if that
+        takes more than PRODUCT_SEARCH_SCAN_LIMIT candidates.
+        """
+        def top_group_size(multipliers: Dict[str, float]) -> int:
+            top = max(multipliers.values())
+            return sum(1 for multiplier in multipliers.values() if multiplier == top)
+
+        common.sort(key=top_group_size)
+        driving, others = common[0], common[1:]
+        # The most the other tokens can add to a candidate's score
+        headroom = sum(self._best_score(multipliers) for multipliers in others)
+
+        rank = self._rank
+        # (-score, rank, product id) of the best results so far, best first
+        best: List[tuple] = []
+        for scanned, (score, product_id) in enumerate(self._ranked_matches(driving)):
+            # Later candidates have a lower driving score or a later rank, so
+            # once this one cannot beat the last result none of them can
+            if len(best) >= limit and (-(score + headroom), rank[product_id]) > best[-1][:2]:
+                break
+            if scanned >= PRODUCT_SEARCH_SCAN_LIMIT:
+                return None
+            if not self._passes(product_id, product_type, is_active):
+                continue
+            total = score
+            for multipliers in others:
+                token_score = self._token_score(product_id, multipliers)
+                if not token_score:
+                    break
+                total += token_score
+            else:
+                insort(best, (-total, rank[product_id], product_id))
+                if len(best) > limit:
+                    best.pop()
+
+        return [
+            {**self._products[product_id], "score": round(-score, 3)}
+            for score, _, product_id in best
+        ]
+
+    def _passes(self, product_id: str, product_type: Optional[str], is_active: Optional[bool]) -> bool:
+        product = self._products[product_id]
+        if product_type is not None and (product.get("type") or "").lower() != product_type:
+            return False
+        if is_active is not None and (product.get("is_active") is not False) != is_active:
+            return False
+        return True
+
+    # Loading
+
+    async def ensure_current(self):
+        """Load the index, or catch up with a sync finished by any worker"""
+        if self.loaded and await settings_store.get("qb_products_last_synced") == self._synced_marker:
+            return
+        await self.refresh()
+
+    async def refresh(self):
+        """Apply the products written since the last refresh (everything, the first time)"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            marker = await settings_store.get("qb_products_last_synced")
+            if self.loaded and marker == self._synced_marker:
+                return
+            count = await self._load(self._since if self.loaded else None)
+            self._warm_ranked_postings()
+            self.loaded = True
+            self._synced_marker = marker
+            logger.info(f"Product index applied {count} products ({len(self)} indexed)")
+
+    async def _load(self, since: Optional[str]) -> int:
+        # Syncs stamp every row they write, deactivations included, so rows
+        # stamped at or after the newest stamp already indexed are the changes
+        key = ("last_synced_at", "product_id") if since else ("product_id",)
+        count = 0
+        cursor = None
+        while True:
+            query = db.table("products").select(PRODUCT_INDEX_COLUMNS)
+            if since:
+                query = query.gte("last_synced_at", since)
+            query = apply_keyset(query, key, cursor, PRODUCT_INDEX_PAGE_SIZE, desc=False)
+            response = await query.execute()
+            page, cursor = split_page(response.data or [], key, PRODUCT_INDEX_PAGE_SIZE)
+            self.upsert(page)
+            count += len(page)
+            if not cursor:
+                return count
+
+
+product_index = ProductIndex()
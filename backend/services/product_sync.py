@@ -0,0 +1,353 @@
+# product_sync.py
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+
+from postgrest.types import ReturnMethod
+from quickbooks.objects.item import Item
+from starlette.concurrency import run_in_threadpool
+
+from database import db
+from pagination import apply_keyset, split_page
+
+logger = logging.getLogger(__name__)
+
+# QuickBooks item types mirrored into the products table
+SYNCED_ITEM_TYPES = ("Inventory", "NonInventory", "Service")
+
+# Columns owned by QuickBooks; a product is rewritten only if one of these changed
+SYNCED_PRODUCT_FIELDS = (
+    "name",
+    "sku",
+    "description",
+    "type",
+    "is_active",
+    "default_price",
+    "cost_price",
+)
+
+PRODUCT_MAP_PAGE_SIZE = 1000
+PRODUCT_WRITE_CHUNK_SIZE = 500
+# Keep in_() filters well under URL length limits
+PRODUCT_ID_FILTER_CHUNK_SIZE = 200
+
+# integration_settings keys for incremental syncs. The watermark is the newest
+# QuickBooks MetaData.LastUpdatedTime committed locally, in QuickBooks' clock.
+PRODUCTS_WATERMARK_KEY = "qb_products_watermark"
+PRODUCTS_LAST_FULL_SYNC_KEY = "qb_products_last_full_sync"
+
+# Re-read a window before the watermark so items saved while the previous
+# sync ran are not missed; the diff makes the overlap cheap
+QB_SYNC_OVERLAP_SECONDS = int(os.getenv("QB_SYNC_OVERLAP_SECONDS", "300"))
+# How often a full catalog pass runs to catch items removed in QuickBooks
+QB_FULL_RECONCILE_HOURS = float(os.getenv("QB_FULL_RECONCILE_HOURS", "24"))
+
+# QuickBooks hides inactive items unless asked, and deactivation is how items
+# are deleted there, so both sync modes include them
+FULL_SYNC_WHERE = "Active IN (true, false)"
+
+# QuickBooks returns at most this many rows per query
+QB_MAX_RESULTS = 1000
+# Item pages fetched concurrently; QuickBooks allows 10 concurrent requests per company
+QB_PAGE_CONCURRENCY = int(os.getenv("QB_PAGE_CONCURRENCY", "4"))
+
+
+def product_data_from_item(item) -> dict:
+    """Map a QuickBooks Item onto the products columns it owns"""
+    return {
+        "quickbooks_id": str(item.Id),
+        "name": item.Name,
+        "sku": getattr(item, "Sku", None),
+        "description": getattr(item, "Description", None),
+        "type": item.Type,
+        "is_active": getattr(item, "Active", True),
+        "default_price": (
+            float(item.UnitPrice)
+            if hasattr(item, "UnitPrice") and item.UnitPrice is not None
+            else None
+        ),
+        "cost_price": (
+            float(item.PurchaseCost)
+            if hasattr(item, "PurchaseCost") and item.PurchaseCost is not None
+            else None
+        ),
+    }
+
+
+async def iter_item_pages(
+    where_clause: str,
+    qb,
+    page_size: int = QB_MAX_RESULTS,
+    concurrency: int = QB_PAGE_CONCURRENCY,
+) -> AsyncIterator[list]:
+    """Yield the results of an Item query one page at a time, in order.
+
+    Pages are requested over STARTPOSITION/MAXRESULTS with up to `concurrency`
+    requests in flight. New requests are only issued as the consumer takes
+    pages, so at most `concurrency` pages are held in memory.
+    """
+    total = await run_in_threadpool(Item.count, where_clause, qb) or 0
+
+    def fetch(start_position: int):
+        return run_in_threadpool(
+            Item.where,
+            where_clause,
+            order_by="Id",
+            start_position=start_position,
+            max_results=page_size,
+            qb=qb,
+        )
+
+    pending = deque()
+    next_position = 1
+    try:
+        while True:
+            while next_position <= total and len(pending) < concurrency:
+                pending.append(asyncio.ensure_future(fetch(next_position)))
+                next_position += page_size
+            if not pending:
+                return
+
+            page = await pending.popleft()
+            if page:
+                yield page
+            # Items added after the count was taken spill onto extra pages
+            if not pending and len(page) == page_size and next_position > total:
+                total += page_size
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def item_updated_at(item) -> Optional[str]:
+    return (getattr(item, "MetaData", None) or {}).get("LastUpdatedTime")
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+def needs_full_reconcile(watermark: Optional[str], last_full_sync: Optional[str]) -> bool:
+    last_full = _parse_time(last_full_sync)
+    if _parse_time(watermark) is None or last_full is None:
+        return True
+    if last_full.tzinfo is not None:
+        last_full = last_full.replace(tzinfo=None)
+    return datetime.now() - last_full >= timedelta(hours=QB_FULL_RECONCILE_HOURS)
+
+
+def incremental_where_clause(watermark: str) -> str:
+    """QuickBooks query filter for items changed since the watermark"""
+    since = _parse_time(watermark) - timedelta(seconds=QB_SYNC_OVERLAP_SECONDS)
+    return f"MetaData.LastUpdatedTime > '{since.isoformat()}' AND {FULL_SYNC_WHERE}"
+
+
+def newest_time(*values: Optional[str]) -> Optional[str]:
+    """The latest of several QuickBooks timestamps, ignoring missing ones"""
+    newest, newest_value = None, None
+    for value in values:
+        parsed = _parse_time(value)
+        if parsed is not None and (newest is None or parsed > newest):
+            newest, newest_value = parsed, value
+    return newest_value
+
+
+def latest_update_time(items: Iterable, watermark: Optional[str] = None) -> Optional[str]:
+    """Newest LastUpdatedTime among items, never moving backwards from watermark"""
+    return newest_time(watermark, *(item_updated_at(item) for item in items))
+
+
+def _comparable(field: str, value):
+    if field in ("default_price", "cost_price") and value is not None:
+        return round(float(value), 2)
+    if field == "description" and value == "":
+        return None
+    return value
+
+
+def product_changed(existing: dict, product_data: dict) -> bool:
+    return any(
+        _comparable(field, existing.get(field)) != _comparable(field, product_data.get(field))
+        for field in SYNCED_PRODUCT_FIELDS
+    )
+
+
+async def fetch_product_map(
+    quickbooks_ids: Optional[List[str]] = None, active_only: bool = False
+) -> Dict[str, dict]:
+    """Load QuickBooks-linked products keyed by quickbooks_id.
+
+    With no ids, pages through the whole table so the PostgREST row cap does
+    not truncate large catalogs; otherwise looks up only the given ids.
+    active_only skips products a full sync deactivated.
+    """
+    columns = ", ".join(
+        ("quickbooks_id", "product_id", "created_at", "last_synced_at") + SYNCED_PRODUCT_FIELDS
+    )
+    products = {}
+
+    if quickbooks_ids is not None:
+        for start in range(0, len(quickbooks_ids), PRODUCT_ID_FILTER_CHUNK_SIZE):
+            chunk = quickbooks_ids[start : start + PRODUCT_ID_FILTER_CHUNK_SIZE]
+            query = db.table("products").select(columns).in_("quickbooks_id", chunk)
+            if active_only:
+                query = query.eq("is_active", True)
+            response = await query.execute()
+            for row in response.data or []:
+                products[row["quickbooks_id"]] = row
+        return products
+
+    cursor = None
+    while True:
+        query = db.table("products").select(columns)
+        if active_only:
+            query = query.eq("is_active", True)
+        query = apply_keyset(query, ("quickbooks_id",), cursor, PRODUCT_MAP_PAGE_SIZE, desc=False)
+        response = await query.execute()
+        page, cursor = split_page(response.data or [], ("quickbooks_id",), PRODUCT_MAP_PAGE_SIZE)
+        for row in page:
+            if row.get("quickbooks_id"):
+                products[row["quickbooks_id"]] = row
+        if not cursor:
+            return products
+
+
+async def _upsert_chunks(rows: List[dict]) -> int:
+    """Upsert rows on quickbooks_id in chunks, returning how many failed"""
+    failed = 0
+    for start in range(0, len(rows), PRODUCT_WRITE_CHUNK_SIZE):
+        chunk = rows[start : start + PRODUCT_WRITE_CHUNK_SIZE]
+        try:
+            await db.table("products").upsert(
+                chunk, on_conflict="quickbooks_id", returning=ReturnMethod.minimal
+            ).execute()
+        except Exception as e:
+            logger.warning(f"Failed to write {len(chunk)} products: {str(e)}")
+            failed += len(chunk)
+    return failed
+
+
+async def _deactivate_missing(existing: Dict[str, dict], seen: set, now: str) -> int:
+    """Mark products whose QuickBooks item no longer exists as inactive"""
+    missing = [
+        quickbooks_id
+        for quickbooks_id, product in existing.items()
+        if quickbooks_id not in seen and product.get("is_active") is not False
+    ]
+    for start in range(0, len(missing), PRODUCT_ID_FILTER_CHUNK_SIZE):
+        chunk = missing[start : start + PRODUCT_ID_FILTER_CHUNK_SIZE]
+        await db.table("products").update(
+            {"is_active": False, "last_synced_at": now}, returning=ReturnMethod.minimal
+        ).in_("quickbooks_id", chunk).execute()
+    return len(missing)
+
+
+def _diff_page(products: List[dict], existing: Dict[str, dict], now: str):
+    inserts, updates = [], []
+    unchanged = 0
+    for product_data in products:
+        current = existing.get(product_data["quickbooks_id"])
+        if current is None:
+            inserts.append({**product_data, "created_at": now, "last_synced_at": now})
+        elif product_changed(current, product_data):
+            # Keep the product_id so quote line items stay linked
+            updates.append(
+                {
+                    **product_data,
+                    "product_id": current["product_id"],
+                    "created_at": current.get("created_at") or now,
+                    "last_synced_at": now,
+                }
+            )
+        else:
+            unchanged += 1
+    return inserts, updates, unchanged
+
+
+async def sync_products(pages: AsyncIterator[list], now: str, full: bool = True) -> dict:
+    """Diff QuickBooks item pages against the products table and write only the changes.
+
+    Each page is transformed, diffed and written before the next one is
+    consumed. A full sync compares against every linked product and deactivates
+    the ones QuickBooks no longer returned; an incremental sync only looks up
+    the products for the items on each page.
+
+    Returns counts of inserted, updated, unchanged, deactivated and failed
+    products, the newest LastUpdatedTime seen, and the time spent per phase.
+    """
+    started = time.perf_counter()
+    timing = {"prefetch": 0.0, "diff": 0.0, "write": 0.0}
+
+    def lap(phase: str, since: float) -> float:
+        current = time.perf_counter()
+        timing[phase] += current - since
+        return current
+
+    existing = await fetch_product_map() if full else None
+    lap("prefetch", started)
+
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0, "deactivated": 0, "failed": 0}
+    seen = set()
+    latest_updated_at = None
+
+    async for page in pages:
+        mark = time.perf_counter()
+        products = []
+        for item in page:
+            try:
+                # Only process products (not categories, bundles, etc.)
+                if item.Type not in SYNCED_ITEM_TYPES:
+                    continue
+                products.append(product_data_from_item(item))
+            except Exception as item_error:
+                logger.warning(
+                    f"Error processing item {getattr(item, 'Id', 'unknown')}: {str(item_error)}"
+                )
+                counts["failed"] += 1
+        latest_updated_at = latest_update_time(page, latest_updated_at)
+        seen.update(product_data["quickbooks_id"] for product_data in products)
+
+        if full:
+            current = existing
+        else:
+            mark = lap("diff", mark)
+            current = await fetch_product_map([p["quickbooks_id"] for p in products])
+            mark = lap("prefetch", mark)
+        inserts, updates, unchanged = _diff_page(products, current, now)
+        mark = lap("diff", mark)
+
+        # Rows in one PostgREST batch must share the same keys, so new and
+        # changed products are written separately
+        failed_inserts = await _upsert_chunks(inserts)
+        failed_updates = await _upsert_chunks(updates)
+        lap("write", mark)
+
+        counts["inserted"] += len(inserts) - failed_inserts
+        counts["updated"] += len(updates) - failed_updates
+        counts["unchanged"] += unchanged
+        counts["failed"] += failed_inserts + failed_updates
+
+    if full and counts["failed"] == 0:
+        mark = time.perf_counter()
+        counts["deactivated"] = await _deactivate_missing(existing, seen, now)
+        lap("write", mark)
+
+    total = time.perf_counter() - started
+    # Whatever is left was spent waiting on QuickBooks pages
+    timing["quickbooks"] = total - sum(timing.values())
+    timing["total"] = total
+
+    return {
+        **counts,
+        "latest_updated_at": latest_updated_at,
+        "timing_ms": {phase: round(seconds * 1000, 1) for phase, seconds in timing.items()},
+    }
@@ -0,0 +1,107 @@
+# settings_store.py
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from types import MappingProxyType
+from typing import Dict, Iterable, Mapping, Optional
+
+from postgrest.types import ReturnMethod
+
+from database import db
+
+logger = logging.getLogger(__name__)
+
+# How long a snapshot is trusted before it is reloaded. Writes from this
+# worker are applied to the snapshot immediately; this only bounds how long
+# writes from other workers take to show up.
+SETTINGS_CACHE_TTL = float(os.getenv("SETTINGS_CACHE_TTL", "30"))
+
+
+class SettingsStore:
+    """Cached view of the integration_settings key/value table.
+
+    Reads are served from an in-memory snapshot that is reloaded at most once
+    per SETTINGS_CACHE_TTL. Writes go to the database as a single upsert and
+    are applied to the snapshot (write-through). Every change bumps version,
+    so callers can key derived caches on it.
+    """
+
+    def __init__(self, ttl: float = SETTINGS_CACHE_TTL):
+        self.ttl = ttl
+        self.version = 0
+        self._snapshot: Mapping[str, str] = MappingProxyType({})
+        self._loaded_at: Optional[float] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _is_fresh(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl
+
+    async def get_all(self) -> Mapping[str, str]:
+        if self._is_fresh():
+            return self._snapshot
+
+        # Created on first use: on Python 3.9 asyncio primitives bind to the
+        # loop that is current when they are constructed
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            # Concurrent readers share one reload
+            if not self._is_fresh():
+                await self._reload()
+        return self._snapshot
+
+    async def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        return (await self.get_all()).get(key, default)
+
+    async def _reload(self):
+        response = await db.table("integration_settings").select("key, value").execute()
+        settings = {setting.get("key"): setting.get("value") for setting in response.data or []}
+        if settings != dict(self._snapshot):
+            self.version += 1
+        self._snapshot = MappingProxyType(settings)
+        self._loaded_at = time.monotonic()
+
+    def _apply(self, changes: Dict[str, Optional[str]]):
+        settings = dict(self._snapshot)
+        for key, value in changes.items():
+            if value is None:
+                settings.pop(key, None)
+            else:
+                settings[key] = value
+        self._snapshot = MappingProxyType(settings)
+        self.version += 1
+
+    async def save(self, values: Dict[str, str], updated_at: Optional[str] = None):
+        """Write several settings with one atomic upsert on key"""
+        if not values:
+            return
+        if updated_at is None:
+            updated_at = datetime.now().isoformat()
+
+        await db.table("integration_settings").upsert(
+            [
+                {"key": key, "value": value, "updated_at": updated_at}
+                for key, value in values.items()
+            ],
+            on_conflict="key",
+            returning=ReturnMethod.minimal,
+        ).execute()
+        self._apply(values)
+
+    async def delete(self, keys: Iterable[str]):
+        keys = list(keys)
+        if not keys:
+            return
+        await db.table("integration_settings").delete(
+            returning=ReturnMethod.minimal
+        ).in_("key", keys).execute()
+        self._apply({key: None for key in keys})
+
+    def invalidate(self):
+        """Force the next read to reload from the database"""
+        self._loaded_at = None
+
+
+settings_store = SettingsStore()
@@ -0,0 +1,58 @@
+# user_directory.py
+import logging
+import os
+from typing import Dict, Iterable, List, Optional
+
+from database import db
+from services.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+USER_DIRECTORY_TTL = int(os.getenv("USER_DIRECTORY_TTL", "300"))
+
+# user id -> email, or None for ids with no profile (cached too, so unknown
+# ids do not cost a lookup on every page)
+_email_cache = TTLCache(ttl=USER_DIRECTORY_TTL, maxsize=4096)
+
+
+async def resolve_user_emails(user_ids: Iterable) -> Dict[str, Optional[str]]:
+    """Resolve user ids to emails with one batched profiles lookup for cache misses"""
+    emails = {}
+    missing = []
+    for user_id in {str(user_id) for user_id in user_ids if user_id}:
+        email = _email_cache.get(user_id)
+        if email is TTLCache.MISSING:
+            missing.append(user_id)
+        else:
+            emails[user_id] = email
+
+    if missing:
+        response = (
+            await db.table("profiles").select("id, email").in_("id", missing).execute()
+        )
+        found = {str(row["id"]): row.get("email") for row in response.data or []}
+        for user_id in missing:
+            emails[user_id] = found.get(user_id)
+            _email_cache.set(user_id, emails[user_id])
+
+    return emails
+
+
+async def attach_user_emails(events: List[dict]) -> List[dict]:
+    """Fill in user_email on each event from its created_by id"""
+    try:
+        emails = await resolve_user_emails(event.get("created_by") for event in events)
+    except Exception as e:
+        # If the lookup fails, just use a default
+        logger.warning(f"User email lookup failed: {str(e)}")
+        emails = None
+
+    for event in events:
+        if not event.get("created_by"):
+            continue
+        if emails is None:
+            event["user_email"] = "System User"
+        else:
+            event["user_email"] = emails.get(str(event["created_by"])) or "Unknown User"
+
+    return events
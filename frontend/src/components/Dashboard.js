@@ -89,8 +89,7 @@ const Dashboard = () => {
   const isMobile = useMediaQuery(theme.breakpoints.down('sm'));
   
   // State variables
-  const [tasks, setTasks] = useState([]);
-  const [orders, setOrders] = useState([]);
+  const [recentOrders, setRecentOrders] = useState([]);
   const [quotes, setQuotes] = useState([]);
   const [invoices, setInvoices] = useState([]);
   const [loading, setLoading] = useState(true);
@@ -103,6 +102,7 @@ const Dashboard = () => {
   const [todaysTasks, setTodaysTasks] = useState([]);
   const [overdueTasks, setOverdueTasks] = useState([]);
   const [upcomingTasks, setUpcomingTasks] = useState([]);
+  const [taskCounts, setTaskCounts] = useState({ overdue: 0, dueToday: 0, upcoming: 0 });
   const [leadsSummary, setLeadsSummary] = useState({});
   const [quotesSummary, setQuotesSummary] = useState({});
   const [activeSummary, setActiveSummary] = useState({});
@@ -127,33 +127,13 @@ const Dashboard = () => {
     setError(null);
     
     try {
-      // Fetch essential data first
-      const [tasksRes, ordersRes] = await Promise.all([
-        axios.get(`${API_URL}/tasks`, { withCredentials: true }),
-        axios.get(`${API_URL}/orders`, { withCredentials: true })
-      ]);
-      
-      // Process tasks
-      const tasksData = tasksRes.data && tasksRes.data.tasks ? tasksRes.data.tasks : [];
-      setTasks(tasksData);
-      
-      // Process orders
-      const ordersData = ordersRes.data && ordersRes.data.orders ? ordersRes.data.orders : [];
-      setOrders(ordersData);
+      // Counts and short lists are computed by the API
+      const summaryRes = await axios.get(`${API_URL}/dashboard/summary`, { withCredentials: true });
+      const summary = summaryRes.data || {};
       
       // Try to fetch QuickBooks data, but don't fail if endpoints don't exist
-      let quotesData = [];
       let invoicesData = [];
       
-      try {
-        const quotesRes = await axios.get(`${API_URL}/quickbooks/invoices`, { withCredentials: true });
-        quotesData = quotesRes.data?.invoices || [];
-      } catch (err) {
-        if (err.response?.status !== 404) {
-          console.warn('Failed to fetch quotes data:', err.message);
-        }
-      }
-      
       try {
         const invoicesRes = await axios.get(`${API_URL}/quickbooks/invoices`, { withCredentials: true });
         invoicesData = invoicesRes.data?.invoices || [];
@@ -164,11 +144,11 @@ const Dashboard = () => {
       }
       
       // Set the data
-      setQuotes(quotesData);
+      setQuotes(invoicesData);
       setInvoices(invoicesData);
       
       // Process the data for dashboard metrics
-      processDataForDashboard(tasksData, ordersData, quotesData, invoicesData);
+      processDataForDashboard(summary, invoicesData);
       
     } catch (err) {
       console.error('Error fetching dashboard data:', err);
@@ -178,108 +158,57 @@ const Dashboard = () => {
     }
   };
   
-  // Process data for dashboard metrics
-  const processDataForDashboard = (tasksData, ordersData, quotesData, invoicesData) => {
-    // Process tasks for today, overdue and upcoming
-    const today = new Date();
-    today.setHours(0, 0, 0, 0);
-    
-    const tomorrow = new Date(today);
-    tomorrow.setDate(tomorrow.getDate() + 1);
-    
-    const nextWeek = new Date(today);
-    nextWeek.setDate(nextWeek.getDate() + 7);
-    
-    // Filter tasks for today
-    const todaysTasks = tasksData.filter(task => {
-      if (!task.due_date) return false;
-      const dueDate = new Date(task.due_date);
-      dueDate.setHours(0, 0, 0, 0);
-      return dueDate.getTime() === today.getTime() && task.status !== 'Completed';
-    });
-    
-    // Filter overdue tasks
-    const overdueTasks = tasksData.filter(task => {
-      if (!task.due_date) return false;
-      const dueDate = new Date(task.due_date);
-      dueDate.setHours(0, 0, 0, 0);
-      return dueDate < today && task.status !== 'Completed';
-    });
-    
-    // Filter upcoming tasks
-    const upcomingTasks = tasksData.filter(task => {
-      if (!task.due_date) return false;
-      const dueDate = new Date(task.due_date);
-      dueDate.setHours(0, 0, 0, 0);
-      return dueDate > today && dueDate <= nextWeek && task.status !== 'Completed';
-    });
-    
-    setTodaysTasks(todaysTasks);
-    setOverdueTasks(overdueTasks);
-    setUpcomingTasks(upcomingTasks);
-    
-    // Process order status summaries
-    const leadCount = ordersData.filter(order => order.status === 'Lead').length;
-    const quotedCount = ordersData.filter(order => order.status === 'Quoted').length;
-    const activeCount = ordersData.filter(order => order.status === 'Active').length;
-    const onHoldCount = ordersData.filter(order => order.status === 'On Hold').length;
-    const completedCount = ordersData.filter(order => order.status === 'Completed').length;
-    
-    // Calculate task counts by category
-    const taskStatusCounts = {};
-    STATUS_CATEGORIES.LEADS.forEach(status => {
-      taskStatusCounts[status] = tasksData.filter(task => task.status === status).length;
-    });
+  // Process the dashboard summary and invoices into dashboard metrics
+  const processDataForDashboard = (summary, invoicesData) => {
+    const taskSummary = summary.tasks || {};
+    const orderSummary = summary.orders || {};
+    const ordersByStage = orderSummary.by_stage || {};
+    const tasksByStatus = taskSummary.by_status || {};
     
-    const quoteStatusCounts = {};
-    STATUS_CATEGORIES.QUOTES.forEach(status => {
-      quoteStatusCounts[status] = tasksData.filter(task => task.status === status).length;
+    setTodaysTasks(taskSummary.due_today_tasks || []);
+    setOverdueTasks(taskSummary.overdue_tasks || []);
+    setUpcomingTasks(taskSummary.upcoming_tasks || []);
+    setTaskCounts({
+      overdue: taskSummary.overdue || 0,
+      dueToday: taskSummary.due_today || 0,
+      upcoming: taskSummary.upcoming || 0
     });
+    setRecentOrders(summary.recent_orders || []);
     
-    const materialStatusCounts = {};
-    STATUS_CATEGORIES.MATERIALS.forEach(status => {
-      materialStatusCounts[status] = tasksData.filter(task => task.status === status).length;
-    });
+    // Order counts by workflow stage
+    const leadCount = ordersByStage.LEAD_ACQUISITION || 0;
+    const quotedCount = ordersByStage.QUOTATION || 0;
+    const activeCount = (ordersByStage.PROCUREMENT || 0) + (ordersByStage.FULFILLMENT || 0);
+    const onHoldCount = ordersByStage.ON_HOLD || 0;
+    const completedCount = ordersByStage.FINALIZATION || 0;
     
-    const billingStatusCounts = {};
-    STATUS_CATEGORIES.BILLING.forEach(status => {
-      billingStatusCounts[status] = tasksData.filter(task => task.status === status).length;
-    });
+    // Task counts by category
+    const countTasks = (statuses) => statuses.reduce((counts, status) => {
+      counts[status] = tasksByStatus[status] || 0;
+      return counts;
+    }, {});
     
     setLeadsSummary({
       total: leadCount,
-      tasks: taskStatusCounts
+      tasks: countTasks(STATUS_CATEGORIES.LEADS)
     });
     
     setQuotesSummary({
       total: quotedCount,
-      tasks: quoteStatusCounts
+      tasks: countTasks(STATUS_CATEGORIES.QUOTES)
     });
     
     setActiveSummary({
       total: activeCount,
       onHold: onHoldCount,
-      tasks: materialStatusCounts
+      tasks: countTasks(STATUS_CATEGORIES.MATERIALS)
     });
     
     setBillingSummary({
       total: completedCount,
-      tasks: billingStatusCounts
+      tasks: countTasks(STATUS_CATEGORIES.BILLING)
     });
     
-    // Calculate performance metrics
-    // Total active orders
-    const activeOrders = ordersData.filter(order => order.status === 'Active').length;
-    
-    // Completed this month
-    const thisMonth = today.getMonth();
-    const thisYear = today.getFullYear();
-    const completedThisMonth = ordersData.filter(order => {
-      if (order.status !== 'Completed' || !order.actual_completion_date) return false;
-      const completionDate = new Date(order.actual_completion_date);
-      return completionDate.getMonth() === thisMonth && completionDate.getFullYear() === thisYear;
-    }).length;
-    
     // Calculate total revenue from invoices
     const totalRevenue = invoicesData
       .filter(invoice => invoice.status === 'Paid')
@@ -290,35 +219,14 @@ const Dashboard = () => {
       .filter(invoice => invoice.status !== 'Paid')
       .reduce((sum, invoice) => sum + (invoice.balance_due || 0), 0);
     
-    // Calculate average completion time (in days) for orders completed in the past 3 months
-    const threeMonthsAgo = new Date();
-    threeMonthsAgo.setMonth(threeMonthsAgo.getMonth() - 3);
-    
-    const completedOrders = ordersData.filter(order => 
-      order.status === 'Completed' && 
-      order.actual_completion_date && 
-      new Date(order.actual_completion_date) >= threeMonthsAgo);
-      
-    let avgCompletionTime = 0;
-    
-    if (completedOrders.length > 0) {
-      const totalDays = completedOrders.reduce((sum, order) => {
-        const startDate = new Date(order.start_date);
-        const endDate = new Date(order.actual_completion_date);
-        const days = Math.floor((endDate - startDate) / (1000 * 60 * 60 * 24));
-        return sum + days;
-      }, 0);
-      
-      avgCompletionTime = Math.round(totalDays / completedOrders.length);
-    }
-    
     // Set performance metrics
     setPerformanceMetrics({
-      activeOrders,
-      completedThisMonth,
+      activeOrders: activeCount,
+      completedThisMonth: orderSummary.completed_this_month || 0,
       onHold: onHoldCount,
       pendingInvoices: invoicesData.filter(invoice => invoice.status === 'Open').length,
-      avgCompletionTime,
+      // Orders carry no completion date to measure this from
+      avgCompletionTime: 0,
       totalRevenue,
       outstandingAmount
     });
@@ -1056,7 +964,7 @@ const Dashboard = () => {
                     boxShadow: '0 2px 8px rgba(211, 47, 47, 0.3)'
                     }}
                 >
-                    {overdueTasks.length}
+                    {taskCounts.overdue}
                 </Avatar>
                   
                 </Box>
@@ -1071,7 +979,7 @@ const Dashboard = () => {
                   }}
                 >
                   {overdueTasks.length > 0 ? (
-                    overdueTasks.slice(0, 5).map((task) => (
+                    overdueTasks.map((task) => (
                       <ListItem 
                         key={task.task_id}
                         button
@@ -1183,7 +1091,7 @@ const Dashboard = () => {
                   )}
                 </List>
                 
-                {overdueTasks.length > 5 && (
+                {taskCounts.overdue > 5 && (
                   <Box sx={{ mt: 1, textAlign: 'center' }}>
                     <Button 
                       color="error"
@@ -1196,7 +1104,7 @@ const Dashboard = () => {
                         fontWeight: 500
                       }}
                     >
-                      View All ({overdueTasks.length}) Overdue Tasks
+                      View All ({taskCounts.overdue}) Overdue Tasks
                     </Button>
                   </Box>
                 )}
@@ -1248,7 +1156,7 @@ const Dashboard = () => {
                     boxShadow: '0 2px 8px rgba(25, 118, 210, 0.3)'
                     }}
                 >
-                    {todaysTasks.length}
+                    {taskCounts.dueToday}
                 </Avatar>
                   
                 </Box>
@@ -1263,7 +1171,7 @@ const Dashboard = () => {
                   }}
                 >
                   {todaysTasks.length > 0 ? (
-                    todaysTasks.slice(0, 5).map((task) => (
+                    todaysTasks.map((task) => (
                       <ListItem 
                         key={task.task_id}
                         button
@@ -1382,7 +1290,7 @@ const Dashboard = () => {
                   )}
                 </List>
                 
-                {todaysTasks.length > 5 && (
+                {taskCounts.dueToday > 5 && (
                   <Box sx={{ mt: 1, textAlign: 'center' }}>
                     <Button 
                       color="primary"
@@ -1395,7 +1303,7 @@ const Dashboard = () => {
                         fontWeight: 500
                       }}
                     >
-                      View All ({todaysTasks.length}) Today's Tasks
+                      View All ({taskCounts.dueToday}) Today's Tasks
                     </Button>
                   </Box>
                 )}
@@ -1447,7 +1355,7 @@ const Dashboard = () => {
                         boxShadow: '0 2px 8px rgba(2, 136, 209, 0.3)'
                       }}
                     >
-                      {upcomingTasks.length}
+                      {taskCounts.upcoming}
                     </Avatar>
                   
                 </Box>
@@ -1462,7 +1370,7 @@ const Dashboard = () => {
                   }}
                 >
                   {upcomingTasks.length > 0 ? (
-                    upcomingTasks.slice(0, 5).map((task) => (
+                    upcomingTasks.map((task) => (
                       <ListItem 
                         key={task.task_id}
                         button
@@ -1548,7 +1456,7 @@ const Dashboard = () => {
                   )}
                 </List>
                 
-                {upcomingTasks.length > 5 && (
+                {taskCounts.upcoming > 5 && (
                   <Box sx={{ mt: 1, textAlign: 'center' }}>
                     <Button 
                       color="info"
@@ -1561,7 +1469,7 @@ const Dashboard = () => {
                         fontWeight: 500
                       }}
                     >
-                      View All ({upcomingTasks.length}) Upcoming Tasks
+                      View All ({taskCounts.upcoming}) Upcoming Tasks
                     </Button>
                   </Box>
                 )}
@@ -2268,7 +2176,7 @@ const Dashboard = () => {
               </TableRow>
             </TableHead>
             <TableBody>
-              {orders.slice(0, 5).map((order) => (
+              {recentOrders.map((order) => (
                 <TableRow 
                   key={order.order_id} 
                   hover
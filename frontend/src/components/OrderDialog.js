@@ -107,7 +107,7 @@ const OrderDialog = ({ open, onClose, onOrderCreated, order = null, mode = 'crea
       const response = await axios.get(`${API_URL}/customers`, {
         withCredentials: true
       });
-      setCustomers(response.data || []);
+      setCustomers(response.data?.customers || []);
     } catch (err) {
       console.error('Error fetching customers:', err);
       setError('Failed to load customers');
@@ -1,6 +1,7 @@
 // OrderHistoryTimeline.js - A component to display the order history timeline
 import React, { useState, useEffect } from 'react';
 import axios from 'axios';
+import { useChangeFeed, applyChange } from '../services/changeFeed';
 import {
   Box,
   Typography,
@@ -44,6 +45,9 @@ import {
 
 const API_URL = 'http://localhost:8000';
 
+// Events fetched per page of the history
+const HISTORY_PAGE_SIZE = 20;
+
 // Event type definitions with icons and colors
 const EVENT_TYPES = {
   'stage_change': { icon: <TimelineIcon />, color: 'primary', label: 'Stage Change' },
@@ -63,6 +67,8 @@ const OrderHistoryTimeline = ({ orderId }) => {
   const [error, setError] = useState(null);
   const [searchTerm, setSearchTerm] = useState('');
   const [filteredEvents, setFilteredEvents] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [totalEvents, setTotalEvents] = useState(0);
   const [noteDialogOpen, setNoteDialogOpen] = useState(false);
   const [newNote, setNewNote] = useState('');
   const [submitting, setSubmitting] = useState(false);
@@ -72,6 +78,23 @@ const OrderHistoryTimeline = ({ orderId }) => {
     fetchEvents();
   }, [orderId]);
   
+  // New events for this order arrive live; the history is newest first. An
+  // event is retracted with a "deleted" change if it could not be stored.
+  useChangeFeed({ kinds: 'order_event', orderId }, {
+    onChange: (change) => {
+      // useChangeFeed always calls the latest handler, so events is current
+      const eventId = change.data && change.data.event_id;
+      const known = events.some(event => event.event_id === eventId);
+      if (change.action === 'deleted' && known) {
+        setTotalEvents(prevTotal => prevTotal - 1);
+      } else if (change.action === 'created' && !known) {
+        setTotalEvents(prevTotal => prevTotal + 1);
+      }
+      setEvents(prevEvents => applyChange(prevEvents, change, 'event_id'));
+    },
+    onReset: () => fetchEvents()
+  });
+  
   // Filter events based on search term
   useEffect(() => {
     if (!searchTerm.trim()) {
@@ -91,8 +114,8 @@ const OrderHistoryTimeline = ({ orderId }) => {
     setFilteredEvents(filtered);
   }, [searchTerm, events]);
   
-  // Fetch events from API
-  const fetchEvents = async () => {
+  // Fetch a page of events from the API; without a cursor the list starts over
+  const fetchEvents = async (cursor = null) => {
     if (!orderId) {
       setError('No order ID provided');
       setLoading(false);
@@ -104,15 +127,18 @@ const OrderHistoryTimeline = ({ orderId }) => {
     
     try {
       const response = await axios.get(`${API_URL}/orders/${orderId}/history`, {
+        params: { limit: HISTORY_PAGE_SIZE, cursor: cursor || undefined },
         withCredentials: true
       });
       
-      if (response.data && response.data.events) {
-        setEvents(response.data.events);
-        setFilteredEvents(response.data.events);
-      } else {
-        setEvents([]);
-        setFilteredEvents([]);
+      const pageEvents = (response.data && response.data.events) || [];
+      const allEvents = cursor ? [...events, ...pageEvents] : pageEvents;
+      setEvents(allEvents);
+      setFilteredEvents(allEvents);
+      setNextCursor(response.data?.next_cursor || null);
+      // The total is only counted with the first page
+      if (!cursor) {
+        setTotalEvents(response.data?.total ?? pageEvents.length);
       }
     } catch (err) {
       console.error('Error fetching order history:', err);
@@ -205,7 +231,7 @@ const OrderHistoryTimeline = ({ orderId }) => {
           <Button
             variant="outlined"
             startIcon={<HistoryIcon />}
-            onClick={fetchEvents}
+            onClick={() => fetchEvents()}
             disabled={loading}
           >
             Refresh
@@ -253,7 +279,7 @@ const OrderHistoryTimeline = ({ orderId }) => {
             <Button 
               color="inherit" 
               size="small" 
-              onClick={fetchEvents}
+              onClick={() => fetchEvents()}
             >
               Retry
             </Button>
@@ -406,6 +432,25 @@ const OrderHistoryTimeline = ({ orderId }) => {
         </List>
       )}
       
+      {/* Pagination */}
+      {events.length > 0 && (
+        <Box sx={{ display: 'flex', justifyContent: 'space-between', alignItems: 'center', mt: 2 }}>
+          <Typography variant="caption" color="text.secondary">
+            Showing {events.length} of {totalEvents} events
+          </Typography>
+          {nextCursor && (
+            <Button
+              variant="text"
+              size="small"
+              onClick={() => fetchEvents(nextCursor)}
+              disabled={loading}
+            >
+              Load More
+            </Button>
+          )}
+        </Box>
+      )}
+      
       {/* Add Note Dialog */}
       <Dialog 
         open={noteDialogOpen} 
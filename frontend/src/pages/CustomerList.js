@@ -67,6 +67,8 @@ const CustomerList = () => {
   const [rowsPerPage, setRowsPerPage] = useState(10);
   const [customerDialogOpen, setCustomerDialogOpen] = useState(false);
   const [totalCustomers, setTotalCustomers] = useState(0);
+  // cursors[n] fetches page n; the server hands out the cursor for the next page
+  const [cursors, setCursors] = useState([null]);
   const [orderCounts, setOrderCounts] = useState({});
 
   // Fetch customers
@@ -80,7 +82,8 @@ const CustomerList = () => {
       if (searchTerm) params.append('search', searchTerm);
       if (customerType) params.append('customer_type', customerType);
       params.append('limit', rowsPerPage);
-      params.append('offset', page * rowsPerPage);
+      if (cursors[page]) params.append('cursor', cursors[page]);
+      if (!searchTerm) params.append('count', 'exact');
       
       const response = await axios.get(
         `${API_URL}/customers?${params}`,
@@ -88,22 +91,30 @@ const CustomerList = () => {
       );
       
       if (response.data) {
-        setCustomers(response.data);
-        setTotalCustomers(response.data.length); // In real app, backend should return total count
+        const pageCustomers = response.data.customers || [];
+        const nextCursor = response.data.next_cursor || null;
+        setCustomers(pageCustomers);
+        setCursors(prev => [...prev.slice(0, page + 1), nextCursor]);
+        // Searches are ranked and not counted; -1 tells the table the total is unknown
+        if (response.data.total != null) {
+          setTotalCustomers(response.data.total);
+        } else {
+          setTotalCustomers(nextCursor ? -1 : page * rowsPerPage + pageCustomers.length);
+        }
         
-        // Fetch order counts for each customer
+        // Fetch order counts for each customer; only the total is needed
         const counts = {};
-        for (const customer of response.data) {
+        await Promise.all(pageCustomers.map(async (customer) => {
           try {
             const ordersResponse = await axios.get(
               `${API_URL}/customers/${customer.customer_id}/orders`,
-              { withCredentials: true }
+              { params: { limit: 1, count: 'exact' }, withCredentials: true }
             );
             counts[customer.customer_id] = ordersResponse.data.total || 0;
           } catch (err) {
             counts[customer.customer_id] = 0;
           }
-        }
+        }));
         setOrderCounts(counts);
       }
     } catch (err) {
@@ -159,13 +170,22 @@ const CustomerList = () => {
 
   // Handle page change
   const handleChangePage = (event, newPage) => {
-    setPage(newPage);
+    // Pages are reached through cursors, so only pages already linked can be opened
+    if (newPage < cursors.length && (newPage === 0 || cursors[newPage])) {
+      setPage(newPage);
+    }
+  };
+
+  // Filters change the ordering, so paging starts over
+  const resetPaging = () => {
+    setCursors([null]);
+    setPage(0);
   };
 
   // Handle rows per page change
   const handleChangeRowsPerPage = (event) => {
     setRowsPerPage(parseInt(event.target.value, 10));
-    setPage(0);
+    resetPaging();
   };
 
   // Format phone number
@@ -245,7 +265,7 @@ const CustomerList = () => {
                     Total Customers
                   </Typography>
                   <Typography variant="h3" sx={{ mt: 1, fontWeight: 700 }}>
-                    {totalCustomers}
+                    {totalCustomers < 0 ? `${customers.length}+` : totalCustomers}
                   </Typography>
                 </Box>
                 <Avatar sx={{ 
@@ -367,9 +387,12 @@ const CustomerList = () => {
         }}>
           <Stack direction={{ xs: 'column', sm: 'row' }} spacing={2}>
             <TextField
-              placeholder="Search by name, contact, or email..."
+              placeholder="Search by name, contact, email, phone, or address..."
               value={searchTerm}
-              onChange={(e) => setSearchTerm(e.target.value)}
+              onChange={(e) => {
+                setSearchTerm(e.target.value);
+                resetPaging();
+              }}
               InputProps={{
                 startAdornment: (
                   <InputAdornment position="start">
@@ -390,7 +413,10 @@ const CustomerList = () => {
               <InputLabel>Customer Type</InputLabel>
               <Select
                 value={customerType}
-                onChange={(e) => setCustomerType(e.target.value)}
+                onChange={(e) => {
+                  setCustomerType(e.target.value);
+                  resetPaging();
+                }}
                 label="Customer Type"
                 sx={{ 
                   borderRadius: 2,
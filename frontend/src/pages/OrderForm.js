@@ -160,7 +160,7 @@ const OrderForm = () => {
       });
       
       if (response.data) {
-        setCustomers(response.data);
+        setCustomers(response.data.customers || []);
       }
     } catch (err) {
       console.error('Error fetching customers:', err);
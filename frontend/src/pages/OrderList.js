@@ -1,7 +1,8 @@
 // src/pages/OrderList.js
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useNavigate, useLocation } from 'react-router-dom';
 import axios from 'axios';
+import { useChangeFeed, applyChange } from '../services/changeFeed';
 
 // Material UI imports
 import {
@@ -46,6 +47,9 @@ import OrderDialog from '../components/OrderDialog';
 
 // API URL
 const API_URL = 'http://localhost:8000';
+const PAGE_SIZE = 100;
+// Live changes often come in bursts; recount once per burst
+const STAGE_COUNTS_DELAY = 1000;
 
 const OrderList = ({ initialFilter = '', viewMode = 'standard' }) => {
   const navigate = useNavigate();
@@ -70,25 +74,81 @@ const OrderList = ({ initialFilter = '', viewMode = 'standard' }) => {
   const [orderPriorities, setOrderPriorities] = useState([]);
   const [stageCounts, setStageCounts] = useState({});
   const [orderDialogOpen, setOrderDialogOpen] = useState(false);
+  const [nextCursor, setNextCursor] = useState(null);
+  const stageCountsTimer = useRef(null);
   
-  // Fetch orders and dropdown options
+  // Fetch one page of orders; stage and customer filters are applied server-side
+  const fetchOrdersPage = async (cursor = null) => {
+    const params = { limit: PAGE_SIZE };
+    if (stageFilter) params.current_stage = stageFilter;
+    if (customerFilter) params.customer_id = customerFilter;
+    if (cursor) params.cursor = cursor;
+    
+    const response = await axios.get(`${API_URL}/orders`, {
+      params,
+      withCredentials: true
+    });
+    
+    return {
+      orders: response.data?.orders || [],
+      nextCursor: response.data?.next_cursor || null
+    };
+  };
+  
+  // Fetch the first page of orders whenever the server-side filters change
   useEffect(() => {
-    const fetchData = async () => {
+    const fetchOrders = async () => {
       setLoading(true);
       setError(null);
       
       try {
-        // Fetch orders
-        const ordersResponse = await axios.get(`${API_URL}/orders`, {
-          withCredentials: true
-        });
-        
-        if (ordersResponse.data && ordersResponse.data.orders) {
-          setOrders(ordersResponse.data.orders);
-        } else {
-          setOrders([]);
+        const firstPage = await fetchOrdersPage();
+        setOrders(firstPage.orders);
+        setNextCursor(firstPage.nextCursor);
+      } catch (err) {
+        console.error('Error fetching orders:', err);
+        // Only show error if it's not an authentication issue
+        if (err.response?.status !== 401 && err.response?.status !== 403) {
+          setError('Failed to load orders data. Please try again.');
         }
-        
+      } finally {
+        setLoading(false);
+      }
+    };
+    
+    fetchOrders();
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [stageFilter, customerFilter]);
+  
+  // Merge live order changes into the loaded pages; new orders are only
+  // prepended when they match the server-side filters
+  useChangeFeed({ kinds: 'order' }, {
+    onChange: (change) => {
+      // Any order write can move counts, including orders outside the filter
+      if (!stageCountsTimer.current) {
+        stageCountsTimer.current = setTimeout(() => {
+          stageCountsTimer.current = null;
+          fetchStageCounts();
+        }, STAGE_COUNTS_DELAY);
+      }
+      const order = change.data || {};
+      if (change.action === 'created' && (
+        (stageFilter && order.workflow_stage !== stageFilter) ||
+        (customerFilter && order.customer_id !== customerFilter)
+      )) {
+        return;
+      }
+      // The list shows the stored stage as current_stage
+      const listChange = { ...change, data: { ...order, ...(order.workflow_stage ? { current_stage: order.workflow_stage } : {}) } };
+      setOrders(prevOrders => applyChange(prevOrders, listChange, 'order_id'));
+    },
+    onReset: () => handleRefresh()
+  });
+  
+  // Fetch dropdown options
+  useEffect(() => {
+    const fetchOptions = async () => {
+      try {
         // Fetch order stages
         const stagesResponse = await axios.get(`${API_URL}/orders/order-stages`, {
           withCredentials: true
@@ -107,30 +167,38 @@ const OrderList = ({ initialFilter = '', viewMode = 'standard' }) => {
           setOrderPriorities(prioritiesResponse.data.priorities);
         }
       } catch (err) {
-        console.error('Error fetching data:', err);
-        // Only show error if it's not an authentication issue
-        if (err.response?.status !== 401 && err.response?.status !== 403) {
-          setError('Failed to load orders data. Please try again.');
-        }
-      } finally {
-        setLoading(false);
+        console.error('Error fetching order options:', err);
       }
     };
     
-    fetchData();
+    fetchOptions();
   }, []);
   
-  // Calculate stage counts
+  // Stage counts come from the server: the loaded pages only hold the
+  // orders of the selected stage, and only the first few pages of those
+  const fetchStageCounts = async () => {
+    try {
+      const params = {};
+      if (customerFilter) params.customer_id = customerFilter;
+      
+      const response = await axios.get(`${API_URL}/orders/stage-counts`, {
+        params,
+        withCredentials: true
+      });
+      
+      setStageCounts(response.data?.counts || {});
+    } catch (err) {
+      console.error('Error fetching stage counts:', err);
+    }
+  };
+  
+  // Counts don't depend on the stage filter, only on the customer
   useEffect(() => {
-    if (!orders.length) return;
-    
-    const counts = {};
-    orderStages.forEach(stage => {
-      counts[stage] = orders.filter(order => order.current_stage === stage).length;
-    });
-    
-    setStageCounts(counts);
-  }, [orders, orderStages]);
+    fetchStageCounts();
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [customerFilter]);
+  
+  useEffect(() => () => clearTimeout(stageCountsTimer.current), []);
   
   // Apply filters and search
   useEffect(() => {
@@ -195,16 +263,12 @@ const OrderList = ({ initialFilter = '', viewMode = 'standard' }) => {
     setLoading(true);
     setError(null);
     
+    fetchStageCounts();
+    
     try {
-      const response = await axios.get(`${API_URL}/orders`, {
-        withCredentials: true
-      });
-      
-      if (response.data && response.data.orders) {
-        setOrders(response.data.orders);
-      } else {
-        setOrders([]);
-      }
+      const firstPage = await fetchOrdersPage();
+      setOrders(firstPage.orders);
+      setNextCursor(firstPage.nextCursor);
     } catch (err) {
       console.error('Error refreshing orders:', err);
       // Only show error if it's not an authentication issue
@@ -216,6 +280,27 @@ const OrderList = ({ initialFilter = '', viewMode = 'standard' }) => {
     }
   };
   
+  // Append the next page of orders
+  const handleLoadMore = async () => {
+    if (!nextCursor) return;
+    
+    setLoading(true);
+    setError(null);
+    
+    try {
+      const nextPage = await fetchOrdersPage(nextCursor);
+      setOrders(prevOrders => [...prevOrders, ...nextPage.orders]);
+      setNextCursor(nextPage.nextCursor);
+    } catch (err) {
+      console.error('Error loading more orders:', err);
+      if (err.response?.status !== 401 && err.response?.status !== 403) {
+        setError('Failed to load more orders. Please try again.');
+      }
+    } finally {
+      setLoading(false);
+    }
+  };
+  
   // Handle stage filter change
   const handleStageFilterChange = (event) => {
     const newStage = event.target.value;
@@ -569,6 +654,14 @@ const OrderList = ({ initialFilter = '', viewMode = 'standard' }) => {
               />
             </Box>
           )}
+          
+          {nextCursor && (
+            <Box sx={{ display: 'flex', justifyContent: 'center', pb: 2 }}>
+              <Button variant="outlined" onClick={handleLoadMore} disabled={loading}>
+                Load more orders
+              </Button>
+            </Box>
+          )}
         </Paper>
       ) : (
         <Alert severity={searchTerm || stageFilter || priorityFilter ? "info" : "warning"} sx={{ mt: 2 }}>
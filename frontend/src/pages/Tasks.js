@@ -2,6 +2,7 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate, useLocation } from 'react-router-dom';
 import axios from 'axios';
+import { useChangeFeed, applyChange } from '../services/changeFeed';
 
 // Material UI imports
 import {
@@ -183,7 +184,7 @@ const Tasks = () => {
         }
         
         // Fetch statuses
-        const statusesResponse = await axios.get(`${API_URL}/task-statuses`, {
+        const statusesResponse = await axios.get(`${API_URL}/tasks/statuses`, {
           withCredentials: true
         });
         
@@ -192,7 +193,7 @@ const Tasks = () => {
         }
         
         // Fetch priorities
-        const prioritiesResponse = await axios.get(`${API_URL}/task-priorities`, {
+        const prioritiesResponse = await axios.get(`${API_URL}/tasks/priorities`, {
           withCredentials: true
         });
         
@@ -200,8 +201,9 @@ const Tasks = () => {
           setPriorities(prioritiesResponse.data.priorities);
         }
         
-        // Fetch orders (for dropdown)
+        // Fetch orders (for dropdown); only the id and name are shown
         const ordersResponse = await axios.get(`${API_URL}/orders`, {
+          params: { fields: 'order_id,order_name' },
           withCredentials: true
         });
         
@@ -224,6 +226,18 @@ const Tasks = () => {
     fetchData();
   }, []);
   
+  // Colleagues' task changes arrive live instead of on refresh
+  useChangeFeed({ kinds: 'task' }, {
+    onChange: (change) => setTasks(prevTasks => applyChange(prevTasks, change, 'task_id')),
+    onReset: () => handleRefresh()
+  });
+  
+  // Keep the date buckets in step with the task list
+  useEffect(() => {
+    processTasksByDate(tasks);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [tasks]);
+  
   // Function to process tasks by date
   const processTasksByDate = (tasksData) => {
     // Process tasks for today, overdue and upcoming
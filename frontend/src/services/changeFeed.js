@@ -0,0 +1,81 @@
+// src/services/changeFeed.js
+import { useEffect, useRef } from 'react';
+
+const API_URL = 'http://localhost:8000';
+
+// Wait before reopening a stream the server refused (e.g. while the access
+// token is being refreshed)
+const RECONNECT_DELAY = 5000;
+
+/**
+ * Subscribe to live order, task and order event changes from /changes/stream.
+ *
+ * @param {object} filter - { kinds, orderId, assignedTo }; kinds is a comma-separated list
+ * @param {object} handlers - onChange(change) for each delta, onReset() when changes were
+ *   missed and the caller should refetch what it shows
+ */
+export const useChangeFeed = ({ kinds, orderId, assignedTo } = {}, { onChange, onReset } = {}) => {
+  // Keep the latest handlers without reopening the stream on every render
+  const handlers = useRef({ onChange, onReset });
+  handlers.current = { onChange, onReset };
+
+  useEffect(() => {
+    const params = new URLSearchParams();
+    if (kinds) params.set('kinds', kinds);
+    if (orderId) params.set('order_id', orderId);
+    if (assignedTo) params.set('assigned_to', assignedTo);
+
+    let source = null;
+    let retryTimer = null;
+    let closed = false;
+
+    const open = (afterReconnect) => {
+      source = new EventSource(`${API_URL}/changes/stream?${params.toString()}`, { withCredentials: true });
+
+      source.addEventListener('change', (event) => {
+        handlers.current.onChange && handlers.current.onChange(JSON.parse(event.data));
+      });
+      source.addEventListener('reset', () => {
+        handlers.current.onReset && handlers.current.onReset();
+      });
+      source.onopen = () => {
+        // A fresh EventSource has no Last-Event-ID, so anything sent while
+        // disconnected is lost; reload instead
+        if (afterReconnect && handlers.current.onReset) handlers.current.onReset();
+        afterReconnect = false;
+      };
+      source.onerror = () => {
+        // EventSource retries dropped connections itself (resuming from the
+        // last event id); it only gives up when the server refuses the stream
+        if (source.readyState === EventSource.CLOSED && !closed) {
+          retryTimer = setTimeout(() => open(true), RECONNECT_DELAY);
+        }
+      };
+    };
+
+    open(false);
+
+    return () => {
+      closed = true;
+      clearTimeout(retryTimer);
+      if (source) source.close();
+    };
+  }, [kinds, orderId, assignedTo]);
+};
+
+/**
+ * Apply a change to a list of rows keyed by `key`: created rows are
+ * prepended, updated rows are merged in place and deleted rows are removed.
+ */
+export const applyChange = (rows, change, key) => {
+  const row = change.data || {};
+  const exists = rows.some(item => item[key] === row[key]);
+
+  if (change.action === 'deleted') {
+    return rows.filter(item => item[key] !== row[key]);
+  }
+  if (exists) {
+    return rows.map(item => (item[key] === row[key] ? { ...item, ...row } : item));
+  }
+  return change.action === 'created' ? [row, ...rows] : rows;
+};